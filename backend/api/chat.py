@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from backend.api.filter_extractor import (
     extract_filters_from_text,
@@ -12,65 +13,164 @@ from backend.api.utils.confirmation_utils import (
     SUGERENCIAS_FILTROS_FALTANTES
 )
 from backend.api.search_engine import buscar_propiedad_ideal
+from backend.llm_engine.scheduler import ColaInferenciaLlena
+from backend.api.readiness import arranque
+from backend.api.executors import ejecutor_etapas
+from backend.cpu_partition import particion_cpu
+from backend.api.utils.fuzzy_matching import titulo_mencionado
 from backend.api.schemas import ChatRequest, ChatResponse
 from backend.db.models.property import Inmueble
 from backend.api.utils.auth_utils import verificar_token
-from backend.api.utils.llm_prompt import limpiar_texto_parentesis, limpiar_prefijo_llm
-from backend.db.database import get_db
+from backend.api.utils.llm_prompt import limpiar_respuesta_llm, limpiar_roles_llm, LimpiadorIncremental
+from backend.db.database import get_db, SessionLocal
 from backend.logger_setup import get_logger
 from sqlalchemy.orm import Session
 from uuid import uuid4
-from difflib import get_close_matches
+import threading
+import asyncio
+import json
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_handler(
-    data: ChatRequest,
-    request: Request,
-    db: Session = Depends(get_db),
-    token_validado: None = Depends(verificar_token)
-):
-    session_id = data.session_id or "default_session"
-    logger.info("📩 POST /chat recibido", extra={"session_id": session_id, "mensaje": data.message})
+def _error_cola_llena(e: ColaInferenciaLlena, session_id: str) -> HTTPException:
+    logger.warning("🚧 /chat rechazado por cola de inferencia llena", extra={"session_id": session_id, "retry_after": e.retry_after})
+    return HTTPException(
+        status_code=503,
+        detail="HomeCat está atendiendo muchas conversaciones. Intenta de nuevo en unos segundos.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
-    llm = request.app.state.llm
-    memory = request.app.state.memory
 
-    try:
-        logger.debug("🔁 Obteniendo datos de sesión", extra={"session_id": session_id})
-        history = memory.get_history(session_id)
-        if not history:
-            logger.debug("⏱ Primera interacción detectada. Inyectando historial simulado.", extra={"session_id": session_id})
-            history.append({
-                "role": "system",
-                "content": (
-                    "Eres un asesor inmobiliario profesional, empático y humano. "
-                    "Tu trabajo es conversar de forma natural para entender las necesidades del usuario. "
-                    "No puedes mostrar propiedades hasta que el sistema te las entregue explícitamente. "
-                    "No inventes información, no hagas promesas implícitas ni digas frases como 'estoy buscando'. "
-                    "Adáptate al tono del usuario y mantén una conversación fluida, útil y realista."
-                )
-            })
+def _verificar_arranque(session_id: str):
+    """
+    Mientras el LLM o los embeddings se cargan en segundo plano el chat responde 503.
+    """
+    if not arranque.listo:
+        logger.warning("⏳ /chat rechazado: modelos todavía cargando", extra={"session_id": session_id})
+        raise HTTPException(
+            status_code=503,
+            detail="HomeCat se está iniciando. Intenta de nuevo en unos segundos.",
+            headers={"Retry-After": "5"}
+        )
 
-        filtros_actuales = memory.get_filters(session_id)
-        flags = memory.get_flags(session_id)
 
-        logger.debug("🧪 Extrayendo filtros del mensaje", extra={"session_id": session_id})
+async def _vigilar_desconexion(request: Request, cancelacion: threading.Event, session_id: str, intervalo: float = 0.5):
+    """
+    Activa `cancelacion` si el cliente cierra la conexión mientras se genera la respuesta
+    (pestaña cerrada o reintento del frontend), para no gastar el modelo en una respuesta descartada.
+    """
+    while not cancelacion.is_set():
+        if await request.is_disconnected():
+            logger.info("🔌 Cliente desconectado, cancelando generación", extra={"session_id": session_id})
+            cancelacion.set()
+            return
+        await asyncio.sleep(intervalo)
+
+
+def _bloque_imagenes(inmueble: Inmueble) -> str:
+    """
+    Construye el bloque HTML con las imágenes y el enlace de un inmueble real.
+    Devuelve una cadena vacía si el inmueble no tiene slug o imágenes válidas.
+    """
+    if not inmueble or not inmueble.slug or not inmueble.imagenes:
+        return ""
+
+    imagenes = [img.url_imagen for img in inmueble.imagenes[:3] if img.url_imagen]
+    if not imagenes:
+        return ""
+
+    url = f"https://multihabitat.lat/inmueble/{inmueble.slug}/"
+    group_id = uuid4().hex
+    imagenes_html = "".join([
+        f'<img src="{img}" data-full="{img}" data-group="{group_id}" loading="lazy" class="zoomable-img" '
+        f'style="width: 120px; max-width: 100%; border-radius: 10px; '
+        f'margin-right: 0.5rem; margin-bottom: 0.5rem; cursor: zoom-in;" alt="{inmueble.titulo}">'
+        for img in imagenes
+    ])
+    return (
+        f"<div style='display: flex; flex-wrap: wrap; margin-top: 0.25rem; margin-bottom: 0.5rem;'>"
+        f"{imagenes_html}</div>"
+        f"<a href='{url}' target='_blank' "
+        f"style='display: inline-flex; align-items: center; gap: 0.4rem; color: #0d6efd; "
+        f"text-decoration: none; font-weight: 500;'>"
+        f"<i class='bi bi-box-arrow-up-right'></i> Ver esta propiedad en Multihabitat</a>"
+    )
+
+
+def _bloque_propiedad_mencionada(model_response: str, db: Session, session_id: str) -> str:
+    """
+    Si el modelo mencionó una propiedad real por su título, devuelve su bloque de imágenes.
+    """
+    with ejecutor_etapas.medir("consulta_propiedades"):
+        propiedades = db.query(Inmueble).filter(Inmueble.slug != None).all()
+    nombres_propiedades = [p.titulo for p in propiedades]
+    # Se queda en este hilo: mandar todos los títulos a otro proceso costaría más que la comparación
+    with ejecutor_etapas.medir("titulo_fuzzy"), particion_cpu.afinidad_temporal("fuzzy"):
+        mencionada = titulo_mencionado(model_response, nombres_propiedades)
+
+    if not mencionada:
+        return ""
+
+    logger.debug("🔗 El modelo mencionó una propiedad real", extra={"session_id": session_id, "mencionada": mencionada})
+    inmueble = next((p for p in propiedades if p.titulo == mencionada), None)
+    return _bloque_imagenes(inmueble)
+
+
+def _bloque_propiedad_mencionada_sesion_propia(model_response: str, session_id: str) -> str:
+    """
+    Igual que `_bloque_propiedad_mencionada`, con una sesión de BD propia (en streaming la de
+    la dependencia ya está cerrada).
+    """
+    with SessionLocal() as db:
+        return _bloque_propiedad_mencionada(model_response, db, session_id)
+
+
+def _preparar_turno(data: ChatRequest, session_id: str, memory, db: Session, contar_tokens_mensaje=None) -> tuple[list[dict], Inmueble | None, str | None]:
+    """
+    Ejecuta todo lo que ocurre antes de consultar al modelo: historial, filtros, confirmación
+    y búsqueda de propiedad.
+
+    Devuelve `(history, propiedad, respuesta_directa)`. Si `respuesta_directa` no es None, el
+    turno ya quedó resuelto sin LLM y se registró en memoria.
+
+    `contar_tokens_mensaje` permite que la memoria guarde el conteo de tokens de cada mensaje
+    para que el prompt se arme por presupuesto sin volver a tokenizar el historial.
+    """
+    logger.debug("🔁 Obteniendo datos de sesión", extra={"session_id": session_id})
+    history = memory.get_history(session_id, contar_tokens_mensaje)
+    if not history:
+        logger.debug("⏱ Primera interacción detectada. Inyectando historial simulado.", extra={"session_id": session_id})
+        history.append({
+            "role": "system",
+            "content": (
+                "Eres un asesor inmobiliario profesional, empático y humano. "
+                "Tu trabajo es conversar de forma natural para entender las necesidades del usuario. "
+                "No puedes mostrar propiedades hasta que el sistema te las entregue explícitamente. "
+                "No inventes información, no hagas promesas implícitas ni digas frases como 'estoy buscando'. "
+                "Adáptate al tono del usuario y mantén una conversación fluida, útil y realista."
+            )
+        })
+
+    filtros_actuales = memory.get_filters(session_id)
+    flags = memory.get_flags(session_id)
+
+    logger.debug("🧪 Extrayendo filtros del mensaje", extra={"session_id": session_id})
+    with ejecutor_etapas.medir("filtros"):
         nuevos_filtros = extract_filters_from_text(data.message, db, filtros_actuales)
 
-        if nuevos_filtros:
-            logger.debug("🆕 Nuevos filtros detectados", extra={"session_id": session_id, "nuevos_filtros": nuevos_filtros})
-            memory.update_filters(session_id, nuevos_filtros)
-            filtros_actuales = memory.get_filters(session_id)
+    if nuevos_filtros:
+        logger.debug("🆕 Nuevos filtros detectados", extra={"session_id": session_id, "nuevos_filtros": nuevos_filtros})
+        memory.update_filters(session_id, nuevos_filtros)
+        filtros_actuales = memory.get_filters(session_id)
 
-        filtros_completos = filters_estan_completos(filtros_actuales)
-        logger.debug("📋 ¿Filtros completos?", extra={"session_id": session_id, "completos": filtros_completos})
-        memory.set_flag(session_id, "filtros_completos", filtros_completos)
+    filtros_completos = filters_estan_completos(filtros_actuales)
+    logger.debug("📋 ¿Filtros completos?", extra={"session_id": session_id, "completos": filtros_completos})
+    memory.set_flag(session_id, "filtros_completos", filtros_completos)
 
-        try:
+    try:
+        with ejecutor_etapas.medir("confirmacion"):
             if es_confirmacion_usuario_embeddings(data.message):
                 logger.info("✅ Confirmación detectada por embeddings", extra={"session_id": session_id})
                 memory.set_flag(session_id, "mostrar_propiedad", True)
@@ -79,148 +179,242 @@ async def chat_handler(
                 logger.info("✅ Confirmación detectada por regex", extra={"session_id": session_id})
                 memory.set_flag(session_id, "mostrar_propiedad", True)
                 flags["mostrar_propiedad"] = True
-        except Exception:
-            logger.warning("⚠️ Error evaluando confirmación del usuario", exc_info=True, extra={"session_id": session_id})
+    except Exception:
+        logger.warning("⚠️ Error evaluando confirmación del usuario", exc_info=True, extra={"session_id": session_id})
 
-        if flags.get("mostrar_propiedad"):
-            if filtros_completos:
-                logger.info("🔍 Buscando propiedad ideal", extra={"session_id": session_id, "filtros": filtros_actuales})
+    if flags.get("mostrar_propiedad"):
+        if filtros_completos:
+            logger.info("🔍 Buscando propiedad ideal", extra={"session_id": session_id, "filtros": filtros_actuales})
+            with ejecutor_etapas.medir("busqueda"):
                 propiedad = buscar_propiedad_ideal(db, filtros_actuales)
 
-                if propiedad:
-                    logger.info("🏡 Propiedad encontrada", extra={"session_id": session_id, "titulo": propiedad.titulo})
-
-                    resumen = (
-                        f"Nombre: {propiedad.titulo}\n"
-                        f"Ciudad: {propiedad.ciudad}\n"
-                        f"Barrio: {propiedad.barrio}\n"
-                        f"Precio: ${int(propiedad.precio):,}\n"
-                        f"Tipo: {propiedad.tipo}\n"
-                        f"Área: {propiedad.area_m2} m²\n"
-                        f"Habitaciones: {propiedad.habitaciones}\n"
-                        f"Baños: {propiedad.banos}\n"
-                        f"Parqueaderos: {propiedad.carros}"
+            if propiedad:
+                logger.info("🏡 Propiedad encontrada", extra={"session_id": session_id, "titulo": propiedad.titulo})
+
+                resumen = (
+                    f"Nombre: {propiedad.titulo}\n"
+                    f"Ciudad: {propiedad.ciudad}\n"
+                    f"Barrio: {propiedad.barrio}\n"
+                    f"Precio: ${int(propiedad.precio):,}\n"
+                    f"Tipo: {propiedad.tipo}\n"
+                    f"Área: {propiedad.area_m2} m²\n"
+                    f"Habitaciones: {propiedad.habitaciones}\n"
+                    f"Baños: {propiedad.banos}\n"
+                    f"Parqueaderos: {propiedad.carros}"
+                )
+
+                history.append({
+                    "role": "system",
+                    "content": (
+                        f"Estos son los datos REALES de la propiedad más adecuada según lo que pidió el usuario:\n"
+                        f"{resumen}\n"
+                        f"Redacta una respuesta natural, cálida y profesional como asesor humano, "
+                        f"sin inventar nada. Incluye el nombre exacto de la propiedad. No repitas barrio y ciudad innecesariamente."
                     )
+                })
 
-                    history.append({
-                        "role": "system",
-                        "content": (
-                            f"Estos son los datos REALES de la propiedad más adecuada según lo que pidió el usuario:\n"
-                            f"{resumen}\n"
-                            f"Redacta una respuesta natural, cálida y profesional como asesor humano, "
-                            f"sin inventar nada. Incluye el nombre exacto de la propiedad. No repitas barrio y ciudad innecesariamente."
-                        )
-                    })
-
-                    logger.debug("🧠 Llamando al modelo con resumen real", extra={"session_id": session_id})
-                    model_response = await llm.chat(data.message, history)
-
-                    if propiedad.slug and propiedad.imagenes:
-                        imagenes = [img.url_imagen for img in propiedad.imagenes[:3] if img.url_imagen]
-                        if imagenes:
-                            url = f"https://multihabitat.lat/inmueble/{propiedad.slug}/"
-                            group_id = uuid4().hex
-                            imagenes_html = "".join([
-                                f'<img src="{img}" data-full="{img}" data-group="{group_id}" loading="lazy" class="zoomable-img" '
-                                f'style="width: 120px; max-width: 100%; border-radius: 10px; '
-                                f'margin-right: 0.5rem; margin-bottom: 0.5rem; cursor: zoom-in;" alt="{propiedad.titulo}">'
-                                for img in imagenes
-                            ])
-                            model_response += (
-                                f"<div style='display: flex; flex-wrap: wrap; margin-top: 0.25rem; margin-bottom: 0.5rem;'>"
-                                f"{imagenes_html}</div>"
-                                f"<a href='{url}' target='_blank' "
-                                f"style='display: inline-flex; align-items: center; gap: 0.4rem; color: #0d6efd; "
-                                f"text-decoration: none; font-weight: 500;'>"
-                                f"<i class='bi bi-box-arrow-up-right'></i> Ver esta propiedad en Multihabitat</a>"
-                            )
+                logger.debug("🧠 Llamando al modelo con resumen real", extra={"session_id": session_id})
+                return history, propiedad, None
+            else:
+                # Detectó intención de ver pero no hay datos completos
+                logger.info("❗ El usuario quiere ver propiedades pero faltan filtros", extra={"session_id": session_id})
 
-                    memory.set_flag(session_id, "mostrar_propiedad", False)
-                    memory.add_message(session_id, "user", data.message)
-                    memory.add_message(session_id, "assistant", model_response)
-                    logger.info("📤 Respuesta generada con propiedad", extra={"session_id": session_id})
-                    model_response = limpiar_texto_parentesis(model_response)
-                    model_response = limpiar_prefijo_llm(model_response)
-                    return ChatResponse(response=model_response)
-                else:
-                    # Detectó intención de ver pero no hay datos completos
-                    logger.info("❗ El usuario quiere ver propiedades pero faltan filtros", extra={"session_id": session_id})
-
-                    campos_requeridos = ["tipo", "ciudad", "barrio", "habitaciones", "banos", "area_m2"]
-                    campos_faltantes = [campo for campo in campos_requeridos if filtros_actuales.get(campo) in [None, "", -1]]
-
-                    # Revisión por indiferencia
-                    if es_indiferencia_usuario_embeddings(data.message):
-                        logger.info("🙃 Usuario expresó indiferencia al elegir filtros", extra={"session_id": session_id})
-                        for campo in campos_faltantes:
-                            memory.update_filter(session_id, campo, "no importa")
-                        filtros_actualizados = memory.get_filters(session_id)
-                        memory.set_flag(session_id, "filtros_completos", filters_estan_completos(filtros_actualizados))
-                        # Reintentar flujo normal en próxima llamada
-                    else:
-                        campo = campos_faltantes[0] if campos_faltantes else None
-                        sugerencia = SUGERENCIAS_FILTROS_FALTANTES.get(
-                            campo, "¿Podrías darme un poco más de información para ayudarte mejor?"
-                        )
-
-                        respuesta = (
-                            "¡Estoy casi listo para mostrarte la propiedad ideal! "
-                            f"Pero antes necesito un detalle más: {sugerencia}"
-                        )
-
-                        memory.add_message(session_id, "user", data.message)
-                        memory.add_message(session_id, "assistant", respuesta)
-                        memory.set_flag(session_id, "mostrar_propiedad", False)
-
-                        return ChatResponse(response=respuesta)
-
-        logger.debug("🔕 Faltan confirmaciones, consultando al modelo sin propiedad", extra={"session_id": session_id})
-        if flags.get("filtros_completos") and not flags.get("mostrar_propiedad"):
-            history.append({
-                "role": "system",
-                "content": (
-                    "Aunque el usuario ha proporcionado suficientes datos para encontrar una propiedad, "
-                    "NO debes inventar ninguna propiedad ni suponer resultados. Espera a que el usuario "
-                    "confirme explícitamente que desea ver las propiedades. Puedes seguir conversando normalmente."
-                )
-            })
+                campos_requeridos = ["tipo", "ciudad", "barrio", "habitaciones", "banos", "area_m2"]
+                campos_faltantes = [campo for campo in campos_requeridos if filtros_actuales.get(campo) in [None, "", -1]]
 
-        model_response = await llm.chat(data.message, history)
+                # Revisión por indiferencia
+                with ejecutor_etapas.medir("indiferencia"):
+                    indiferencia = es_indiferencia_usuario_embeddings(data.message)
+                if indiferencia:
+                    logger.info("🙃 Usuario expresó indiferencia al elegir filtros", extra={"session_id": session_id})
+                    for campo in campos_faltantes:
+                        memory.update_filter(session_id, campo, "no importa")
+                    filtros_actualizados = memory.get_filters(session_id)
+                    memory.set_flag(session_id, "filtros_completos", filters_estan_completos(filtros_actualizados))
+                    # Reintentar flujo normal en próxima llamada
+                else:
+                    campo = campos_faltantes[0] if campos_faltantes else None
+                    sugerencia = SUGERENCIAS_FILTROS_FALTANTES.get(
+                        campo, "¿Podrías darme un poco más de información para ayudarte mejor?"
+                    )
 
-        propiedades = db.query(Inmueble).filter(Inmueble.slug != None).all()
-        nombres_propiedades = [p.titulo for p in propiedades]
-        mencionadas = get_close_matches(model_response, nombres_propiedades, n=1, cutoff=0.6)
-
-        if mencionadas:
-            logger.debug("🔗 El modelo mencionó una propiedad real", extra={"session_id": session_id, "mencionada": mencionadas[0]})
-            inmueble = next((p for p in propiedades if p.titulo == mencionadas[0]), None)
-            if inmueble and inmueble.imagenes:
-                imagenes = [img.url_imagen for img in inmueble.imagenes[:3] if img.url_imagen]
-                if imagenes:
-                    url = f"https://multihabitat.lat/inmueble/{inmueble.slug}/"
-                    group_id = uuid4().hex
-                    imagenes_html = "".join([
-                        f'<img src="{img}" data-full="{img}" data-group="{group_id}" loading="lazy" class="zoomable-img" '
-                        f'style="width: 120px; max-width: 100%; border-radius: 10px; '
-                        f'margin-right: 0.5rem; margin-bottom: 0.5rem; cursor: zoom-in;" alt="{inmueble.titulo}">'
-                        for img in imagenes
-                    ])
-                    model_response += (
-                        f"<div style='display: flex; flex-wrap: wrap; margin-top: 0.25rem; margin-bottom: 0.5rem;'>"
-                        f"{imagenes_html}</div>"
-                        f"<a href='{url}' target='_blank' "
-                        f"style='display: inline-flex; align-items: center; gap: 0.4rem; color: #0d6efd; "
-                        f"text-decoration: none; font-weight: 500;'>"
-                        f"<i class='bi bi-box-arrow-up-right'></i> Ver esta propiedad en Multihabitat</a>"
+                    respuesta = (
+                        "¡Estoy casi listo para mostrarte la propiedad ideal! "
+                        f"Pero antes necesito un detalle más: {sugerencia}"
                     )
 
+                    memory.add_message(session_id, "user", data.message)
+                    memory.add_message(session_id, "assistant", respuesta)
+                    memory.set_flag(session_id, "mostrar_propiedad", False)
+
+                    return history, None, respuesta
+
+    logger.debug("🔕 Faltan confirmaciones, consultando al modelo sin propiedad", extra={"session_id": session_id})
+    if flags.get("filtros_completos") and not flags.get("mostrar_propiedad"):
+        history.append({
+            "role": "system",
+            "content": (
+                "Aunque el usuario ha proporcionado suficientes datos para encontrar una propiedad, "
+                "NO debes inventar ninguna propiedad ni suponer resultados. Espera a que el usuario "
+                "confirme explícitamente que desea ver las propiedades. Puedes seguir conversando normalmente."
+            )
+        })
+
+    return history, None, None
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_handler(
+    data: ChatRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    token_validado: None = Depends(verificar_token)
+):
+    session_id = data.session_id or "default_session"
+    logger.info("📩 POST /chat recibido", extra={"session_id": session_id, "mensaje": data.message})
+    _verificar_arranque(session_id)
+
+    llm = request.app.state.llm
+    memory = request.app.state.memory
+
+    try:
+        # Rechazo temprano: no vale la pena extraer filtros si la cola ya está llena
+        llm.planificador.verificar_admision()
+
+        # Fuera del event loop: los embeddings de turnos simultáneos se codifican en un mismo lote
+        history, propiedad, respuesta_directa = await ejecutor_etapas.en_hilo(
+            "preparar_turno", _preparar_turno, data, session_id, memory, db, llm.contar_tokens_mensaje
+        )
+        if respuesta_directa is not None:
+            return ChatResponse(response=respuesta_directa)
+
+        cancelacion = threading.Event()
+        vigilante = asyncio.create_task(_vigilar_desconexion(request, cancelacion, session_id))
+        try:
+            model_response = await llm.chat(data.message, history, session_id=session_id, cancelacion=cancelacion)
+        finally:
+            vigilante.cancel()
+
+        if cancelacion.is_set():
+            # Nadie leerá la respuesta: no se guarda en memoria para que el reintento parta limpio
+            return Response(status_code=499)
+
+        # Las imágenes se cargan de forma perezosa desde la BD: también fuera del event loop
+        if propiedad:
+            model_response += await ejecutor_etapas.en_hilo("bloque_propiedad", _bloque_imagenes, propiedad)
+            memory.set_flag(session_id, "mostrar_propiedad", False)
+            mensaje_log = "📤 Respuesta generada con propiedad"
+        else:
+            model_response += await ejecutor_etapas.en_hilo(
+                "propiedad_mencionada", _bloque_propiedad_mencionada, model_response, db, session_id
+            )
+            mensaje_log = "📤 Respuesta generada (sin mostrar propiedad)"
+
         memory.add_message(session_id, "user", data.message)
         memory.add_message(session_id, "assistant", model_response)
-        logger.info("📤 Respuesta generada (sin mostrar propiedad)", extra={"session_id": session_id})
-        model_response = limpiar_texto_parentesis(model_response)
-        model_response = limpiar_prefijo_llm(model_response)
+        logger.info(mensaje_log, extra={"session_id": session_id})
+        # La misma limpieza que aplica `LimpiadorIncremental` en /chat/stream
+        model_response = limpiar_respuesta_llm(model_response)
         return ChatResponse(response=model_response)
 
+    except ColaInferenciaLlena as e:
+        raise _error_cola_llena(e, session_id)
     except Exception as e:
         logger.error("💥 Error en el endpoint /chat", exc_info=True, extra={"session_id": session_id})
-        raise HTTPException(status_code=500, detail="Error interno al procesar el mensaje.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error interno al procesar el mensaje.")
+
+
+def _evento_sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_handler(
+    data: ChatRequest,
+    request: Request,
+    db: Session = Depends(get_db),
+    token_validado: None = Depends(verificar_token)
+):
+    """
+    Igual que /chat, pero entrega la respuesta como Server-Sent Events:
+    `token` por cada fragmento limpio, `propiedad` con el bloque de imágenes/enlace
+    (si aplica) y `fin` al terminar.
+    """
+    session_id = data.session_id or "default_session"
+    logger.info("📩 POST /chat/stream recibido", extra={"session_id": session_id, "mensaje": data.message})
+    _verificar_arranque(session_id)
+
+    llm = request.app.state.llm
+    memory = request.app.state.memory
+
+    try:
+        llm.planificador.verificar_admision()
+
+        # Fuera del event loop: los embeddings de turnos simultáneos se codifican en un mismo lote
+        history, propiedad, respuesta_directa = await ejecutor_etapas.en_hilo(
+            "preparar_turno", _preparar_turno, data, session_id, memory, db, llm.contar_tokens_mensaje
+        )
+        # La sesión de BD de la dependencia se cierra antes de emitir el cuerpo,
+        # así que el bloque de la propiedad se arma aquí.
+        bloque_propiedad = await ejecutor_etapas.en_hilo("bloque_propiedad", _bloque_imagenes, propiedad) if propiedad else ""
+    except ColaInferenciaLlena as e:
+        raise _error_cola_llena(e, session_id)
+    except Exception:
+        logger.error("💥 Error preparando /chat/stream", exc_info=True, extra={"session_id": session_id})
+        raise HTTPException(status_code=500, detail="Error interno al procesar el mensaje.")
+
+    # Si el cliente se desconecta, StreamingResponse cancela este generador y
+    # `chat_stream` corta la generación en el siguiente token.
+    async def eventos():
+        if respuesta_directa is not None:
+            yield _evento_sse("token", {"texto": respuesta_directa})
+            yield _evento_sse("fin", {})
+            return
+
+        try:
+            limpiador = LimpiadorIncremental()
+            fragmentos = []
+
+            async for fragmento in llm.chat_stream(data.message, history, session_id=session_id):
+                fragmentos.append(fragmento)
+                texto = limpiador.procesar(fragmento)
+                if texto:
+                    yield _evento_sse("token", {"texto": texto})
+
+            texto = limpiador.finalizar()
+            if texto:
+                yield _evento_sse("token", {"texto": texto})
+
+            # Igual que lo que guarda /chat: sin etiquetas de rol, con los paréntesis
+            model_response = limpiar_roles_llm("".join(fragmentos).strip())
+
+            if propiedad:
+                bloque = bloque_propiedad
+                memory.set_flag(session_id, "mostrar_propiedad", False)
+                mensaje_log = "📤 Respuesta en streaming generada con propiedad"
+            else:
+                bloque = await ejecutor_etapas.en_hilo(
+                    "propiedad_mencionada", _bloque_propiedad_mencionada_sesion_propia, model_response, session_id
+                )
+                mensaje_log = "📤 Respuesta en streaming generada (sin mostrar propiedad)"
+
+            if bloque:
+                yield _evento_sse("propiedad", {"html": bloque})
+
+            memory.add_message(session_id, "user", data.message)
+            memory.add_message(session_id, "assistant", model_response + bloque)
+            logger.info(mensaje_log, extra={"session_id": session_id})
+            yield _evento_sse("fin", {})
+
+        except ColaInferenciaLlena as e:
+            logger.warning("🚧 /chat/stream rechazado por cola de inferencia llena", extra={"session_id": session_id})
+            yield _evento_sse("error", {"detalle": "Cola de inferencia llena.", "retry_after": e.retry_after})
+        except Exception:
+            logger.error("💥 Error en el endpoint /chat/stream", exc_info=True, extra={"session_id": session_id})
+            yield _evento_sse("error", {"detalle": "Error interno al procesar el mensaje."})
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
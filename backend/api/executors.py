@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from backend.llm_engine.telemetry import Histograma
+from backend.logger_setup import get_logger
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable
+import threading
+import asyncio
+import time
+import os
+
+logger = get_logger(__name__)
+
+# Hilos para lo que suelta el GIL (torch/onnxruntime, consultas a la BD) y etapas cortas
+HILOS_EJECUTOR = int(os.getenv("EJECUTOR_HILOS", "8"))
+
+# Una etapa más lenta que el último límite queda en `desbordados` (el percentil no pasa a inf)
+BUCKETS_ETAPAS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+class EjecutorEtapas:
+    """
+    Saca del event loop las etapas pesadas de cada turno (filtros, embeddings, fuzzy matching,
+    consultas síncronas de SQLAlchemy) para que un mensaje costoso no frene al resto de
+    solicitudes ni a `/health`, y mide cuánto tarda cada etapa.
+
+    - `en_hilo`: pool de hilos; sirve para todo lo que suelta el GIL o espera E/S.
+    - `medir`: cronometra una etapa que ya corre fuera del event loop.
+    """
+    def __init__(self, hilos: int = HILOS_EJECUTOR):
+        self.max_hilos = max(1, hilos)
+        self.hilos = ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix="etapas")
+        self._lock = threading.Lock()
+        self._duracion = {}
+        self._espera = {}
+
+    def _observar(self, registro: dict, etapa: str, segundos: float):
+        with self._lock:
+            if etapa not in registro:
+                registro[etapa] = Histograma(BUCKETS_ETAPAS)
+            registro[etapa].observar(segundos)
+
+    @contextmanager
+    def medir(self, etapa: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._observar(self._duracion, etapa, time.perf_counter() - inicio)
+
+    def _ejecutar_medido(self, etapa: str, enviado: float, fn: Callable, *args, **kwargs):
+        self._observar(self._espera, etapa, time.perf_counter() - enviado)
+        with self.medir(etapa):
+            return fn(*args, **kwargs)
+
+    async def en_hilo(self, etapa: str, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        tarea = partial(self._ejecutar_medido, etapa, time.perf_counter(), fn, *args, **kwargs)
+        return await loop.run_in_executor(self.hilos, tarea)
+
+    def cerrar(self):
+        self.hilos.shutdown(wait=False, cancel_futures=True)
+
+    def estado(self) -> dict:
+        with self._lock:
+            duracion = {etapa: h.estado() for etapa, h in self._duracion.items()}
+            espera = {etapa: h.estado() for etapa, h in self._espera.items()}
+        return {
+            "hilos": self.max_hilos,
+            "etapas_s": duracion,
+            "espera_pool_s": espera
+        }
+
+
+# Instancia única del proceso
+ejecutor_etapas = EjecutorEtapas()
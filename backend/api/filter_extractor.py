@@ -1,17 +1,17 @@
-from sentence_transformers import SentenceTransformer, util
-from sklearn.metrics.pairwise import cosine_similarity
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.embeddings.intent_classifier import clasificador_intenciones
+from backend.embeddings.anchor_banks import banco_anclas
+from backend.api.utils.regex_matcher import EscanerPatrones
+from backend.api.utils.location_index import indice_ubicaciones
+from backend.api.executors import ejecutor_etapas
+from backend.api.utils.place_mentions import menciones_ubicaciones
 from backend.db.models.property import Inmueble
 from backend.logger_setup import get_logger
 from difflib import get_close_matches
-from rapidfuzz import fuzz, process
+from rapidfuzz import fuzz
 from sqlalchemy.orm import Session
-import string
 import re
 
-from backend.api.utils.dictionaries import (
-    BARRIOS, URBANIZACIONES, PARCELACIONES_CAMPESTRES,
-    CORREGIMIENTOS_VEREDAS
-)
 from backend.api.utils.ubicaciones_guadalajara_de_buga import UBICACIONES_GUADALAJARA_DE_BUGA
 
 logger = get_logger(__name__)
@@ -33,130 +33,24 @@ REGEX_BASE = {
     "area_m2": r"(\d{2,4})\s*(m2|mts|metros\s+cuadrados?)",
     "precio": r"(\$?\d+(?:[\.,]?\d+)?)(?:\s?(mil|millones|mill[oó]n|k|k\s?cop|cop|m)?)"
 }
+banco_tipos = banco_anclas("tipos_propiedad", list(REGEX_BASE["tipo"].keys()))
 
-# === Carga de modelo ligero para embeddings semánticos ===
-modelo_embed = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-frases_confirmacion = [
-    # Confirmaciones Directas
-    "muéstrame la propiedad",
-    "quiero verla",
-    "enséñamela",
-    "ver más detalles",
-    "muéstramela",
-    "quiero ver opciones",
-    "ver resultados",
-    "sí quiero verla",
-    "mostrar propiedad",
-    "ver detalles de la casa",
-    "déjamela ver",
-
-    # Frases Cortas e Informales
-    "verla",
-    "ver eso",
-    "ver la opción",
-    "ver alternativa",
-    "ok, muéstramela",
-    "dale, quiero verla",
-    "a ver qué tienes",
-    "hazlo",
-    "listo, quiero verla",
-    "de una, muéstrame",
-    "ya quiero verla",
-
-    # Estilo Cliente Relajado
-    "mostrame lo que hay",
-    "tírame el dato",
-    "suelta lo que tengas",
-    "a ver qué hay",
-    "muéstrame qué hay por ahí",
-    "a ver si esa sirve",
-    "mostrámela",
-    "déjala ver",
-    "eso me interesa, muéstrala",
-    "quiero ver esa casa",
-    "veamos esa",
-
-    # Confirmaciones Implícitas
-    "esa me interesa",
-    "me interesa verla",
-    "me sirve esa",
-    "esa podría funcionar",
-    "suena bien esa",
-    "creo que esa me gusta",
-    "quiero saber más",
-    "quisiera más información",
-    "me gustaría verla",
-
-    # Estilo Formal y Educado
-    "podrías mostrármela",
-    "¿me la puedes mostrar?",
-    "es posible verla",
-    "quisiera ver la propiedad",
-    "me gustaría conocerla",
-    "me gustaría verla",
-    "me interesa conocer más detalles",
-
-    # Regionalismos y Modismos Locales
-    "de una, enséñamela",
-    "ya pues, muéstramela",
-    "eso está bien, muéstrala",
-    "dale, mostrame esa",
-    "déjamela ver un momentico",
-    "veámosla entonces",
-
-    # Estilo "Eso es todo"
-    "eso es todo",
-    "con eso está bien",
-    "suficiente por ahora",
-    "listo, gracias",
-    "no necesito más",
-    "hasta ahí está bien",
-    "con eso me sirve",
-    "ya con eso",
-    "eso era",
-    "no es más",
-
-    # Estilo "Así está bien"
-    "está perfecto así",
-    "así está bien",
-    "tal como está",
-    "me parece bien",
-    "me quedo con esa",
-    "esa me gusta, gracias",
-    "con esa opción me quedo",
-    "esa está buena",
-    "esa me convence",
-    "funciona para mí",
-
-    # Estilo "No necesito más info"
-    "no hace falta más",
-    "no me muestres más",
-    "no tengo más preguntas",
-    "ya me mostraste suficiente",
-    "ya entendí",
-    "ya vi lo que quería",
-    "gracias, ya está",
-    "cerramos con esa",
-    "no busques más",
-    "suficiente info por ahora",
-
-    # Estilo informal / WhatsApp
-    "joya",
-    "va que va",
-    "re bien, gracias",
-    "todo bien",
-    "finito",
-    "eso era lo que quería",
-    "ya estuvo",
-    "de una, esa es",
-    "cerramos",
-    "va esa",
-]
-embeddings_base = modelo_embed.encode(frases_confirmacion, convert_to_tensor=True)
+# === Escáneres precompilados: una pasada por el texto en lugar de un regex por campo ===
+# Si varios tipos aparecen gana el último del diccionario; por eso la alternancia va al revés
+_ORDEN_TIPOS = {tipo: i for i, tipo in enumerate(REGEX_BASE["tipo"])}
+ESCANER_TIPOS = EscanerPatrones(dict(reversed(list(REGEX_BASE["tipo"].items()))))
+ESCANER_NUMERICOS = EscanerPatrones({
+    campo: patron for campo, patron in REGEX_BASE.items() if campo not in ("tipo", "precio")
+}, anticipo=r"(?=\d)")
+PATRON_PRECIO = re.compile(REGEX_BASE["precio"])
+
+def detectar_tipo_por_regex(text: str) -> str | None:
+    tipos = ESCANER_TIPOS.etiquetas_presentes(text)
+    return max(tipos, key=_ORDEN_TIPOS.get) if tipos else None
 
 # === Cargar modelo de embeddings para usarlo ===
 def get_embed_model():
-    return modelo_embed
+    return servicio_embeddings.modelo
 
 # === Ajustar el precio ===
 def parse_precio(precio_str: str) -> int | None:
@@ -207,7 +101,7 @@ def parse_precio(precio_str: str) -> int | None:
     if posibles:
         unidad = posibles[0]
     else:
-        unidad = corregir_unidad_con_embeddings(unidad_raw, modelo_embed)
+        unidad = corregir_unidad_con_embeddings(unidad_raw)
         if not unidad:
             logger.warning("Unidad desconocida, incluso con embeddings", extra={"unidad_detectada": unidad_raw})
     
@@ -280,14 +174,15 @@ PALABRAS_CLAVE_PRECIO = [
     "euros",
     "€"
 ]
+banco_precio = banco_anclas("contexto_precio", PALABRAS_CLAVE_PRECIO)
 
-def es_contexto_de_precio(texto):
-    texto_emb = modelo_embed.encode(texto, convert_to_tensor=True)
-    ejemplos = PALABRAS_CLAVE_PRECIO
-    ejemplos_emb = modelo_embed.encode(ejemplos, convert_to_tensor=True)
+UNIDADES_VALIDAS = ["mil", "millón", "millones", "m", "k", "cop"]
+banco_unidades = banco_anclas("unidades_precio", UNIDADES_VALIDAS)
 
-    similitudes = util.cos_sim(texto_emb, ejemplos_emb)
-    return similitudes.max() > 0.65
+def es_contexto_de_precio(texto):
+    if clasificador_intenciones.disponible:
+        return clasificador_intenciones.es(texto, "precio")
+    return banco_precio.maxima(texto) > 0.65
 
 def contiene_palabra_similar(texto: str, palabras_clave: list, umbral=80) -> bool:
     """
@@ -300,14 +195,10 @@ def contiene_palabra_similar(texto: str, palabras_clave: list, umbral=80) -> boo
                 return True
     return False
 
-def corregir_unidad_con_embeddings(unidad_raw: str, modelo) -> str | None:
-    unidades_validas = ["mil", "millón", "millones", "m", "k", "cop"]
-    unidad_emb = modelo.encode([unidad_raw], convert_to_tensor=True)
-    unidades_emb = modelo.encode(unidades_validas, convert_to_tensor=True)
-    similitudes = util.cos_sim(unidad_emb, unidades_emb)[0]
-    idx_max = similitudes.argmax().item()
-    if similitudes[idx_max] > 0.6:
-        return unidades_validas[idx_max]
+def corregir_unidad_con_embeddings(unidad_raw: str) -> str | None:
+    unidad, similitud = banco_unidades.mejor(unidad_raw)
+    if similitud > 0.6:
+        return unidad
     return None
 
 def elegir_precio_mas_confiable(matches):
@@ -343,99 +234,57 @@ def elegir_precio_mas_confiable(matches):
 def extract_filters_from_text(message: str, db: Session, current_filters: dict) -> dict:
     text = message.lower()
     filters = current_filters.copy()
-    text_tokens = text.translate(str.maketrans("", "", string.punctuation)).split()
-    # --- Procesar cada campo con expresiones regulares ---
-    for field, pattern_or_dict in REGEX_BASE.items():
-        if field == "precio":
-            matches = re.findall(pattern_or_dict, text)
-            mejor_precio = elegir_precio_mas_confiable(matches)
-            if mejor_precio:
-                filters[field] = mejor_precio
-            continue
-
-        if isinstance(pattern_or_dict, dict):
-            for value, pattern in pattern_or_dict.items():
-                if value not in filters and re.search(pattern, text):
-                    filters[field] = value
-        else:
-            matches = re.findall(pattern_or_dict, text)
-            if matches:
-                try:
-                    numeros = [int(m[0]) for m in matches if m[0].isdigit()]
-                    if numeros:
-                        filters[field] = max(numeros)
-                except Exception as e:
-                    logger.warning("Error al interpretar valores numéricos", extra={"error": str(e), "matches": matches})
-
-    # Unificar todas las ubicaciones de Buga
-    ubicaciones_buga = set()
-
-    for comuna_dict in [BARRIOS, URBANIZACIONES]:
-        for barrios in comuna_dict.values():
-            ubicaciones_buga.update(barrios)
-
-    for zonas_dict in [CORREGIMIENTOS_VEREDAS, PARCELACIONES_CAMPESTRES]:
-        for subzona in zonas_dict.values():
-            if isinstance(subzona, dict):
-                for veredas in subzona.values():
-                    ubicaciones_buga.update(veredas)
-            else:
-                ubicaciones_buga.update(subzona)
-
-    # Agregar explícitamente las del mapa de ubicaciones
-    ubicaciones_buga.update(UBICACIONES_GUADALAJARA_DE_BUGA.keys())
-
-    ubicaciones_lower = {u.lower(): u for u in ubicaciones_buga}
-    n = len(text_tokens)
-    frases_generadas = []
-
-    # Sliding windows de 1 a 5 tokens
-    for size in range(1, 6):
-        for i in range(n - size + 1):
-            frase = " ".join(text_tokens[i:i + size])
-            frases_generadas.append(frase)
-
-    for fragmento in frases_generadas:
-        posibles = get_close_matches(fragmento, list(ubicaciones_lower.keys()), n=1, cutoff=0.8)
-        if posibles:
-            ubicacion_detectada = ubicaciones_lower[posibles[0]]
-            if not filters.get("barrio"):
-                filters["barrio"] = ubicacion_detectada
+    # --- Procesar los campos con los escáneres precompilados ---
+    tipo = detectar_tipo_por_regex(text)
+    if tipo:
+        filters["tipo"] = tipo
+
+    for field, matches in ESCANER_NUMERICOS.grupos_por_etiqueta(text).items():
+        try:
+            numeros = [int(m[0]) for m in matches if m[0].isdigit()]
+            if numeros:
+                filters[field] = max(numeros)
+        except Exception as e:
+            logger.warning("Error al interpretar valores numéricos", extra={"error": str(e), "matches": matches})
+
+    mejor_precio = elegir_precio_mas_confiable(PATRON_PRECIO.findall(text))
+    if mejor_precio:
+        filters["precio"] = mejor_precio
+
+    # --- Menciones exactas de ciudades y barrios (catálogo de la BD y diccionarios de Buga) ---
+    # Una sola pasada de Aho-Corasick, sin ir a la BD: el catálogo vive en memoria
+    with ejecutor_etapas.medir("menciones_ubicaciones"):
+        menciones = menciones_ubicaciones.buscar(db, message)
+    for campo, valor in menciones:
+        if not filters.get(campo):
+            filters[campo] = valor
+
+    # Sin mención exacta: ventanas de 1 a 5 tokens contra el índice difuso de ubicaciones de Buga
+    if not filters.get("barrio"):
+        with ejecutor_etapas.medir("ubicacion_fuzzy"):
+            ubicacion = indice_ubicaciones.buscar(message)
+        if ubicacion:
+            fragmento, ubicacion_detectada, puntaje = ubicacion
+            filters["barrio"] = ubicacion_detectada
             if not filters.get("ciudad") and ubicacion_detectada in UBICACIONES_GUADALAJARA_DE_BUGA:
                 filters["ciudad"] = UBICACIONES_GUADALAJARA_DE_BUGA[ubicacion_detectada]
             logger.debug("Ubicación detectada por fuzzy sliding window", extra={
                 "input_fragment": fragmento,
-                "match": ubicacion_detectada
+                "match": ubicacion_detectada,
+                "score": puntaje
             })
-            break
-
-    # --- Extraer ciudad y barrio desde la BD con más precisión ---
-    ciudades = {i.ciudad.strip() for i in db.query(Inmueble.ciudad).distinct() if i.ciudad}
-    barrios = {i.barrio.strip() for i in db.query(Inmueble.barrio).distinct() if i.barrio}
-
-    for ciudad in ciudades:
-        if ciudad.lower() in text and "ciudad" not in filters:
-            filters["ciudad"] = ciudad
-
-    for barrio in barrios:
-        if barrio.lower() in text and "barrio" not in filters:
-            filters["barrio"] = barrio
 
     # Si no se detectó 'tipo', intentar con embeddings
     if "tipo" not in filters:
-        tipos_validos = list(REGEX_BASE["tipo"].keys())
-        embedding_mensaje = modelo_embed.encode([text], convert_to_tensor=True)
-        embedding_tipos = modelo_embed.encode(tipos_validos, convert_to_tensor=True)
-        similitudes = util.pytorch_cos_sim(embedding_mensaje, embedding_tipos)[0]
-
-        idx_max = similitudes.argmax().item()
-        score_max = similitudes[idx_max].item()
+        # El modelo no distingue mayúsculas: con el mensaje original se reutiliza el vector
+        # que ya calcularon los detectores de confirmación e indiferencia en este turno
+        tipo_detectado, score_max = banco_tipos.mejor(message)
 
         if score_max >= 0.7:
-            filters["tipo"] = tipos_validos[idx_max]
+            filters["tipo"] = tipo_detectado
             logger.debug("Tipo detectado por embeddings", extra={
                 "mensaje": message,
-                "tipo_detectado": tipos_validos[idx_max],
+                "tipo_detectado": tipo_detectado,
                 "similitud": round(score_max, 4)
             })
 
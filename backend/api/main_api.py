@@ -26,6 +26,8 @@ API_SECRET = os.getenv("API_SECRET")
 logger = get_logger(__name__)
 logger.info("📡 Iniciando FastAPI")
 
+PROMPT_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompt", "prompt_template.txt")
+
 # Detectar modelo y prompt automáticamente
 def detectar_modelo_y_prompt():
     modelo_dir = os.getenv("MODEL_DIR", "/data/storage/models")
@@ -50,48 +52,107 @@ async def idle_loop():
 # Lógica de ciclo de vida (inicialización)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from backend.llm_engine.llm_engine import LLMEngine
     from backend.memory.memory import MemoryManager
-    from backend.api import chat
+    from backend.api.readiness import arranque
+    from backend.cpu_partition import particion_cpu
+    from backend.api.executors import ejecutor_etapas
 
     logger.info("🚀 Inicializando modelo en entorno de producción")
+    logger.info("🧮 Reparto de CPU entre LLM, embeddings y fuzzy matching", extra=particion_cpu.estado())
+    if particion_cpu.sobresuscrita:
+        logger.warning("⚠️ Los hilos asignados superan los núcleos disponibles", extra=particion_cpu.estado())
 
-    try:
-        model_path = os.getenv("MODEL_PATH")
-        prompt_path = os.getenv("PROMPT_PATH")
+    # Lo liviano se crea ya; el LLM y los embeddings se cargan en segundo plano
+    # y /ready informa cuándo terminan
+    app.state.llm = None
+    app.state.memory = MemoryManager()
+    asyncio.create_task(auto_reset_sessions(app))
+
+    arranque.registrar("llm")
+    arranque.registrar("embeddings")
+    arranque.registrar("calentamiento")
+    app.state.carga_modelos = asyncio.create_task(cargar_modelos(app))
+
+    yield
+
+    logger.info("🛑 Cerrando servidor...")
+    if app.state.llm is not None:
+        app.state.llm.cerrar()
+    ejecutor_etapas.cerrar()
+
+async def cargar_modelos(app: FastAPI):
+    """
+    Carga en paralelo el LLM y el modelo de embeddings con sus bancos de anclas; el warm-up
+    va después porque también pasa por los detectores de embeddings.
+    """
+    from backend.api.readiness import arranque
+
+    await asyncio.gather(
+        arranque.ejecutar("llm", lambda: cargar_llm(app)),
+        arranque.ejecutar("embeddings", lambda: asyncio.to_thread(cargar_embeddings))
+    )
+    if app.state.llm is None:
+        arranque.marcar_error("calentamiento", RuntimeError("El LLM no se cargó"))
+        return
+
+    await arranque.ejecutar("calentamiento", lambda: calentar_llm(app.state.llm))
+    if arranque.listo:
+        logger.info("✅ Modelo y memoria cargados correctamente")
 
+def cargar_embeddings():
+    from backend.embeddings.embedding_service import servicio_embeddings
+    from backend.embeddings.anchor_banks import precargar_bancos
+    from backend.embeddings.intent_classifier import clasificador_intenciones
+
+    servicio_embeddings.modelo
+    # Bancos de anclas (confirmación, indiferencia, precio, unidades, tipos) desde .npy
+    precargar_bancos()
+    clasificador_intenciones.disponible
+
+async def cargar_llm(app: FastAPI):
+    from backend.llm_engine.llm_engine import LLMEngine
+    from backend.api import chat
+
+    model_path = os.getenv("MODEL_PATH")
+    prompt_path = os.getenv("PROMPT_PATH")
+
+    if os.getenv("LLM_BACKEND", "llama").strip().lower() == "simulado":
+        # Backend simulado para pruebas de carga: no necesita GGUF
+        logger.warning("🧪 LLM_BACKEND=simulado: las respuestas del modelo son deterministas y falsas")
+        model_path = "simulado"
+        prompt_path = prompt_path or PROMPT_POR_DEFECTO
+    else:
         if not model_path or not prompt_path:
             logger.warning("Rutas no definidas en .env. Intentando detectar automáticamente...")
             model_path, prompt_path = detectar_modelo_y_prompt()
 
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Modelo no encontrado en {model_path}")
-        if not os.path.exists(prompt_path):
-            raise FileNotFoundError(f"Prompt no encontrado en {prompt_path}")
-
-        app.state.llm = LLMEngine(model_path, prompt_path)
-        app.state.memory = MemoryManager()
+    if not os.path.exists(prompt_path):
+        raise FileNotFoundError(f"Prompt no encontrado en {prompt_path}")
 
-        # Se enlaza al módulo de chat
-        chat.llm = app.state.llm
-        chat.model_loaded = True
+    llm = await asyncio.to_thread(LLMEngine, model_path, prompt_path)
+    # Al resetear/limpiar una sesión se libera también su estado en el LLM
+    app.state.memory.registrar_al_eliminar(llm.olvidar_sesion)
 
-        asyncio.create_task(auto_reset_sessions(app))
-
-        logger.info("✅ Modelo y memoria cargados correctamente")
+    # Se enlaza al módulo de chat (que igual espera a /ready para atender)
+    app.state.llm = llm
+    chat.llm = llm
+    chat.model_loaded = True
 
+async def calentar_llm(llm):
+    try:
         dummy_prompt = "Hola, ¿puedes ayudarme a buscar un apartamento?"
         dummy_history = [{"role": "system", "content": "Eres un asistente inmobiliario."}]
         logger.info("🔥 Ejecutando inferencia de calentamiento...")
-        response = await app.state.llm.chat(dummy_prompt, dummy_history)
+        response = await llm.chat(dummy_prompt, dummy_history)
         logger.info(f"✅ Warm-up completado con respuesta: {response[:50]}...")
-    except Exception as e:
-        logger.error("❌ Fallo al inicializar", exc_info=True)
-        logger.warning("⚠️ Fallo el warm-up", exc_info=True)
 
-    yield
-
-    logger.info("🛑 Cerrando servidor...")
+        # Con el modelo ya caliente se evalúa y guarda el prefijo <<SYS>> del template
+        await llm.preparar_cache_prefijo()
+    except Exception:
+        # Un warm-up fallido no impide atender: solo la primera respuesta será más lenta
+        logger.warning("⚠️ Fallo el warm-up", exc_info=True)
 
 # Static y templates
 class CustomStaticFiles(StaticFiles):
@@ -303,11 +364,12 @@ async def home(
 async def custom_http_exception_handler(request: Request, exc: StarletteHTTPException):
     status_code = exc.status_code
 
-    if status_code in {400, 401, 403, 404, 405, 409, 500, 502, 504}:
+    if status_code in {400, 401, 403, 404, 405, 409, 500, 502, 503, 504}:
         template_name = f"{status_code}.html"
     else:
         template_name = "500.html"
 
+    # Se conservan cabeceras como Retry-After
     return templates.TemplateResponse(
         template_name,
         {
@@ -315,7 +377,8 @@ async def custom_http_exception_handler(request: Request, exc: StarletteHTTPExce
             "status_code": status_code,
             "error_detail": exc.detail
         },
-        status_code=status_code
+        status_code=status_code,
+        headers=getattr(exc, "headers", None)
     )
 
 # Handler específico para 422 Unprocessable Entity (error de validación con Pydantic)
@@ -0,0 +1,56 @@
+from backend.logger_setup import get_logger
+from typing import Awaitable, Callable
+import time
+
+logger = get_logger(__name__)
+
+
+class EstadoArranque:
+    """
+    Estado de carga de los componentes pesados (LLM, embeddings), que se cargan en segundo
+    plano después de que el servidor ya acepta conexiones. `/ready` lo expone y `/chat`
+    responde 503 mientras `listo` sea False.
+    """
+    def __init__(self):
+        self._componentes = {}
+        self._inicio = time.monotonic()
+
+    def registrar(self, nombre: str):
+        self._componentes[nombre] = {"estado": "pendiente", "segundos": None, "error": None}
+
+    async def ejecutar(self, nombre: str, cargar: Callable[[], Awaitable]):
+        """
+        Corre la carga de un componente y anota su resultado. Un fallo no detiene a los demás.
+        """
+        componente = self._componentes.setdefault(nombre, {"estado": "pendiente", "segundos": None, "error": None})
+        componente["estado"] = "cargando"
+        inicio = time.perf_counter()
+        try:
+            await cargar()
+        except Exception as e:
+            componente.update({"estado": "error", "error": str(e)})
+            logger.error(f"❌ Falló la carga de {nombre}", exc_info=True)
+            return
+        finally:
+            componente["segundos"] = round(time.perf_counter() - inicio, 2)
+
+        componente["estado"] = "listo"
+        logger.info(f"✅ {nombre} listo en {componente['segundos']} segundos")
+
+    def marcar_error(self, nombre: str, error: Exception):
+        self._componentes[nombre] = {"estado": "error", "segundos": None, "error": str(error)}
+
+    @property
+    def listo(self) -> bool:
+        return bool(self._componentes) and all(c["estado"] == "listo" for c in self._componentes.values())
+
+    def estado(self) -> dict:
+        return {
+            "listo": self.listo,
+            "segundos_desde_inicio": round(time.monotonic() - self._inicio, 1),
+            "componentes": {nombre: dict(componente) for nombre, componente in self._componentes.items()}
+        }
+
+
+# Instancia única del proceso
+arranque = EstadoArranque()
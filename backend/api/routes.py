@@ -3,12 +3,21 @@ from fastapi import APIRouter, Depends, Query, Request
 from backend.db.crud.property import search_properties
 from backend.db.schemas.property import InmuebleOut
 from backend.api.chat import router as chat_router
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.embeddings.anchor_banks import estado_bancos
+from backend.embeddings.intent_classifier import clasificador_intenciones
+from backend.api.readiness import arranque
+from backend.cpu_partition import particion_cpu
+from backend.api.executors import ejecutor_etapas
+from backend.db.location_catalog import catalogo_ubicaciones
 from backend.db.models.property import Inmueble
 from backend.logger_setup import get_logger
 from fastapi.responses import JSONResponse
 from backend.db.database import get_db
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import sys
+import os
 logger = get_logger(__name__)
 router = APIRouter()
 router.include_router(chat_router)
@@ -35,6 +44,15 @@ async def reset_session(session_id: str = Query(...), request: Request = None):
     memory.reset_session(session_id)
     return JSONResponse(content={"status": "reset_ok", "session_id": session_id})
 
+@router.post("/catalogo/invalidar", dependencies=[Depends(verificar_token_web)])
+async def invalidar_catalogo():
+    """
+    Para llamar después de una ingesta de inmuebles: ciudades y barrios se recargan en el siguiente mensaje.
+    """
+    catalogo_ubicaciones.invalidar()
+    logger.info("🗺️ Catálogo de ubicaciones invalidado")
+    return {"status": "invalidado"}
+
 @router.get("/debug/info", dependencies=[Depends(verificar_token_web)])
 async def debug_info(request: Request, db: Session = Depends(get_db)):
     llm = request.app.state.llm
@@ -46,12 +64,54 @@ async def debug_info(request: Request, db: Session = Depends(get_db)):
         "prompt_path": getattr(llm, "prompt_path", "N/A"),
         "sesiones_activas": len(memory.histories),
         "filtros_por_sesion": len(memory.filters),
-        "propiedades_cargadas": db.query(Inmueble).count()
+        "propiedades_cargadas": db.query(Inmueble).count(),
+        "cola_inferencia": llm.planificador.estado() if hasattr(llm, "planificador") else None,
+        "backend_llm": llm.backend.estado() if hasattr(llm, "backend") else None,
+        "embeddings": servicio_embeddings.estado(),
+        "bancos_anclas": estado_bancos(),
+        "clasificador_intenciones": clasificador_intenciones.estado(),
+        "arranque": arranque.estado(),
+        "catalogo_ubicaciones": catalogo_ubicaciones.estado()
     }
 
     logger.debug("🔍 Endpoint /debug/info consultado", extra=info)
     return info
 
+@router.get("/debug/recursos", dependencies=[Depends(verificar_token_web)])
+async def debug_recursos(request: Request):
+    """
+    Reparto de núcleos entre LLM, embeddings y fuzzy matching, y los hilos que cada uno usa de verdad.
+    """
+    llm = request.app.state.llm
+    torch = sys.modules.get("torch")
+    return {
+        "particion": particion_cpu.estado(),
+        "efectivos": {
+            "llm_hilos": getattr(llm.backend, "n_threads", None) if llm is not None else None,
+            "llm_workers": getattr(llm.backend, "slots", None) if llm is not None else None,
+            "torch_hilos": torch.get_num_threads() if torch is not None else None,
+            "embeddings_backend": servicio_embeddings.backend,
+            "omp_num_threads": os.getenv("OMP_NUM_THREADS"),
+            "ejecutor_hilos": ejecutor_etapas.max_hilos
+        }
+    }
+
+@router.get("/metrics", dependencies=[Depends(verificar_token_web)])
+async def metrics(request: Request):
+    """
+    Histogramas agregados de inferencia (cola, primer token, prefill, decode y tokens/s) y
+    tiempos de cada etapa del turno que corre fuera del event loop.
+    """
+    llm = request.app.state.llm
+    if llm is None:
+        return JSONResponse(status_code=503, content={"detalle": "El LLM todavía se está cargando"})
+    return {
+        "inferencia": llm.telemetria.estado(),
+        "cache_respuestas": llm.cache_respuestas.estado(),
+        "cola_inferencia": llm.planificador.estado(),
+        "etapas": ejecutor_etapas.estado()
+    }
+
 @router.get("/buscar", response_model=List[InmuebleOut], dependencies=[Depends(verificar_token_web)])
 def buscar_propiedades(
     ciudad: Optional[str] = Query(None),
@@ -87,4 +147,13 @@ def buscar_propiedades(
 @router.get("/health", dependencies=[Depends(verificar_token_web)])
 async def health_check():
     logger.debug("✅ Endpoint /health revisado")
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/ready", dependencies=[Depends(verificar_token_web)])
+async def ready_check():
+    """
+    Estado de carga de cada componente (llm, embeddings, calentamiento). 503 hasta que todos
+    estén listos; /health sigue respondiendo apenas el proceso arranca.
+    """
+    estado = arranque.estado()
+    return JSONResponse(status_code=200 if estado["listo"] else 503, content=estado)
\ No newline at end of file
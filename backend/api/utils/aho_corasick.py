@@ -0,0 +1,106 @@
+from collections import deque
+from typing import Hashable
+
+
+class AutomataAhoCorasick:
+    """
+    Autómata de Aho-Corasick: encuentra todas las apariciones de un conjunto de frases en una
+    sola pasada lineal sobre el texto, sin importar cuántas frases haya.
+
+    Trabaja sobre texto ya normalizado (ver `location_index.normalizar`), con palabras separadas
+    por un espacio; solo cuenta coincidencias que empiezan y terminan en límite de palabra.
+    Cada frase lleva una lista de valores (varias fuentes pueden aportar la misma frase).
+    """
+    def __init__(self, frases: dict[str, list[Hashable]] | None = None):
+        # Nodo i: transiciones, enlace de fallo, frase que termina aquí y enlace de salida
+        # (siguiente nodo, por la cadena de fallos, donde termina otra frase)
+        self._transiciones = [{}]
+        self._fallo = [0]
+        self._frase = [None]
+        self._salida = [0]
+        self.valores = {}
+        for frase, valores in (frases or {}).items():
+            self.agregar(frase, valores)
+        self._construido = False
+
+    def agregar(self, frase: str, valores: list[Hashable]):
+        if not frase:
+            return
+        nodo = 0
+        for caracter in frase:
+            siguiente = self._transiciones[nodo].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._frase.append(None)
+                self._salida.append(0)
+                self._transiciones[nodo][caracter] = siguiente
+            nodo = siguiente
+        self._frase[nodo] = frase
+        lista = self.valores.setdefault(frase, [])
+        for valor in valores:
+            if valor not in lista:
+                lista.append(valor)
+        self._construido = False
+
+    def _construir(self):
+        # Enlaces de fallo por recorrido en anchura desde la raíz
+        cola = deque()
+        for hijo in self._transiciones[0].values():
+            self._fallo[hijo] = 0
+            self._salida[hijo] = 0
+            cola.append(hijo)
+        while cola:
+            nodo = cola.popleft()
+            for caracter, hijo in self._transiciones[nodo].items():
+                fallo = self._fallo[nodo]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[hijo] = self._transiciones[fallo].get(caracter, 0)
+                self._salida[hijo] = self._fallo[hijo] if self._frase[self._fallo[hijo]] else self._salida[self._fallo[hijo]]
+                cola.append(hijo)
+        self._construido = True
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def todas(self, texto: str) -> list[tuple[int, int, str]]:
+        """
+        Todas las apariciones `(inicio, fin, frase)` en límite de palabra, incluidas las solapadas.
+        """
+        if not self._construido:
+            self._construir()
+        transiciones, fallo, frase_de, salida = self._transiciones, self._fallo, self._frase, self._salida
+        n = len(texto)
+        encontradas = []
+        nodo = 0
+        for i, caracter in enumerate(texto):
+            while nodo and caracter not in transiciones[nodo]:
+                nodo = fallo[nodo]
+            nodo = transiciones[nodo].get(caracter, 0)
+
+            fin = i + 1
+            if fin < n and texto[fin] != " ":
+                continue
+            actual = nodo if frase_de[nodo] else salida[nodo]
+            while actual:
+                frase = frase_de[actual]
+                inicio = fin - len(frase)
+                if inicio == 0 or texto[inicio - 1] == " ":
+                    encontradas.append((inicio, fin, frase))
+                actual = salida[actual]
+        return encontradas
+
+    def buscar(self, texto: str) -> list[tuple[int, int, str]]:
+        """
+        Apariciones sin solaparse, de izquierda a derecha, prefiriendo la más larga: en
+        "la merced alta" gana "la merced alta" sobre "la merced".
+        """
+        elegidas = []
+        ultimo_fin = 0
+        for inicio, fin, frase in sorted(self.todas(texto), key=lambda c: (c[0], -(c[1] - c[0]))):
+            if inicio >= ultimo_fin:
+                elegidas.append((inicio, fin, frase))
+                ultimo_fin = fin
+        return elegidas
@@ -1,13 +1,11 @@
-import re
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer, util
+from backend.embeddings.intent_classifier import clasificador_intenciones
+from backend.embeddings.anchor_banks import banco_anclas
+from backend.api.utils.regex_matcher import unir_patrones
 import logging
-import torch
 
 logger = logging.getLogger("confirmation")
 
-# === Modelo de embeddings cargado una vez ===
-_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# === Las frases base se codifican una vez como bancos de anclas: ver backend/embeddings/anchor_banks.py ===
 
 # === Confirmaciones base para comparación semántica ===
 _frases_confirmacion = [
@@ -143,47 +141,49 @@ _frases_confirmacion = [
     "va esa",
 ]
 
-_vector_confirmaciones = _model.encode(_frases_confirmacion)
+banco_confirmaciones = banco_anclas("confirmaciones", _frases_confirmacion)
 
-def es_confirmacion_por_regex(text: str) -> bool:
-    text = text.lower()
-    patrones_confirmacion = [
+# === Patrones de confirmación (una sola alternancia, compilada al importar) ===
+PATRONES_CONFIRMACION = [
+    # === Afirmaciones generales / simples ===
+    r"\b(s[ií]|sí quiero|sí deseo|sí por favor|claro que s[ií]|claro|vale|ok|okay|bueno|hecho|dale|de una|vamos|hazlo|listo|simon|affirmative|as[ií] es|obvio|seguro|confirm[oó]|por supuesto)\b",
 
-        # === Afirmaciones generales / simples ===
-        r"\b(s[ií]|sí quiero|sí deseo|sí por favor|claro que s[ií]|claro|vale|ok|okay|bueno|hecho|dale|de una|vamos|hazlo|listo|simon|affirmative|as[ií] es|obvio|seguro|confirm[oó]|por supuesto)\b",
+    # === Verbos de mostrar / ver directamente ===
+    r"\b(m[uú]estramela|ens[eé]ñamela|déjamela ver|quiero verla|quiero ver|mu[ée]strame|ens[eé]ñame|verla ya|verla ahora|verla pues|mostrar|mostrarla|ver opciones|ver resultados|mostrar resultados|ver propiedad|ver la casa)\b",
 
-        # === Verbos de mostrar / ver directamente ===
-        r"\b(m[uú]estramela|ens[eé]ñamela|déjamela ver|quiero verla|quiero ver|mu[ée]strame|ens[eé]ñame|verla ya|verla ahora|verla pues|mostrar|mostrarla|ver opciones|ver resultados|mostrar resultados|ver propiedad|ver la casa)\b",
+    # === Peticiones directas + objetos relacionados ===
+    r"\b(quiero|mu[ée]strame|ens[eé]ñame|ver|ens[eé]name)\b.*\b(algo|una|opci[oó]n|alternativa|inmueble|casa|apartamento|propiedad|oferta|lugar|sitio|vivienda)\b",
 
-        # === Peticiones directas + objetos relacionados ===
-        r"\b(quiero|mu[ée]strame|ens[eé]ñame|ver|ens[eé]name)\b.*\b(algo|una|opci[oó]n|alternativa|inmueble|casa|apartamento|propiedad|oferta|lugar|sitio|vivienda)\b",
+    # === Confirmaciones estilo informal / colombiano / latino ===
+    r"\b(a ver qu[eé] ten[eé]s|mu[ée]strame qu[eé] hay|suelta lo que tengas|t[ií]rame el dato|solt[aá] lo que tengas|mostrame lo que hay|de una|de una parcero|ya pues|ya quiero verla|mostr[aá]mela ya|ya mismo|ya mu[ée]strala|ahora mu[ée]stramela)\b",
 
-        # === Confirmaciones estilo informal / colombiano / latino ===
-        r"\b(a ver qu[eé] ten[eé]s|mu[ée]strame qu[eé] hay|suelta lo que tengas|t[ií]rame el dato|solt[aá] lo que tengas|mostrame lo que hay|de una|de una parcero|ya pues|ya quiero verla|mostr[aá]mela ya|ya mismo|ya mu[ée]strala|ahora mu[ée]stramela)\b",
+    # === Expresiones de aceptación o elección implícita ===
+    r"\b(est[aá] bien|perfecto|eso quiero|esa quiero|esa me interesa|me interesa|acepto|me sirve|quiero esa|me gust[oó]|esa est[aá] bien|esa me gusta|me gust[oó] esa|me llama la atenci[oó]n|esa puede ser|esa me convence|me voy con esa)\b",
 
-        # === Expresiones de aceptación o elección implícita ===
-        r"\b(est[aá] bien|perfecto|eso quiero|esa quiero|esa me interesa|me interesa|acepto|me sirve|quiero esa|me gust[oó]|esa est[aá] bien|esa me gusta|me gust[oó] esa|me llama la atenci[oó]n|esa puede ser|esa me convence|me voy con esa)\b",
+    # === Peticiones con intención de ver más información ===
+    r"\b(ver detalles|ver fotos|ver m[aá]s|ver info|ver informaci[oó]n|ver precio|ver ubicaci[oó]n|mostrar fotos|mostrar m[aá]s datos|mu[ée]strame el link|ver link|ver mapa|ver todo|ver ficha)\b",
 
-        # === Peticiones con intención de ver más información ===
-        r"\b(ver detalles|ver fotos|ver m[aá]s|ver info|ver informaci[oó]n|ver precio|ver ubicaci[oó]n|mostrar fotos|mostrar m[aá]s datos|mu[ée]strame el link|ver link|ver mapa|ver todo|ver ficha)\b",
+    # === Confirmaciones indirectas o de cierre ===
+    r"\b(listo, veamos|bueno, mu[ée]strala|dale, quiero verla|ya pues, mu[ée]strala|veamos esa|hazlo ya|mu[ée]strala entonces|mu[ée]strame entonces|dale con esa|mu[ée]strame esa|quiero ver esa|esa es|esa quiero|mu[ée]strame la opci[oó]n)\b",
 
-        # === Confirmaciones indirectas o de cierre ===
-        r"\b(listo, veamos|bueno, mu[ée]strala|dale, quiero verla|ya pues, mu[ée]strala|veamos esa|hazlo ya|mu[ée]strala entonces|mu[ée]strame entonces|dale con esa|mu[ée]strame esa|quiero ver esa|esa es|esa quiero|mu[ée]strame la opci[oó]n)\b",
+    # === Expresiones con modismos o frases de calle ===
+    r"\b(lanzate con esa|tira esa ya|dale con la que tengas|muestra lo que hay|t[íi]rate una|muestrame lo que tengas|dale, de una|mu[ée]strame lo que ten[eé]s|mu[ée]strame pues|ya estoy listo|m[ueé]strame nom[aá]s|veamos esa vaina)\b",
 
-        # === Expresiones con modismos o frases de calle ===
-        r"\b(lanzate con esa|tira esa ya|dale con la que tengas|muestra lo que hay|t[íi]rate una|muestrame lo que tengas|dale, de una|mu[ée]strame lo que ten[eé]s|mu[ée]strame pues|ya estoy listo|m[ueé]strame nom[aá]s|veamos esa vaina)\b",
+    # === Preguntas con intención de ver ===
+    r"\b(puedo verla\??|me la puedes mostrar\??|la puedo ver\??|me muestras esa\??|me enseñas esa\??|me enseñas la casa\??|puedo ver opciones\??|me puedes mostrar\??|me enseñas algo\??|hay algo para ver\??)\b",
 
-        # === Preguntas con intención de ver ===
-        r"\b(puedo verla\??|me la puedes mostrar\??|la puedo ver\??|me muestras esa\??|me enseñas esa\??|me enseñas la casa\??|puedo ver opciones\??|me puedes mostrar\??|me enseñas algo\??|hay algo para ver\??)\b",
+    # === Afirmaciones con intención de acción inmediata ===
+    r"\b(ya quiero ver|quiero eso|mu[ée]strame ya|vamos a eso|hazlo ya|mostr[aá] ya|dale sin miedo|mu[ée]strame sin pensarlo)\b",
+]
+_REGEX_CONFIRMACION = unir_patrones(PATRONES_CONFIRMACION)
 
-        # === Afirmaciones con intención de acción inmediata ===
-        r"\b(ya quiero ver|quiero eso|mu[ée]strame ya|vamos a eso|hazlo ya|mostr[aá] ya|dale sin miedo|mu[ée]strame sin pensarlo)\b",
-    ]
-    return any(re.search(p, text) for p in patrones_confirmacion)
+def es_confirmacion_por_regex(text: str) -> bool:
+    return _REGEX_CONFIRMACION.search(text.lower()) is not None
 
 def es_confirmacion_usuario_embeddings(message: str) -> bool:
-    vector_usuario = _model.encode([message])
-    similitudes = cosine_similarity(vector_usuario, _vector_confirmaciones)[0]
+    if clasificador_intenciones.disponible:
+        return clasificador_intenciones.es(message, "confirmacion")
+    similitudes = banco_confirmaciones.similitudes(message)
     logger.debug("Similitud por embeddings:", extra={"input": message, "scores": similitudes.tolist()})
     return any(score >= 0.75 for score in similitudes)
 
@@ -306,16 +306,16 @@ frases_indiferencia = [
 ]
 
 # Precalcular los embeddings de esas frases
-embeddings_indiferencia = _model.encode(frases_indiferencia, convert_to_tensor=True)
+banco_indiferencia = banco_anclas("indiferencia", frases_indiferencia)
 
 def es_indiferencia_usuario_embeddings(mensaje: str, umbral: float = 0.75) -> bool:
     """
     Detecta si el usuario expresa indiferencia usando similitud semántica con embeddings.
     """
     try:
-        emb_mensaje = _model.encode([mensaje], convert_to_tensor=True)
-        similitudes = util.pytorch_cos_sim(emb_mensaje, embeddings_indiferencia)[0]
-        max_score = torch.max(similitudes).item()
+        if clasificador_intenciones.disponible:
+            return clasificador_intenciones.es(mensaje, "indiferencia")
+        max_score = banco_indiferencia.maxima(mensaje)
 
         return max_score >= umbral
     except Exception as e:
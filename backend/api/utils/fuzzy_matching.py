@@ -0,0 +1,13 @@
+from difflib import get_close_matches
+
+# Funciones de fuzzy matching en Python puro, en un módulo liviano (sin modelos ni BD).
+# Son comparaciones cortas que corren en el hilo de la etapa; las ubicaciones usan
+# `location_index.py` (rapidfuzz).
+
+
+def titulo_mencionado(texto: str, titulos: list[str], cutoff: float = 0.6) -> str | None:
+    """
+    Título de propiedad más parecido al texto completo de la respuesta, si supera `cutoff`.
+    """
+    mencionados = get_close_matches(texto, titulos, n=1, cutoff=cutoff)
+    return mencionados[0] if mencionados else None
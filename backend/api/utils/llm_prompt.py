@@ -1,4 +1,4 @@
-from typing import List
+from typing import Callable, List
 import re
 
 def limpiar_instrucciones_ocultas(texto: str) -> str:
@@ -13,37 +13,168 @@ def limpiar_texto_parentesis(texto: str) -> str:
     """
     return re.sub(r"\([^)]*\)", "", texto).strip()
 
+_PATRON_PREFIJO_LLM = re.compile(r"^(Usuario|Usuro|User|usuario|usuro|user|Usuarioa|Usuario:|User:|Usuro:)[\s:\-]*", flags=re.IGNORECASE)
+
 def limpiar_prefijo_llm(respuesta: str) -> str:
     """
     Elimina prefijos innecesarios al inicio de la respuesta como 'Usuario:', 'user:', etc.
     También elimina espacios iniciales y saltos de línea redundantes.
     """
-    return re.sub(r"^(Usuario|Usuro|User|usuario|usuro|user|Usuarioa|Usuario:|User:|Usuro:)[\s:\-]*", "", respuesta.strip(), flags=re.IGNORECASE)
+    return _PATRON_PREFIJO_LLM.sub("", respuesta.strip())
+
+_ROLES_LLM = ("Sistema:", "Asesor:", "Usuario:", "System:")
+_PATRON_ROLES_LLM = re.compile(r"(?:^|[\r\n]+)(Sistema:|Asesor:|Usuario:|System:)\s*", flags=re.IGNORECASE)
+
+def limpiar_roles_llm(respuesta: str) -> str:
+    """
+    Elimina las etiquetas de rol ('Usuario:', 'Asesor:', ...) al inicio de cualquier línea.
+    """
+    return _PATRON_ROLES_LLM.sub("", respuesta)
+
+def limpiar_respuesta_llm(respuesta: str) -> str:
+    """
+    Limpieza completa de lo que ve el cliente, igual en `/chat` y `/chat/stream`: roles,
+    paréntesis y prefijo inicial, en ese orden.
+    """
+    return limpiar_prefijo_llm(limpiar_texto_parentesis(limpiar_roles_llm(respuesta)))
+
+def build_prompt_prefix(prompt_template: str) -> str:
+    """
+    Devuelve el bloque <<SYS>> fijo con el que empiezan todos los prompts.
+    Es idéntico entre solicitudes, por eso el motor puede reutilizar su caché KV.
+    """
+    return (
+        f"<<SYS>>\n"
+        f"{prompt_template.strip()}\n"
+        f"<</SYS>>\n\n"
+    )
 
-def build_prompt(user_input: str, history: List[dict], prompt_template: str, role_map: dict = None) -> str:
+ROLES_PROMPT = {"user": "Usuario", "assistant": "Asesor", "system": "Sistema"}
+
+def formatear_mensaje(item: dict, role_map: dict = None) -> str:
+    """
+    Convierte un mensaje del historial en su línea del prompt (`Rol: contenido`).
+    """
     if role_map is None:
-        role_map = {"user": "Usuario", "assistant": "Asesor", "system": "Sistema"}
+        role_map = ROLES_PROMPT
 
-    recent_history = history[-6:]
-    history_text = ""
+    role_label = role_map.get(item["role"], item["role"].capitalize())
 
-    for item in recent_history:
-        role_label = role_map.get(item["role"], item["role"].capitalize())
+    clean_content = limpiar_instrucciones_ocultas(item["content"])
 
-        clean_content = limpiar_instrucciones_ocultas(item["content"])
+    if item["role"] == "assistant":
+        clean_content = limpiar_texto_parentesis(clean_content)
 
-        if item["role"] == "assistant":
-            clean_content = limpiar_texto_parentesis(clean_content)
+    return f"{role_label}: {clean_content.strip()}\n"
 
-        history_text += f"{role_label}: {clean_content.strip()}\n"
+def seleccionar_historial(history: List[dict], presupuesto_tokens: int, contar_tokens: Callable[[str], int], role_map: dict = None) -> List[dict]:
+    """
+    Toma los mensajes más recientes que quepan en `presupuesto_tokens`, sin dejar huecos.
+    Usa el conteo guardado en `n_tokens` cuando el mensaje ya lo trae.
+    """
+    seleccionados = []
+    usados = 0
 
-    prompt = (
-        f"<<SYS>>\n"
-        f"{prompt_template.strip()}\n"
-        f"<</SYS>>\n\n"
-        f"{history_text.strip()}\n"
+    for item in reversed(history):
+        n_tokens = item.get("n_tokens")
+        if n_tokens is None or role_map is not None:
+            n_tokens = contar_tokens(formatear_mensaje(item, role_map))
+        if usados + n_tokens > presupuesto_tokens:
+            break
+        usados += n_tokens
+        seleccionados.append(item)
+
+    seleccionados.reverse()
+    return seleccionados
+
+def build_prompt(user_input: str, history: List[dict], prompt_template: str, role_map: dict = None,
+                 contar_tokens: Callable[[str], int] = None, presupuesto_tokens: int = None) -> str:
+    """
+    Arma el prompt completo. Con `contar_tokens` y `presupuesto_tokens` el historial se llena
+    desde el mensaje más reciente hasta agotar el presupuesto (descontando el bloque <<SYS>>
+    y el turno actual); sin ellos se usan los últimos 6 mensajes.
+    """
+    prefix = build_prompt_prefix(prompt_template)
+    turno_actual = (
         f"Usuario: {user_input.strip()}\n"
         f"Asesor:"
     )
 
+    if contar_tokens is not None and presupuesto_tokens is not None:
+        disponible = presupuesto_tokens - contar_tokens(prefix) - contar_tokens(turno_actual)
+        recent_history = seleccionar_historial(history, max(disponible, 0), contar_tokens, role_map)
+    else:
+        recent_history = history[-6:]
+
+    history_text = "".join(formatear_mensaje(item, role_map) for item in recent_history)
+
+    prompt = (
+        f"{prefix}"
+        f"{history_text.strip()}\n"
+        f"{turno_actual}"
+    )
+
     return prompt.strip()
+
+
+class LimpiadorIncremental:
+    """
+    Aplica `limpiar_respuesta_llm` sobre una respuesta que llega por fragmentos (streaming):
+    solo entrega texto que ya no puede cambiar, así el resultado es el mismo que en `/chat`.
+
+    Retiene el comienzo hasta saber si trae prefijo, un paréntesis sin cerrar, los espacios
+    finales (los saltos de línea pueden acompañar a un rol) y una última línea que todavía
+    podría ser una etiqueta de rol. Vuelve a limpiar el texto acumulado en cada fragmento:
+    las respuestas son cortas y la limpieza es lineal.
+    """
+    # Longitud suficiente para descartar cualquiera de los prefijos de `limpiar_prefijo_llm`
+    LONGITUD_PREFIJO = 16
+
+    def __init__(self):
+        self._texto = ""
+        self._emitido = ""
+
+    def procesar(self, fragmento: str) -> str:
+        """
+        Recibe un fragmento nuevo y devuelve el texto que ya se puede mostrar.
+        """
+        self._texto += fragmento
+        limpio = limpiar_respuesta_llm(self._texto[:self._corte_estable()])
+        if not self._emitido:
+            prefijo = _PATRON_PREFIJO_LLM.match(limpio)
+            if len(limpio) < self.LONGITUD_PREFIJO or (prefijo and prefijo.end() == len(limpio)):
+                return ""
+        return self._emitir(limpio)
+
+    def finalizar(self) -> str:
+        """
+        Devuelve lo que quedó retenido al terminar la generación. Un paréntesis sin cerrar se
+        conserva, igual que con `limpiar_texto_parentesis`.
+        """
+        return self._emitir(limpiar_respuesta_llm(self._texto))
+
+    def _emitir(self, limpio: str) -> str:
+        # Lo ya emitido no se puede retirar: solo sale lo que lo extiende
+        if not limpio.startswith(self._emitido):
+            return ""
+        nuevo = limpio[len(self._emitido):]
+        self._emitido = limpio
+        return nuevo
+
+    def _corte_estable(self) -> int:
+        texto = self._texto
+        corte = len(texto.rstrip())
+
+        # Un "(" sin ")" después puede terminar borrando todo lo que sigue
+        cierre = texto.rfind(")", 0, corte)
+        abierto = texto.find("(", cierre + 1, corte)
+        if abierto != -1:
+            corte = abierto
+
+        # Una última línea que aún puede completar una etiqueta de rol se borraría con su salto de línea
+        salto = max(texto.rfind("\n", 0, corte), texto.rfind("\r", 0, corte))
+        if salto != -1:
+            linea = texto[salto + 1:corte].lower()
+            if any(rol.lower().startswith(linea) for rol in _ROLES_LLM):
+                corte = len(texto[:salto + 1].rstrip("\r\n"))
+        return corte
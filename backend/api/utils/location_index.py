@@ -0,0 +1,136 @@
+from backend.api.utils.dictionaries import (
+    BARRIOS, URBANIZACIONES, PARCELACIONES_CAMPESTRES,
+    CORREGIMIENTOS_VEREDAS
+)
+from backend.api.utils.ubicaciones_guadalajara_de_buga import UBICACIONES_GUADALAJARA_DE_BUGA
+from backend.cpu_partition import particion_cpu
+from rapidfuzz import fuzz, process
+from collections import defaultdict
+import numpy as np
+import unicodedata
+import string
+import os
+
+# Los mensajes largos se recortan: más allá de esto solo se suman ventanas sin aportar
+MAX_TOKENS_UBICACION = int(os.getenv("UBICACIONES_MAX_TOKENS", "120"))
+TAMANO_MAXIMO_VENTANA = 5
+# Mismo corte que el `get_close_matches(..., cutoff=0.8)` anterior, en la escala 0-100 de rapidfuzz
+UMBRAL_UBICACION = 80
+
+# La puntuación separa palabras ("Tuluá,Buga" son dos), no las une
+_SIN_PUNTUACION = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def normalizar(texto: str) -> str:
+    """
+    Minúsculas, sin tildes ni puntuación y con espacios simples: "La Ínsula," -> "la insula".
+    """
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.translate(_SIN_PUNTUACION).split())
+
+
+def _trigramas(texto: str) -> set[str]:
+    # Con un espacio a cada lado, así las palabras cortas también tienen trigramas
+    relleno = f" {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def ubicaciones_buga() -> dict[str, str]:
+    """
+    Todas las ubicaciones de Buga (barrios, urbanizaciones, veredas, parcelaciones y el mapa
+    de ubicaciones), en minúscula -> nombre original.
+    """
+    ubicaciones = set()
+
+    for comuna_dict in [BARRIOS, URBANIZACIONES]:
+        for barrios in comuna_dict.values():
+            ubicaciones.update(barrios)
+
+    for zonas_dict in [CORREGIMIENTOS_VEREDAS, PARCELACIONES_CAMPESTRES]:
+        for subzona in zonas_dict.values():
+            if isinstance(subzona, dict):
+                for veredas in subzona.values():
+                    ubicaciones.update(veredas)
+            else:
+                ubicaciones.update(subzona)
+
+    # Agregar explícitamente las del mapa de ubicaciones
+    ubicaciones.update(UBICACIONES_GUADALAJARA_DE_BUGA.keys())
+    return {u.lower(): u for u in ubicaciones}
+
+
+class IndiceUbicaciones:
+    """
+    Índice de ubicaciones armado una sola vez: formas normalizadas y un índice invertido de
+    trigramas. Para un mensaje se generan las ventanas de 1 a 5 tokens, los trigramas del
+    mensaje descartan las ubicaciones que no comparten ninguno con él y rapidfuzz puntúa
+    todas las ventanas contra las candidatas en una sola llamada (`cdist`).
+    """
+    def __init__(self, ubicaciones: list[str], umbral: int = UMBRAL_UBICACION,
+                 max_tokens: int = MAX_TOKENS_UBICACION, tamano_ventana: int = TAMANO_MAXIMO_VENTANA):
+        self.umbral = umbral
+        self.max_tokens = max_tokens
+        self.tamano_ventana = tamano_ventana
+
+        # Forma normalizada -> nombre original (si dos nombres coinciden al normalizar, queda el primero)
+        originales = {}
+        for nombre in sorted(ubicaciones):
+            forma = normalizar(nombre)
+            if forma:
+                originales.setdefault(forma, nombre)
+        self.formas = list(originales)
+        self.nombres = list(originales.values())
+
+        self._por_trigrama = defaultdict(list)
+        for i, forma in enumerate(self.formas):
+            for trigrama in _trigramas(forma):
+                self._por_trigrama[trigrama].append(i)
+
+    def __len__(self) -> int:
+        return len(self.formas)
+
+    def ventanas(self, tokens: list[str]) -> list[str]:
+        n = len(tokens)
+        # Mismo orden que el recorrido anterior: primero las ventanas de 1 token, luego las de 2...
+        ventanas = (" ".join(tokens[i:i + size]) for size in range(1, self.tamano_ventana + 1) for i in range(n - size + 1))
+        return list(dict.fromkeys(ventanas))
+
+    def candidatas(self, tokens: list[str]) -> list[int]:
+        """
+        Ubicaciones que comparten al menos un trigrama con el mensaje. Las ventanas empiezan
+        y terminan en límites de palabra, así que sus trigramas están todos en el del mensaje.
+        """
+        ids = set()
+        for trigrama in _trigramas(" ".join(tokens)):
+            ids.update(self._por_trigrama.get(trigrama, ()))
+        return sorted(ids)
+
+    def buscar(self, texto: str) -> tuple[str, str, float] | None:
+        """
+        Mejor ubicación para todo el mensaje: `(fragmento, ubicacion, puntaje)` o None si ninguna
+        ventana llega al umbral. Entre puntajes iguales gana la ventana más corta y más temprana.
+        """
+        tokens = normalizar(texto).split()[:self.max_tokens]
+        if not tokens:
+            return None
+        ids = self.candidatas(tokens)
+        if not ids:
+            return None
+        ventanas = self.ventanas(tokens)
+
+        # Los hilos de rapidfuzz heredan la afinidad del que llama: quedan en los núcleos de fuzzy
+        with particion_cpu.afinidad_temporal("fuzzy"):
+            puntajes = process.cdist(
+                ventanas, [self.formas[i] for i in ids], scorer=fuzz.ratio,
+                score_cutoff=self.umbral, dtype=np.uint8, workers=particion_cpu.hilos_fuzzy
+            )
+        fila, columna = np.unravel_index(int(np.argmax(puntajes)), puntajes.shape)
+        puntaje = float(puntajes[fila, columna])
+        if puntaje < self.umbral:
+            return None
+        return ventanas[fila], self.nombres[ids[columna]], puntaje
+
+
+# Se arma al importar: los diccionarios son fijos
+indice_ubicaciones = IndiceUbicaciones(list(ubicaciones_buga().values()))
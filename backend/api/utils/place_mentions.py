@@ -0,0 +1,72 @@
+from backend.api.utils.ubicaciones_guadalajara_de_buga import UBICACIONES_GUADALAJARA_DE_BUGA
+from backend.api.utils.location_index import normalizar, ubicaciones_buga
+from backend.db.location_catalog import CatalogoUbicaciones, catalogo_ubicaciones
+from backend.api.utils.aho_corasick import AutomataAhoCorasick
+from backend.logger_setup import get_logger
+from sqlalchemy.orm import Session
+import threading
+
+logger = get_logger(__name__)
+
+
+def ubicaciones_fijas() -> dict[str, list[tuple[str, str]]]:
+    """
+    Ubicaciones de `dictionaries.py` y del mapa de Buga, normalizadas -> campos que aportan:
+    siempre el barrio y, si el mapa la conoce, también la ciudad.
+    """
+    fijas = {}
+    for nombre in sorted(ubicaciones_buga().values()):
+        campos = [("barrio", nombre)]
+        if nombre in UBICACIONES_GUADALAJARA_DE_BUGA:
+            campos.append(("ciudad", UBICACIONES_GUADALAJARA_DE_BUGA[nombre]))
+        fijas.setdefault(normalizar(nombre), []).extend(campos)
+    return fijas
+
+
+class MencionesUbicaciones:
+    """
+    Menciones exactas de ciudades y barrios en un mensaje (sin tildes ni mayúsculas, en límite
+    de palabra), con un autómata de Aho-Corasick armado desde el catálogo de la BD y las
+    ubicaciones fijas de los diccionarios. Una sola pasada por el mensaje, sin importar cuántos
+    lugares se conozcan; entre menciones solapadas gana la más larga.
+
+    El autómata se rearma solo cuando el catálogo se recarga.
+    """
+    def __init__(self, catalogo: CatalogoUbicaciones, fijas: dict[str, list[tuple[str, str]]] | None = None):
+        self.catalogo = catalogo
+        self.fijas = fijas or {}
+        self._automata = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _armar(self, db: Session) -> AutomataAhoCorasick:
+        automata = AutomataAhoCorasick()
+        # Primero el catálogo: si una frase está en ambos, manda cómo está escrita en la BD
+        for campo in ("ciudad", "barrio"):
+            for valor in sorted(self.catalogo.valores(db, campo)):
+                automata.agregar(normalizar(valor), [(campo, valor.strip())])
+        for frase, campos in self.fijas.items():
+            automata.agregar(frase, campos)
+        logger.debug("🗺️ Autómata de ubicaciones armado", extra={"frases": len(automata)})
+        return automata
+
+    def automata(self, db: Session) -> AutomataAhoCorasick:
+        self.catalogo.actualizar(db)
+        if self._version != self.catalogo.version:
+            with self._lock:
+                if self._version != self.catalogo.version:
+                    version = self.catalogo.version
+                    self._automata = self._armar(db)
+                    self._version = version
+        return self._automata
+
+    def buscar(self, db: Session, texto: str) -> list[tuple[str, str]]:
+        """
+        `(campo, valor)` de cada mención, en el orden en que aparecen en el texto.
+        """
+        automata = self.automata(db)
+        return [campo for _, _, frase in automata.buscar(normalizar(texto)) for campo in automata.valores[frase]]
+
+
+# Instancia única del proceso, sobre el catálogo compartido
+menciones_ubicaciones = MencionesUbicaciones(catalogo_ubicaciones, ubicaciones_fijas())
@@ -0,0 +1,55 @@
+from typing import Iterator
+import re
+
+
+def unir_patrones(patrones: list[str], flags: int = 0) -> re.Pattern:
+    """
+    Une varias expresiones en una sola alternancia precompilada. `search` sobre el resultado
+    encuentra coincidencia exactamente cuando alguna de las originales la encontraría.
+    """
+    return re.compile("|".join(f"(?:{patron})" for patron in patrones), flags)
+
+
+class EscanerPatrones:
+    """
+    Varias expresiones con etiqueta recorridas en una sola pasada sobre el texto: cada una va
+    envuelta en un grupo con nombre y `lastgroup` dice cuál coincidió. Si dos coinciden en la
+    misma posición gana la que aparece primero en `patrones`. `anticipo` es un lookahead
+    opcional que todas las expresiones cumplen (p. ej. `(?=\d)`) para descartar rápido las
+    posiciones que no pueden coincidir.
+
+    Los grupos internos de cada expresión se recuperan re-evaluándola solo donde hubo
+    coincidencia, así se obtienen las mismas tuplas que daría `re.findall` por separado.
+    """
+    def __init__(self, patrones: dict[str, str], flags: int = 0, anticipo: str = ""):
+        self.etiquetas = list(patrones)
+        self._por_grupo = {f"p{i}": etiqueta for i, etiqueta in enumerate(self.etiquetas)}
+
+        # Un `\b` inicial común se saca de la alternancia: se evalúa una vez por posición
+        # y no una vez por patrón
+        cuerpos = list(patrones.values())
+        prefijo = ""
+        if cuerpos and all(cuerpo.startswith(r"\b") for cuerpo in cuerpos):
+            prefijo, cuerpos = r"\b", [cuerpo[2:] for cuerpo in cuerpos]
+        alternancia = "|".join(f"(?P<p{i}>{cuerpo})" for i, cuerpo in enumerate(cuerpos))
+        self._combinado = re.compile(f"{anticipo}{prefijo}(?:{alternancia})", flags)
+        self._individuales = {etiqueta: re.compile(patron, flags) for etiqueta, patron in patrones.items()}
+
+    def coincidencias(self, texto: str) -> Iterator[tuple[str, re.Match]]:
+        for coincidencia in self._combinado.finditer(texto):
+            etiqueta = self._por_grupo[coincidencia.lastgroup]
+            yield etiqueta, self._individuales[etiqueta].match(texto, coincidencia.start())
+
+    def etiquetas_presentes(self, texto: str) -> set[str]:
+        # Sin re-evaluar: basta el nombre del grupo que coincidió
+        return {self._por_grupo[coincidencia.lastgroup] for coincidencia in self._combinado.finditer(texto)}
+
+    def grupos_por_etiqueta(self, texto: str) -> dict[str, list[tuple]]:
+        """
+        Equivalente a `{etiqueta: re.findall(patron, texto)}` (solo etiquetas con coincidencias)
+        para expresiones con grupos.
+        """
+        resultado = {}
+        for etiqueta, coincidencia in self.coincidencias(texto):
+            resultado.setdefault(etiqueta, []).append(coincidencia.groups())
+        return resultado
@@ -0,0 +1,170 @@
+from backend.logger_setup import get_logger
+from contextlib import contextmanager
+import multiprocessing
+import threading
+import os
+
+logger = get_logger(__name__)
+
+COMPONENTES = ("llm", "embeddings", "fuzzy")
+
+
+def nucleos_disponibles() -> int:
+    """
+    Núcleos que este proceso puede usar de verdad: respeta la afinidad de CPU y la cuota
+    de cgroups (contenedores), no solo los núcleos del host.
+    """
+    try:
+        nucleos = len(os.sched_getaffinity(0))
+    except AttributeError:
+        nucleos = multiprocessing.cpu_count()
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            nucleos = min(nucleos, max(1, int(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+
+    return max(1, nucleos)
+
+
+def _entero_env(nombre: str) -> int | None:
+    valor = os.getenv(nombre, "").strip()
+    return int(valor) if valor else None
+
+
+class ParticionCPU:
+    """
+    Reparte los núcleos del proceso entre llama.cpp, el modelo de embeddings y el fuzzy
+    matching para que no compitan por los mismos núcleos (sobresuscripción) cuando corren a
+    la vez. Con `afinidad` además asigna conjuntos de CPU disjuntos a cada componente.
+
+    Por defecto el reparto no pasa de los núcleos disponibles: hasta 4 núcleos, embeddings
+    y fuzzy comparten uno (rara vez corren a la vez) y el resto es del LLM; con más, 1 de
+    fuzzy, 1-2 de embeddings y el resto para el LLM. Con un solo núcleo los tres lo comparten:
+    no hay nada que repartir y no se reporta como sobresuscripción.
+
+    Con afinidad quedan fijados el hilo que corre la inferencia de `LlamaLocal` (y con él los
+    hilos de cálculo de llama.cpp, que lo heredan), cada worker del pool, el hilo de lotes
+    de embeddings y los hilos que corren el fuzzy matching mientras dura la etapa.
+    """
+    def __init__(self, cpus: list[int] | None = None, hilos_llm: int | None = None,
+                 hilos_embeddings: int | None = None, hilos_fuzzy: int | None = None, afinidad: bool = False):
+        if cpus is None:
+            try:
+                cpus = sorted(os.sched_getaffinity(0))
+            except AttributeError:
+                cpus = list(range(os.cpu_count() or 1))
+            cpus = cpus[:nucleos_disponibles()]
+        self.cpus = cpus
+        total = len(cpus)
+
+        self.hilos_fuzzy = max(1, hilos_fuzzy or 1)
+        self.hilos_embeddings = max(1, hilos_embeddings or (1 if total <= 6 else 2))
+        # Con pocos núcleos, embeddings y fuzzy comparten uno en vez de quitárselo al LLM
+        self.compartido = total <= 4 and self.hilos_embeddings == self.hilos_fuzzy == 1
+        auxiliares = 1 if self.compartido else self.hilos_embeddings + self.hilos_fuzzy
+        self.hilos_llm = max(1, hilos_llm or total - auxiliares)
+        self.hilos = {"llm": self.hilos_llm, "embeddings": self.hilos_embeddings, "fuzzy": self.hilos_fuzzy}
+        self.un_nucleo = total == 1 and all(hilos == 1 for hilos in self.hilos.values())
+
+        self.afinidad = {}
+        if afinidad:
+            if self.sobresuscrita:
+                logger.warning(
+                    "⚠️ CPU_AFINIDAD ignorada: los hilos asignados superan los núcleos disponibles",
+                    extra={"hilos": self.hilos, "nucleos": total}
+                )
+            else:
+                inicio = 0
+                for componente in COMPONENTES:
+                    if self.un_nucleo:
+                        self.afinidad[componente] = list(cpus)
+                        continue
+                    if componente == "fuzzy" and self.compartido:
+                        self.afinidad["fuzzy"] = self.afinidad["embeddings"]
+                        continue
+                    self.afinidad[componente] = cpus[inicio:inicio + self.hilos[componente]]
+                    inicio += self.hilos[componente]
+
+    @property
+    def nucleos_usados(self) -> int:
+        if self.un_nucleo:
+            return 1
+        return sum(self.hilos.values()) - (1 if self.compartido else 0)
+
+    @property
+    def sobresuscrita(self) -> bool:
+        return self.nucleos_usados > len(self.cpus)
+
+    def cpus_de(self, componente: str, parte: int = 0, partes: int = 1) -> list[int] | None:
+        """
+        CPUs asignadas a un componente (o a la `parte`-ésima de `partes`, p. ej. un worker del pool).
+        """
+        cpus = self.afinidad.get(componente)
+        if not cpus:
+            return None
+        tamano = max(1, len(cpus) // partes)
+        return cpus[parte * tamano:(parte + 1) * tamano] or cpus
+
+    def fijar_afinidad(self, componente: str, parte: int = 0, partes: int = 1) -> bool:
+        """
+        Fija la afinidad del hilo (o proceso) que llama; los hilos que cree después la heredan.
+        """
+        cpus = self.cpus_de(componente, parte, partes)
+        if cpus is None:
+            return False
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError):
+            logger.warning(f"⚠️ No se pudo fijar la afinidad de {componente}", exc_info=True)
+            return False
+        logger.debug(f"📌 Afinidad de {componente}: {cpus}", extra={"hilo": threading.current_thread().name})
+        return True
+
+    @contextmanager
+    def afinidad_temporal(self, componente: str):
+        """
+        Fija el hilo que llama a las CPUs del componente mientras dura el bloque y luego
+        restaura las que tenía: para hilos compartidos (pool de etapas, `asyncio.to_thread`).
+        """
+        cpus = self.cpus_de(componente)
+        if cpus is None:
+            yield
+            return
+        try:
+            anteriores = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError):
+            logger.warning(f"⚠️ No se pudo fijar la afinidad de {componente}", exc_info=True)
+            yield
+            return
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, anteriores)
+
+    def estado(self) -> dict:
+        return {
+            "nucleos": len(self.cpus),
+            "hilos": dict(self.hilos),
+            "embeddings_y_fuzzy_comparten": self.compartido,
+            "un_nucleo": self.un_nucleo,
+            "afinidad": {componente: cpus for componente, cpus in self.afinidad.items()} or None,
+            "sobresuscrita": self.sobresuscrita
+        }
+
+
+def particion_desde_entorno() -> ParticionCPU:
+    return ParticionCPU(
+        hilos_llm=_entero_env("CPU_HILOS_LLM"),
+        hilos_embeddings=_entero_env("CPU_HILOS_EMBEDDINGS"),
+        hilos_fuzzy=_entero_env("CPU_HILOS_FUZZY"),
+        afinidad=os.getenv("CPU_AFINIDAD", "0").strip() == "1"
+    )
+
+
+# Instancia única del proceso
+particion_cpu = particion_desde_entorno()
@@ -0,0 +1,125 @@
+from backend.db.models.property import Inmueble
+from backend.logger_setup import get_logger
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func
+import threading
+import time
+import os
+
+logger = get_logger(__name__)
+
+# Cada cuánto se consulta la señal de cambio (conteo y última fecha de publicación)
+VERIFICACION_CATALOGO_S = float(os.getenv("CATALOGO_VERIFICACION_S", "30"))
+# Recarga completa aunque la señal no cambie (cubre ediciones de barrio/ciudad en filas existentes)
+MAX_EDAD_CATALOGO_S = float(os.getenv("CATALOGO_MAX_EDAD_S", "600"))
+
+CAMPOS_CATALOGO = ("ciudad", "barrio")
+
+
+class CatalogoUbicaciones:
+    """
+    Ciudades y barrios que existen en el catálogo de inmuebles, cargados una vez y compartidos
+    por las menciones de lugares de `filter_extractor`, así cada mensaje no repite los `SELECT DISTINCT`.
+
+    Se recarga cuando cambia la señal `(conteo, max(fecha_publicacion))`, que solo se consulta
+    cada `VERIFICACION_CATALOGO_S`; cuando se llama a `invalidar()` (una ingesta externa usa
+    `POST /catalogo/invalidar`; un flush de `Inmueble` en este proceso lo hace solo); o al
+    cumplir `MAX_EDAD_CATALOGO_S`.
+    """
+    def __init__(self, verificacion_s: float = VERIFICACION_CATALOGO_S, max_edad_s: float = MAX_EDAD_CATALOGO_S):
+        self.verificacion_s = verificacion_s
+        self.max_edad_s = max_edad_s
+        self._lock = threading.Lock()
+        self._valores = {campo: frozenset() for campo in CAMPOS_CATALOGO}
+        self._senal = None
+        self._cargado_en = None
+        self._verificado_en = 0.0
+        self._invalidado = True
+        self._cargas = 0
+        self._verificaciones = 0
+
+    def invalidar(self):
+        self._invalidado = True
+
+    @staticmethod
+    def _leer_senal(db: Session) -> tuple:
+        conteo, ultima = db.query(func.count(Inmueble.id), func.max(Inmueble.fecha_publicacion)).one()
+        return conteo, ultima
+
+    def _cargar(self, db: Session, senal: tuple):
+        filas = db.query(Inmueble.ciudad, Inmueble.barrio).distinct().all()
+        for campo in CAMPOS_CATALOGO:
+            # Valores tal cual están en la BD, sin repetir
+            self._valores[campo] = frozenset(getattr(fila, campo) for fila in filas if getattr(fila, campo))
+
+        self._senal = senal
+        self._cargado_en = time.monotonic()
+        self._cargas += 1
+        logger.info("🗺️ Catálogo de ubicaciones cargado", extra={
+            "ciudades": len(self._valores["ciudad"]),
+            "barrios": len(self._valores["barrio"])
+        })
+
+    def actualizar(self, db: Session):
+        """
+        Recarga si hace falta. Entre verificaciones no toca la BD.
+        """
+        ahora = time.monotonic()
+        if not self._invalidado and ahora - self._verificado_en < self.verificacion_s:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            if not self._invalidado and ahora - self._verificado_en < self.verificacion_s:
+                return
+            # Una invalidación que llegue durante la carga queda para la siguiente llamada
+            invalidado, self._invalidado = self._invalidado, False
+            try:
+                senal = self._leer_senal(db)
+                vencido = self._cargado_en is None or ahora - self._cargado_en >= self.max_edad_s
+                if invalidado or vencido or senal != self._senal:
+                    self._cargar(db, senal)
+            except Exception:
+                self._invalidado = True
+                raise
+            self._verificaciones += 1
+            self._verificado_en = ahora
+
+    @property
+    def version(self) -> int:
+        """
+        Cambia con cada recarga: quien derive estructuras del catálogo sabe cuándo rearmarlas.
+        """
+        return self._cargas
+
+    @property
+    def total_inmuebles(self) -> int | None:
+        return self._senal[0] if self._senal else None
+
+    def valores(self, db: Session, campo: str) -> frozenset[str]:
+        """
+        Valores distintos de `campo` tal como están guardados (sin vacíos).
+        """
+        self.actualizar(db)
+        return self._valores[campo]
+
+    def estado(self) -> dict:
+        return {
+            "ciudades": len(self._valores["ciudad"]),
+            "barrios": len(self._valores["barrio"]),
+            "inmuebles": self.total_inmuebles,
+            "cargas": self._cargas,
+            "verificaciones": self._verificaciones,
+            "edad_s": round(time.monotonic() - self._cargado_en, 1) if self._cargado_en else None,
+            "invalidado": self._invalidado
+        }
+
+
+# Instancia única del proceso
+catalogo_ubicaciones = CatalogoUbicaciones()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidar_si_cambian_inmuebles(session, contexto_flush):
+    # Escrituras hechas desde este mismo proceso: no hace falta esperar a la señal
+    if any(isinstance(objeto, Inmueble) for objeto in (*session.new, *session.dirty, *session.deleted)):
+        catalogo_ubicaciones.invalidar()
@@ -0,0 +1,129 @@
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.logger_setup import get_logger
+import numpy as np
+import threading
+import hashlib
+import time
+import os
+
+logger = get_logger(__name__)
+
+RUTA_BANCOS = os.getenv("EMBEDDINGS_BANCOS_PATH", "/data/storage/embeddings")
+
+
+def huella_banco(firma_modelo: str, frases: list[str]) -> str:
+    """
+    Identifica un banco por modelo (y backend) y lista exacta de frases (orden incluido).
+    """
+    digest = hashlib.sha1(firma_modelo.encode("utf-8"))
+    for frase in frases:
+        digest.update(b"\x00")
+        digest.update(frase.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class BancoAnclas:
+    """
+    Frases de referencia codificadas una sola vez (matriz normalizada (n, dim)).
+    La matriz se guarda en `.npy` por nombre + huella y en los siguientes arranques se abre
+    con mmap: no hace falta volver a codificar ni copiar la matriz en memoria.
+    """
+    def __init__(self, nombre: str, frases: list[str], servicio=servicio_embeddings, ruta: str = RUTA_BANCOS):
+        self.nombre = nombre
+        self.frases = list(frases)
+        self.servicio = servicio
+        self.ruta = ruta
+        self._vectores = None
+        self._origen = None
+        self._lock = threading.Lock()
+
+    @property
+    def archivo(self) -> str:
+        huella = huella_banco(self.servicio.firma, self.frases)
+        return os.path.join(self.ruta, f"{self.nombre}-{huella}.npy")
+
+    @property
+    def vectores(self) -> np.ndarray:
+        if self._vectores is None:
+            with self._lock:
+                if self._vectores is None:
+                    self._cargar()
+        return self._vectores
+
+    def _cargar(self):
+        inicio = time.perf_counter()
+        archivo = self.archivo
+        try:
+            vectores = np.load(archivo, mmap_mode="r")
+            if vectores.shape[0] == len(self.frases):
+                self._vectores, self._origen = vectores, "disco"
+                return
+        except (OSError, ValueError):
+            pass
+
+        vectores = np.ascontiguousarray(self.servicio.encode(self.frases), dtype=np.float32)
+        vectores.setflags(write=False)
+        self._vectores, self._origen = vectores, "codificado"
+        logger.info(
+            f"🧭 Banco de anclas '{self.nombre}' codificado en {time.perf_counter() - inicio:.2f} segundos",
+            extra={"frases": len(self.frases)}
+        )
+        try:
+            os.makedirs(self.ruta, exist_ok=True)
+            temporal = f"{archivo}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as f:
+                np.save(f, vectores)
+            os.replace(temporal, archivo)
+        except OSError:
+            logger.warning(f"⚠️ No se pudo guardar el banco de anclas '{self.nombre}' en {archivo}", exc_info=True)
+
+    def similitudes(self, texto: str) -> np.ndarray:
+        """
+        Similitud coseno del texto contra cada frase del banco: un solo producto matriz-vector.
+        """
+        return self.vectores @ self.servicio.encode(texto).astype(self.vectores.dtype, copy=False)
+
+    def maxima(self, texto: str) -> float:
+        return float(self.similitudes(texto).max())
+
+    def mejor(self, texto: str) -> tuple[str, float]:
+        """
+        Frase más parecida y su similitud.
+        """
+        similitudes = self.similitudes(texto)
+        idx = int(similitudes.argmax())
+        return self.frases[idx], float(similitudes[idx])
+
+    def estado(self) -> dict:
+        return {"frases": len(self.frases), "origen": self._origen}
+
+
+# === Registro de bancos del proceso ===
+BANCOS: dict[str, BancoAnclas] = {}
+
+
+def banco_anclas(nombre: str, frases: list[str]) -> BancoAnclas:
+    """
+    Registra (o devuelve, si ya existe con las mismas frases) el banco `nombre`.
+    """
+    banco = BANCOS.get(nombre)
+    if banco is None or banco.frases != list(frases):
+        banco = BANCOS[nombre] = BancoAnclas(nombre, frases)
+    return banco
+
+
+def precargar_bancos():
+    """
+    Abre (o codifica y guarda) todos los bancos registrados; pensado para el arranque.
+    """
+    inicio = time.perf_counter()
+    for banco in BANCOS.values():
+        banco.vectores
+    logger.info(
+        f"🧭 Bancos de anclas listos en {time.perf_counter() - inicio:.2f} segundos",
+        extra={"bancos": estado_bancos()}
+    )
+
+
+def estado_bancos() -> dict:
+    return {nombre: banco.estado() for nombre, banco in BANCOS.items()}
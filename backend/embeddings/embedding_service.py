@@ -0,0 +1,180 @@
+from backend.embeddings.micro_batcher import MicroLotes
+from backend.cpu_partition import particion_cpu
+from backend.logger_setup import get_logger
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+import os
+
+logger = get_logger(__name__)
+
+MODELO_EMBEDDINGS = os.getenv("EMBEDDINGS_MODELO", "sentence-transformers/all-MiniLM-L6-v2")
+# `torch` (SentenceTransformer) u `onnx` (int8 con onnxruntime, sin torch)
+BACKEND_EMBEDDINGS = os.getenv("EMBEDDINGS_BACKEND", "torch").strip().lower()
+# Vectores recordados por texto (0 desactiva la memoria)
+MEMO_EMBEDDINGS = int(os.getenv("EMBEDDINGS_CACHE", 1024))
+# Micro-lotes entre solicitudes concurrentes (1 los desactiva)
+LOTE_MAX_EMBEDDINGS = int(os.getenv("EMBEDDINGS_LOTE_MAX", 32))
+LOTE_ESPERA_MS_EMBEDDINGS = float(os.getenv("EMBEDDINGS_LOTE_ESPERA_MS", 5))
+
+
+def _memoria_residente_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+class ServicioEmbeddings:
+    """
+    Dueño único del modelo de embeddings del proceso (SentenceTransformer o su versión ONNX
+    int8, según `EMBEDDINGS_BACKEND`). Todos los módulos que necesitan embeddings pasan por
+    aquí, así hay una sola copia del modelo (y de sus hilos) por worker de uvicorn.
+
+    Los vectores salen normalizados (norma 1) como arrays de numpy, así la similitud coseno
+    es un producto punto. Cada texto se codifica una sola vez: los detectores de un mismo
+    turno (confirmación, indiferencia, tipo) reutilizan el vector de una memoria LRU, y lo
+    que falta de solicitudes simultáneas se codifica junto en micro-lotes (`MicroLotes`).
+    """
+    def __init__(self, nombre_modelo: str = MODELO_EMBEDDINGS, max_memo: int = MEMO_EMBEDDINGS,
+                 max_lote: int = LOTE_MAX_EMBEDDINGS, espera_lote_ms: float = LOTE_ESPERA_MS_EMBEDDINGS,
+                 backend: str = BACKEND_EMBEDDINGS):
+        self.nombre_modelo = nombre_modelo
+        self.backend = backend
+        self.max_memo = max(0, max_memo)
+        self.lotes = (
+            MicroLotes(self._codificar_modelo, max_lote, espera_lote_ms, al_iniciar=lambda: particion_cpu.fijar_afinidad("embeddings"))
+            if max_lote > 1 else None
+        )
+        self._modelo = None
+        self._lock = threading.Lock()
+        self._memo = OrderedDict()
+        self._lock_memo = threading.Lock()
+        self._memo_aciertos = 0
+        self._memo_fallos = 0
+        self._memoria_mb = None
+        self._segundos_carga = None
+
+    @property
+    def modelo(self):
+        if self._modelo is None:
+            with self._lock:
+                if self._modelo is None:
+                    self._cargar()
+        return self._modelo
+
+    @property
+    def firma(self) -> str:
+        """
+        Modelo + backend: los vectores int8 difieren levemente de los fp32 (ver bancos de anclas).
+        """
+        return self.nombre_modelo if self.backend == "torch" else f"{self.nombre_modelo}|{self.backend}"
+
+    def _cargar(self):
+        memoria_antes = _memoria_residente_mb()
+        inicio = time.perf_counter()
+        # Hilos acotados a lo reservado para embeddings, para no competir con llama.cpp
+        hilos = particion_cpu.hilos_embeddings
+        if self.backend == "onnx":
+            from backend.embeddings.onnx_backend import ModeloOnnx
+            self._modelo = ModeloOnnx(n_hilos=hilos)
+        else:
+            from sentence_transformers import SentenceTransformer
+            import torch
+
+            torch.set_num_threads(hilos)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Solo se puede fijar antes del primer trabajo paralelo de torch
+                pass
+            self._modelo = SentenceTransformer(self.nombre_modelo)
+        self._segundos_carga = time.perf_counter() - inicio
+
+        memoria_despues = _memoria_residente_mb()
+        if memoria_antes is not None and memoria_despues is not None:
+            self._memoria_mb = round(memoria_despues - memoria_antes, 1)
+
+        logger.info(
+            f"🧬 Modelo de embeddings cargado en {self._segundos_carga:.2f} segundos",
+            extra={"modelo": self.nombre_modelo, "backend": self.backend, "hilos": hilos, "memoria_mb": self._memoria_mb}
+        )
+
+    def _codificar_modelo(self, textos: list[str]) -> np.ndarray:
+        return self.modelo.encode(textos, normalize_embeddings=True, convert_to_numpy=True)
+
+    def _codificar(self, textos: list[str]) -> np.ndarray:
+        if self.lotes is None:
+            return self._codificar_modelo(textos)
+        return self.lotes.codificar(textos)
+
+    def encode(self, textos: str | list[str]) -> np.ndarray:
+        """
+        Un texto devuelve un vector (dim,); una lista devuelve una matriz (n, dim).
+        Los vectores memorizados son de solo lectura.
+        """
+        if isinstance(textos, str):
+            return self._encode_memo([textos])[0]
+        return self._encode_memo(list(textos))
+
+    def _encode_memo(self, textos: list[str]) -> np.ndarray:
+        if self.max_memo == 0 or not textos:
+            return self._codificar(textos)
+
+        vectores = {}
+        with self._lock_memo:
+            for texto in textos:
+                vector = self._memo.get(texto)
+                if vector is not None:
+                    self._memo.move_to_end(texto)
+                    vectores[texto] = vector
+            faltantes = [texto for texto in dict.fromkeys(textos) if texto not in vectores]
+            self._memo_aciertos += len(textos) - len(faltantes)
+            self._memo_fallos += len(faltantes)
+
+        if faltantes:
+            # Un solo pedido para todo lo que falta (puede compartir lote con otras solicitudes)
+            nuevos = self._codificar(faltantes)
+            nuevos.setflags(write=False)
+            with self._lock_memo:
+                for texto, vector in zip(faltantes, nuevos):
+                    vectores[texto] = vector
+                    self._memo[texto] = vector
+                    self._memo.move_to_end(texto)
+                while len(self._memo) > self.max_memo:
+                    self._memo.popitem(last=False)
+
+        if len(textos) == 1:
+            return vectores[textos[0]][np.newaxis]
+        return np.stack([vectores[texto] for texto in textos])
+
+    @staticmethod
+    def similitud(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """
+        Similitud coseno entre vectores ya normalizados: (n, dim) x (m, dim) -> (n, m).
+        Con vectores sueltos devuelve un escalar o un vector.
+        """
+        return np.asarray(a) @ np.asarray(b).T
+
+    def estado(self) -> dict:
+        return {
+            "modelo": self.nombre_modelo,
+            "backend": self.backend,
+            "cargado": self._modelo is not None,
+            "segundos_carga": round(self._segundos_carga, 2) if self._segundos_carga is not None else None,
+            "memoria_mb": self._memoria_mb,
+            "memo": {
+                "entradas": len(self._memo),
+                "max_entradas": self.max_memo,
+                "aciertos": self._memo_aciertos,
+                "fallos": self._memo_fallos
+            },
+            "lotes": self.lotes.estado() if self.lotes is not None else None
+        }
+
+
+# Instancia única del proceso
+servicio_embeddings = ServicioEmbeddings()
@@ -0,0 +1,120 @@
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.logger_setup import get_logger
+import numpy as np
+import threading
+import os
+
+logger = get_logger(__name__)
+
+RUTA_INTENCIONES = os.getenv("INTENCIONES_MODELO_PATH", "/data/storage/embeddings/intenciones.npz")
+# Probabilidad mínima para aceptar una intención
+UMBRAL_INTENCION = float(os.getenv("INTENCIONES_UMBRAL", 0.5))
+INTENCIONES = ("confirmacion", "indiferencia", "precio", "otro")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def entrenar_regresion_logistica(X: np.ndarray, y: np.ndarray, n_clases: int, l2: float = 1e-3,
+                                 iteraciones: int = 800, tasa: float = 2.0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Regresión logística multinomial por descenso de gradiente (lote completo), con pesos de
+    clase balanceados. Devuelve `(W, b)` con W de forma (dim, n_clases).
+    """
+    n, dim = X.shape
+    objetivo = np.eye(n_clases)[y]
+    conteos = np.bincount(y, minlength=n_clases).astype(np.float64)
+    peso_muestra = (n / (n_clases * np.clip(conteos, 1, None)))[y][:, np.newaxis]
+
+    W = np.zeros((dim, n_clases))
+    b = np.zeros(n_clases)
+    for _ in range(iteraciones):
+        error = (_softmax(X @ W + b) - objetivo) * peso_muestra / n
+        W -= tasa * (X.T @ error + l2 * W)
+        b -= tasa * error.sum(axis=0)
+    return W.astype(np.float32), b.astype(np.float32)
+
+
+class ClasificadorIntenciones:
+    """
+    Cabeza lineal sobre el embedding compartido que da, en una sola pasada, la probabilidad de
+    confirmación, indiferencia, contexto de precio u otra cosa. Los pesos se entrenan con
+    `local_tests/entrenar_intenciones.py` a partir de las listas de frases de los detectores.
+
+    Si no hay archivo de pesos (o se entrenó con otro modelo de embeddings) `disponible` es
+    False y los detectores siguen con sus bancos de frases.
+    """
+    def __init__(self, ruta: str = RUTA_INTENCIONES, servicio=servicio_embeddings, umbral: float = UMBRAL_INTENCION):
+        self.ruta = ruta
+        self.servicio = servicio
+        self.umbral = umbral
+        self.W = None
+        self.b = None
+        self.clases = INTENCIONES
+        self.exactitud = None
+        self._cargado = False
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        try:
+            with np.load(self.ruta) as datos:
+                firma = str(datos["firma"])
+                if firma != self.servicio.firma:
+                    logger.warning(
+                        "⚠️ Clasificador de intenciones entrenado con otro modelo de embeddings; se ignora",
+                        extra={"ruta": self.ruta, "firma": firma, "esperada": self.servicio.firma}
+                    )
+                    return
+                self.W, self.b = datos["W"], datos["b"]
+                self.clases = tuple(str(clase) for clase in datos["clases"])
+                exactitud = float(datos["exactitud"]) if "exactitud" in datos else np.nan
+                self.exactitud = None if np.isnan(exactitud) else exactitud
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError):
+            logger.warning(f"⚠️ No se pudo leer el clasificador de intenciones en {self.ruta}", exc_info=True)
+            return
+        logger.info("🎯 Clasificador de intenciones cargado", extra={"clases": self.clases, "exactitud": self.exactitud})
+
+    @property
+    def disponible(self) -> bool:
+        if not self._cargado:
+            with self._lock:
+                if not self._cargado:
+                    self._cargar()
+                    self._cargado = True
+        return self.W is not None
+
+    def probabilidades(self, texto: str) -> dict[str, float]:
+        vector = self.servicio.encode(texto)
+        probs = _softmax(vector @ self.W + self.b)
+        return {clase: float(p) for clase, p in zip(self.clases, probs)}
+
+    def es(self, texto: str, intencion: str) -> bool:
+        return self.probabilidades(texto).get(intencion, 0.0) >= self.umbral
+
+    def guardar(self, W: np.ndarray, b: np.ndarray, exactitud: float | None = None):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        temporal = f"{self.ruta}.tmp.npz"
+        np.savez(
+            temporal, W=W, b=b, clases=np.array(self.clases), firma=np.array(self.servicio.firma),
+            exactitud=np.array(exactitud if exactitud is not None else np.nan)
+        )
+        os.replace(temporal, self.ruta)
+        with self._lock:
+            self.W, self.b, self.exactitud, self._cargado = W, b, exactitud, True
+
+    def estado(self) -> dict:
+        return {
+            "disponible": self.disponible,
+            "clases": list(self.clases),
+            "umbral": self.umbral,
+            "exactitud": self.exactitud
+        }
+
+
+# Instancia única del proceso
+clasificador_intenciones = ClasificadorIntenciones()
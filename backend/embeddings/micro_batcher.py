@@ -0,0 +1,168 @@
+from backend.logger_setup import get_logger
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+from typing import Callable
+import numpy as np
+import threading
+import queue
+import time
+
+logger = get_logger(__name__)
+
+
+class MicroLotes:
+    """
+    Junta los textos que llegan de varias solicitudes durante unos milisegundos y los codifica
+    en una sola pasada del modelo, en un hilo propio (fuera del event loop). Cada llamador
+    recibe un Future con las filas que le corresponden.
+
+    Un pedido nunca espera más de `espera_ms` a que lleguen otros; si ya hay `max_lote`
+    textos juntos, el lote sale de inmediato.
+
+    Si el hilo de lotes falla, los pedidos pendientes reciben la excepción y el siguiente pedido
+    lo vuelve a levantar; si un resultado tarda más de `timeout_s`, el llamador codifica directo.
+    """
+    def __init__(self, codificar: Callable[[list[str]], np.ndarray], max_lote: int = 32, espera_ms: float = 5.0,
+                 al_iniciar: Callable[[], object] | None = None, timeout_s: float = 30.0):
+        self.codificar_lote = codificar
+        self.timeout_s = timeout_s
+        # Se ejecuta dentro del hilo de lotes antes del primer lote (p. ej. fijar afinidad de CPU)
+        self.al_iniciar = al_iniciar
+        self.max_lote = max(1, max_lote)
+        self.espera_s = max(0.0, espera_ms) / 1000
+        self._cola = queue.Queue()
+        self._pendiente = None
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._lotes = 0
+        self._textos = 0
+        self._mayor_lote = 0
+        self._directos = 0
+
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            with self._lock:
+                if self._hilo is None or not self._hilo.is_alive():
+                    self._hilo = threading.Thread(target=self._bucle, name="embeddings-lotes", daemon=True)
+                    self._hilo.start()
+
+    def enviar(self, textos: list[str]) -> Future:
+        futuro = Future()
+        if not textos:
+            futuro.set_result(self.codificar_lote([]))
+            return futuro
+        # Primero a la cola: si el hilo se cae justo ahora, al morir falla también este pedido
+        self._cola.put((list(textos), futuro))
+        self._asegurar_hilo()
+        return futuro
+
+    def codificar(self, textos: list[str]) -> np.ndarray:
+        try:
+            return self.enviar(textos).result(timeout=self.timeout_s)
+        except FuturesTimeoutError:
+            logger.warning("⚠️ El lote de embeddings no respondió a tiempo, codificando directo", extra={"textos": len(textos)})
+            self._directos += 1
+            return self.codificar_lote(list(textos))
+
+    def _siguiente(self, timeout: float | None):
+        if self._pendiente is not None:
+            pedido, self._pendiente = self._pendiente, None
+            return pedido
+        return self._cola.get(timeout=timeout)
+
+    def _juntar(self) -> list[tuple[list[str], Future]]:
+        pedidos = [self._siguiente(None)]
+        if pedidos[0] is None:
+            return pedidos
+        total = len(pedidos[0][0])
+        limite = time.monotonic() + self.espera_s
+
+        while total < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pedido = self._siguiente(restante)
+            except queue.Empty:
+                break
+            if pedido is None:
+                # Señal de cierre: se atiende después de este lote
+                self._cola.put(None)
+                break
+            if total + len(pedido[0]) > self.max_lote:
+                # No cabe: queda para la siguiente vuelta
+                self._pendiente = pedido
+                break
+            pedidos.append(pedido)
+            total += len(pedido[0])
+        return pedidos
+
+    def _bucle(self):
+        if self.al_iniciar is not None:
+            try:
+                self.al_iniciar()
+            except Exception:
+                # Solo prepara el hilo (afinidad): sin eso los lotes igual funcionan
+                logger.warning("⚠️ Falló la preparación del hilo de lotes", exc_info=True)
+        try:
+            while True:
+                pedidos = self._juntar()
+                if pedidos[0] is None:
+                    return
+                self._atender(pedidos)
+        except BaseException as e:
+            # El hilo termina aquí; el siguiente pedido levanta uno nuevo
+            logger.error("❌ El hilo de lotes de embeddings se detuvo", exc_info=True)
+            self._fallar_pendientes(e)
+
+    def _atender(self, pedidos: list[tuple[list[str], Future]]):
+        textos = list(dict.fromkeys(texto for pedido, _ in pedidos for texto in pedido))
+        try:
+            vectores = self.codificar_lote(textos)
+            posicion = {texto: i for i, texto in enumerate(textos)}
+            resultados = [vectores[[posicion[texto] for texto in pedido]] for pedido, _ in pedidos]
+        except Exception as e:
+            logger.warning("⚠️ Falló un lote de embeddings", exc_info=True, extra={"textos": len(textos)})
+            for _, futuro in pedidos:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        for (_, futuro), resultado in zip(pedidos, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+        self._lotes += 1
+        self._textos += len(textos)
+        self._mayor_lote = max(self._mayor_lote, len(textos))
+
+    def _fallar_pendientes(self, error: BaseException):
+        """
+        Nadie más va a atender la cola: cada pedido en espera recibe el error en vez de colgarse.
+        """
+        pedidos = [self._pendiente] if self._pendiente is not None else []
+        self._pendiente = None
+        while True:
+            try:
+                pedidos.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        for pedido in pedidos:
+            if pedido is not None and not pedido[1].done():
+                pedido[1].set_exception(RuntimeError(f"El hilo de lotes de embeddings se detuvo: {error!r}"))
+
+    def cerrar(self):
+        if self._hilo is not None:
+            self._cola.put(None)
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def estado(self) -> dict:
+        return {
+            "max_lote": self.max_lote,
+            "espera_ms": round(self.espera_s * 1000, 2),
+            "lotes": self._lotes,
+            "textos": self._textos,
+            "promedio_lote": round(self._textos / self._lotes, 2) if self._lotes else None,
+            "mayor_lote": self._mayor_lote,
+            "codificados_directo": self._directos
+        }
@@ -0,0 +1,64 @@
+from backend.logger_setup import get_logger
+import numpy as np
+import os
+
+logger = get_logger(__name__)
+
+RUTA_ONNX = os.getenv("EMBEDDINGS_ONNX_PATH", "/data/storage/embeddings/onnx")
+ARCHIVO_ONNX = "model_int8.onnx"
+ARCHIVO_TOKENIZER = "tokenizer.json"
+# Igual que `max_seq_length` de all-MiniLM-L6-v2 en sentence-transformers
+LONGITUD_MAXIMA = 256
+
+
+class ModeloOnnx:
+    """
+    MiniLM exportado a ONNX y cuantizado a int8, ejecutado con onnxruntime y `tokenizers`:
+    no importa torch. Expone el mismo `encode` que SentenceTransformer (mean pooling sobre la
+    máscara de atención y normalización L2), así `ServicioEmbeddings` lo usa sin cambios.
+
+    El modelo se genera con `local_tests/exportar_embeddings_onnx.py`.
+    """
+    def __init__(self, ruta: str = RUTA_ONNX, n_hilos: int | None = None, longitud_maxima: int = LONGITUD_MAXIMA):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.ruta = ruta
+        self.tokenizer = Tokenizer.from_file(os.path.join(ruta, ARCHIVO_TOKENIZER))
+        self.tokenizer.enable_truncation(max_length=longitud_maxima)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        opciones = ort.SessionOptions()
+        opciones.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if n_hilos:
+            opciones.intra_op_num_threads = n_hilos
+            opciones.inter_op_num_threads = 1
+        self.sesion = ort.InferenceSession(
+            os.path.join(ruta, ARCHIVO_ONNX), opciones, providers=["CPUExecutionProvider"]
+        )
+        self._entradas = {entrada.name for entrada in self.sesion.get_inputs()}
+        self.dimension = self.sesion.get_outputs()[0].shape[-1]
+
+    def encode(self, textos: str | list[str], normalize_embeddings: bool = True, convert_to_numpy: bool = True) -> np.ndarray:
+        unico = isinstance(textos, str)
+        lista = [textos] if unico else list(textos)
+        if not lista:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        codificados = self.tokenizer.encode_batch(lista)
+        mascara = np.array([c.attention_mask for c in codificados], dtype=np.int64)
+        entradas = {
+            "input_ids": np.array([c.ids for c in codificados], dtype=np.int64),
+            "attention_mask": mascara,
+            "token_type_ids": np.array([c.type_ids for c in codificados], dtype=np.int64)
+        }
+        ocultos = self.sesion.run(None, {k: v for k, v in entradas.items() if k in self._entradas})[0]
+
+        # Mean pooling sobre los tokens reales (sin padding)
+        pesos = mascara[..., np.newaxis].astype(ocultos.dtype)
+        vectores = (ocultos * pesos).sum(axis=1) / np.clip(pesos.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            vectores /= np.clip(np.linalg.norm(vectores, axis=1, keepdims=True), 1e-12, None)
+
+        vectores = vectores.astype(np.float32, copy=False)
+        return vectores[0] if unico else vectores
@@ -0,0 +1,39 @@
+from typing import Iterator
+
+
+class BackendLLM:
+    """
+    Interfaz que `LLMEngine` espera de un backend de inferencia.
+
+    `generar` devuelve el formato de llama.cpp (`choices`, `usage`) más `metricas`;
+    `generar_stream` entrega fragmentos de llama.cpp y como último elemento `{"metricas": {...}}`.
+    `cancelacion` es cualquier objeto con `is_set()`: al activarse se deja de generar.
+    """
+    # Generaciones simultáneas que admite el backend (concurrencia por defecto de la cola)
+    slots = 1
+    n_ctx = 4096
+
+    def evaluar_prefijo(self, prefijo: str):
+        """
+        Precalcula el bloque <<SYS>> común a todos los prompts. Opcional.
+        """
+
+    def olvidar_sesion(self, session_id: str):
+        """
+        Libera lo que el backend guarde de una sesión. Opcional.
+        """
+
+    def generar(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> dict:
+        raise NotImplementedError
+
+    def generar_stream(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def contar_tokens(self, texto: str) -> int:
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+    def estado(self) -> dict:
+        return {"tipo": type(self).__name__}
@@ -0,0 +1,176 @@
+from backend.cpu_partition import nucleos_disponibles
+from backend.logger_setup import get_logger
+import platform
+import datetime
+import hashlib
+import json
+import time
+import os
+
+logger = get_logger(__name__)
+
+RUTA_CALIBRACION = os.getenv("LLM_CALIBRACION_PATH", "/data/storage/calibracion_llm.json")
+
+# Texto neutro para las mediciones; se repite hasta completar los tokens necesarios
+TEXTO_CALIBRACION = (
+    "Hola, busco un apartamento de tres habitaciones y dos baños en el barrio Laureles de Medellín, "
+    "con parqueadero, balcón y buena iluminación, cerca de transporte público y zonas verdes. "
+)
+TOKENS_PREFILL = 512
+TOKENS_DECODE = 32
+CANDIDATOS_BATCH = (128, 256, 512)
+
+
+def firma_cpu() -> str:
+    modelo_cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for linea in f:
+                if linea.startswith("model name"):
+                    modelo_cpu = linea.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{modelo_cpu}|{platform.machine()}|{nucleos_disponibles()}"
+
+
+def huella_modelo(model_path: str, muestra_bytes: int = 1024 * 1024) -> str:
+    """
+    Hash del tamaño y del primer y último MB del GGUF: distingue modelos sin leer varios GB.
+    """
+    tamano = os.path.getsize(model_path)
+    digest = hashlib.sha1(str(tamano).encode("utf-8"))
+    with open(model_path, "rb") as f:
+        digest.update(f.read(muestra_bytes))
+        if tamano > muestra_bytes:
+            f.seek(max(muestra_bytes, tamano - muestra_bytes))
+            digest.update(f.read(muestra_bytes))
+    return digest.hexdigest()
+
+
+def _medir(model_path: str, n_threads: int, n_batch: int) -> dict:
+    """
+    Mide prefill (un lote de TOKENS_PREFILL) y decode (TOKENS_DECODE de a uno) con una configuración.
+    """
+    from llama_cpp import Llama
+
+    llm = Llama(
+        model_path=model_path,
+        n_ctx=TOKENS_PREFILL + TOKENS_DECODE + 64,
+        n_threads=n_threads,
+        n_threads_batch=n_threads,
+        n_batch=n_batch,
+        use_mmap=True,
+        verbose=False
+    )
+    try:
+        base = llm.tokenize(TEXTO_CALIBRACION.encode("utf-8"), add_bos=False)
+        tokens = (base * (TOKENS_PREFILL // len(base) + 1))[:TOKENS_PREFILL]
+
+        # Calentamiento: las primeras evaluaciones pagan fallos de página del mmap
+        llm.eval(tokens[:16])
+        llm.reset()
+
+        inicio = time.perf_counter()
+        llm.eval(tokens)
+        prefill_s = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        for token in tokens[:TOKENS_DECODE]:
+            llm.eval([token])
+        decode_s = time.perf_counter() - inicio
+    finally:
+        llm.close()
+
+    return {
+        "n_threads": n_threads,
+        "n_batch": n_batch,
+        "prefill_tps": round(TOKENS_PREFILL / prefill_s, 2),
+        "decode_tps": round(TOKENS_DECODE / decode_s, 2)
+    }
+
+
+def calibrar(model_path: str) -> dict:
+    """
+    Prueba varios números de hilos (decode y prefill) y luego tamaños de lote para el mejor
+    prefill. Devuelve la configuración más rápida junto con todas las mediciones.
+    """
+    from backend.cpu_partition import particion_cpu
+
+    # Solo se prueban hilos dentro de los núcleos reservados al LLM
+    nucleos = particion_cpu.hilos_llm
+    candidatos_hilos = sorted({max(1, nucleos * fraccion // 4) for fraccion in (1, 2, 3, 4)})
+    logger.info(f"⏱️ Calibrando llama.cpp: hilos {candidatos_hilos}, lotes {list(CANDIDATOS_BATCH)}")
+
+    mediciones = []
+    for n_threads in candidatos_hilos:
+        medicion = _medir(model_path, n_threads, max(CANDIDATOS_BATCH))
+        logger.info(f"  - {medicion}")
+        mediciones.append(medicion)
+
+    mejor_decode = max(mediciones, key=lambda m: m["decode_tps"])
+    mejor_prefill = max(mediciones, key=lambda m: m["prefill_tps"])
+
+    for n_batch in CANDIDATOS_BATCH:
+        if n_batch == max(CANDIDATOS_BATCH):
+            continue
+        medicion = _medir(model_path, mejor_prefill["n_threads"], n_batch)
+        logger.info(f"  - {medicion}")
+        mediciones.append(medicion)
+        if medicion["prefill_tps"] > mejor_prefill["prefill_tps"]:
+            mejor_prefill = medicion
+
+    return {
+        "n_threads": mejor_decode["n_threads"],
+        "n_threads_batch": mejor_prefill["n_threads"],
+        "n_batch": mejor_prefill["n_batch"],
+        "decode_tps": mejor_decode["decode_tps"],
+        "prefill_tps": mejor_prefill["prefill_tps"],
+        "fecha": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "mediciones": mediciones
+    }
+
+
+def _leer_calibraciones(ruta: str) -> dict:
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_calibracion(ruta: str, clave: str, calibracion: dict):
+    calibraciones = _leer_calibraciones(ruta)
+    calibraciones[clave] = calibracion
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(calibraciones, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
+
+
+def obtener_calibracion(model_path: str, ruta: str = RUTA_CALIBRACION) -> dict | None:
+    """
+    Devuelve la calibración guardada para este modelo y esta CPU. Según `LLM_CALIBRAR`:
+    - `1`: si no existe, calibra y la guarda para los siguientes arranques.
+    - `forzar`: vuelve a calibrar siempre.
+    - cualquier otro valor: no calibra (configuración por nombre de modelo).
+    """
+    modo = os.getenv("LLM_CALIBRAR", "0").strip().lower()
+    if modo not in ("1", "forzar"):
+        return None
+
+    clave = f"{huella_modelo(model_path)}|{firma_cpu()}"
+    if modo == "1":
+        guardada = _leer_calibraciones(ruta).get(clave)
+        if guardada is not None:
+            logger.info(f"♻️ Usando calibración guardada del {guardada.get('fecha')}", extra={"clave": clave})
+            return guardada
+
+    calibracion = calibrar(model_path)
+    try:
+        _guardar_calibracion(ruta, clave, calibracion)
+        logger.info(f"💾 Calibración guardada en {ruta}")
+    except OSError:
+        logger.warning(f"⚠️ No se pudo guardar la calibración en {ruta}", exc_info=True)
+    return calibracion
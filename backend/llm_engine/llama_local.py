@@ -0,0 +1,290 @@
+from backend.llm_engine.backend_base import BackendLLM
+from backend.llm_engine.state_cache import CacheEstadosSesion
+from backend.llm_engine.speculative import crear_modelo_borrador
+from backend.llm_engine.calibration import obtener_calibracion
+from backend.cpu_partition import particion_cpu, nucleos_disponibles
+from backend.logger_setup import get_logger
+from llama_cpp import Llama, StoppingCriteriaList
+from contextlib import nullcontext
+from typing import Iterator
+import numpy as np
+import time
+import os
+
+logger = get_logger(__name__)
+
+
+def _prefijo_comun(a, b) -> int:
+    """
+    Cantidad de tokens iniciales que comparten dos secuencias.
+    """
+    n = min(len(a), len(b))
+    if n == 0:
+        return 0
+    distintos = np.nonzero(np.asarray(a[:n]) != np.asarray(b[:n]))[0]
+    return int(distintos[0]) if len(distintos) else n
+
+
+def _con_cancelacion(parametros: dict, cancelacion) -> dict:
+    """
+    Agrega un criterio de parada que se revisa después de cada token: si se activa
+    `cancelacion` (cualquier objeto con `is_set()`), llama.cpp deja de generar.
+    """
+    if cancelacion is None:
+        return parametros
+    return {**parametros, "stopping_criteria": StoppingCriteriaList([lambda input_ids, logits: cancelacion.is_set()])}
+
+
+def configuracion_modelo(model_path: str) -> tuple[int, int]:
+    """
+    Devuelve `(n_threads, n_ctx)` según el modelo detectado por su nombre de archivo.
+    """
+    model_name = os.path.basename(model_path).lower()
+    # Solo los núcleos reservados al LLM (el resto es de embeddings y fuzzy matching)
+    total_cores = particion_cpu.hilos_llm
+
+    if "tinyllama" in model_name:
+        return min(total_cores, 16), 2048
+    elif "mistral" in model_name:
+        return min(total_cores, 16), 4096
+    elif "llama3-8b" in model_name:
+        return min(total_cores, 24), 8192
+    elif "llama3-70b" in model_name:
+        return min(total_cores, 32), 32768
+    else:
+        return min(total_cores, 16), 4096
+
+
+class LlamaLocal(BackendLLM):
+    """
+    Instancia de llama.cpp dentro del proceso actual, con la caché del prefijo <<SYS>>
+    y los estados por sesión. Es la unidad que también ejecuta cada worker del pool.
+
+    No es thread-safe: quien la usa debe garantizar una sola generación a la vez.
+
+    Con `CPU_AFINIDAD` la carga, el prefijo y cada generación corren fijados a los núcleos
+    del LLM (los hilos de llama.cpp heredan la afinidad del hilo que los crea). Los workers
+    del pool pasan `fijar_afinidad=False`: su proceso ya quedó fijado a su porción.
+    """
+    slots = 1
+
+    def __init__(self, model_path: str, n_threads: int | None = None, fijar_afinidad: bool = True):
+        self.fijar_afinidad = fijar_afinidad
+        try:
+            model_name = os.path.basename(model_path).lower()
+            total_cores = nucleos_disponibles()
+
+            # === Configuración dinámica basada en el modelo detectado ===
+            n_threads_modelo, n_ctx = configuracion_modelo(model_path)
+
+            # === Calibración opcional (LLM_CALIBRAR): hilos y lote medidos en este host ===
+            # Los workers del pool reciben sus hilos ya repartidos, así que no calibran
+            ajustes_lote = {}
+            if n_threads is None:
+                calibracion = obtener_calibracion(model_path)
+                if calibracion is not None:
+                    # La calibración no puede pasarse de los núcleos reservados al LLM
+                    n_threads_modelo = min(calibracion["n_threads"], particion_cpu.hilos_llm)
+                    ajustes_lote = {
+                        "n_threads_batch": min(calibracion["n_threads_batch"], particion_cpu.hilos_llm),
+                        "n_batch": calibracion["n_batch"]
+                    }
+
+            n_threads = n_threads or n_threads_modelo
+            n_gpu_layers = int(os.getenv("LLAMA_GPU_LAYERS", 0))
+
+            logger.info("🔧 Configuración del modelo:")
+            logger.info(f"  - Modelo detectado: {model_name}")
+            logger.info(f"  - n_ctx: {n_ctx}")
+            logger.info(f"  - n_threads: {n_threads}")
+            if ajustes_lote:
+                logger.info(f"  - n_threads_batch: {ajustes_lote['n_threads_batch']}, n_batch: {ajustes_lote['n_batch']} (calibrados)")
+            logger.info(f"  - n_gpu_layers: {n_gpu_layers}")
+            logger.info(f"🖥️  Núcleos disponibles: {total_cores}")
+            logger.info("⚠️ Ejecutando en CPU" if n_gpu_layers == 0 else "⚙️ Ejecutando con capas en GPU")
+
+            # === Decodificación especulativa opcional (LLM_ESPECULATIVO) ===
+            borrador = crear_modelo_borrador(model_path, n_ctx=n_ctx, n_threads=n_threads)
+
+            # === Inicialización segura del modelo ===
+            with self._afinidad():
+                self.model = Llama(
+                    model_path=model_path,
+                    n_ctx=n_ctx,
+                    n_threads=n_threads,
+                    n_gpu_layers=n_gpu_layers,
+                    use_mlock=True,
+                    use_mmap=True,
+                    low_vram=False,
+                    draft_model=borrador,
+                    verbose=False,
+                    **ajustes_lote
+                )
+
+            logger.debug("✅ Modelo instanciado correctamente")
+
+        except Exception as e:
+            logger.error(f"❌ Fallo al cargar el modelo: {e}", exc_info=True)
+            raise
+
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.modo_especulativo = os.getenv("LLM_ESPECULATIVO", "").strip().lower() if borrador is not None else "desactivado"
+
+        # === Caché KV del prefijo <<SYS>> (se llena con `evaluar_prefijo`) ===
+        self._estado_prefijo = None
+        self._tokens_prefijo = []
+
+        # === Estados por sesión: el siguiente turno solo evalúa los tokens nuevos ===
+        self.cache_sesiones = CacheEstadosSesion(int(os.getenv("LLM_CACHE_SESIONES_MB", 1024)) * 1024 * 1024)
+
+    def _afinidad(self):
+        return particion_cpu.afinidad_temporal("llm") if self.fijar_afinidad else nullcontext()
+
+    def evaluar_prefijo(self, prefijo: str):
+        """
+        Evalúa una sola vez el prefijo fijo del prompt y guarda el estado de llama.cpp.
+        """
+        with self._afinidad():
+            self._evaluar_prefijo(prefijo)
+
+    def _evaluar_prefijo(self, prefijo: str):
+        start_time = time.perf_counter()
+
+        # special=True como llama.cpp al tokenizar el prompt: [INST] y <<SYS>> quedan igual
+        tokens = self.model.tokenize(prefijo.encode("utf-8"), special=True)
+        # El último token queda fuera: en el prompt completo podría fusionarse con el texto siguiente
+        tokens = tokens[:-1]
+
+        self.model.reset()
+        self.model.eval(tokens)
+        self._estado_prefijo = self.model.save_state()
+        self._tokens_prefijo = tokens
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"🧊 Prefijo del sistema en caché: {len(tokens)} tokens evaluados en {elapsed:.2f} segundos")
+
+    def _preparar_contexto(self, prompt: str, session_id: str | None) -> tuple[int, int]:
+        """
+        Deja cargado el estado que comparte más tokens iniciales con el prompt: el contexto
+        actual, el último estado de la sesión o el prefijo <<SYS>>. llama.cpp reutiliza ese
+        prefijo común y solo evalúa el resto. Devuelve `(tokens_prompt, tokens_reutilizados)`.
+        """
+        tokens = self.model.tokenize(prompt.encode("utf-8"), special=True)
+
+        mejor = _prefijo_comun(self.model.input_ids[:self.model.n_tokens], tokens)
+        mejor_estado, origen = None, "contexto"
+
+        if session_id:
+            estado_sesion = self.cache_sesiones.obtener(session_id)
+            if estado_sesion is not None:
+                comunes = _prefijo_comun(estado_sesion.input_ids[:estado_sesion.n_tokens], tokens)
+                if comunes > mejor:
+                    mejor, mejor_estado, origen = comunes, estado_sesion, "sesion"
+
+        if self._estado_prefijo is not None:
+            comunes = _prefijo_comun(self._tokens_prefijo, tokens)
+            if comunes == len(self._tokens_prefijo) and comunes > mejor:
+                mejor, mejor_estado, origen = comunes, self._estado_prefijo, "prefijo"
+
+        if mejor_estado is not None:
+            self.model.load_state(mejor_estado)
+
+        logger.debug(f"♻️ Reutilizando {mejor}/{len(tokens)} tokens del prompt (origen: {origen})", extra={"session_id": session_id})
+        return len(tokens), mejor
+
+    def _guardar_estado_sesion(self, session_id: str | None):
+        if not session_id or not self.cache_sesiones.habilitada:
+            return
+        estado = self.model.save_state()
+        # LlamaState también copia la matriz de logits, que puede pesar más que el KV
+        self.cache_sesiones.guardar(session_id, estado, estado.llama_state_size + estado.scores.nbytes)
+
+    def olvidar_sesion(self, session_id: str):
+        """
+        Libera el estado guardado de una sesión (se llama al resetear o limpiar la sesión).
+        """
+        self.cache_sesiones.eliminar(session_id)
+
+    def _iterar(self, prompt: str, parametros: dict, session_id: str | None, cancelacion, medicion: dict) -> Iterator[dict]:
+        """
+        Genera en streaming y, al terminar, completa `medicion` con prefill, decode y tokens/s.
+        Se consume entero en un mismo hilo, que queda en los núcleos del LLM mientras tanto.
+        """
+        with self._afinidad():
+            yield from self._generar_medido(prompt, parametros, session_id, cancelacion, medicion)
+
+    def _generar_medido(self, prompt: str, parametros: dict, session_id: str | None, cancelacion, medicion: dict) -> Iterator[dict]:
+        tokens_prompt, reutilizados = self._preparar_contexto(prompt, session_id)
+        inicio = time.perf_counter()
+        primer_token = None
+        motivo_fin = None
+
+        for chunk in self.model(prompt, stream=True, **_con_cancelacion(parametros, cancelacion)):
+            if primer_token is None:
+                primer_token = time.perf_counter() - inicio
+            motivo_fin = chunk["choices"][0].get("finish_reason") or motivo_fin
+            yield chunk
+
+        total = time.perf_counter() - inicio
+        primer_token = primer_token if primer_token is not None else total
+        # El último token muestreado no llega a evaluarse, por eso el +1
+        tokens_completados = max(0, self.model.n_tokens - tokens_prompt + 1)
+        decode_s = total - primer_token
+
+        medicion.update({
+            "tokens_prompt": tokens_prompt,
+            "tokens_reutilizados": reutilizados,
+            "tokens_prefill": tokens_prompt - reutilizados,
+            "prefill_s": round(primer_token, 3),
+            "primer_token_s": round(primer_token, 3),
+            "tokens_completados": tokens_completados,
+            "decode_s": round(decode_s, 3),
+            "tokens_por_s": round((tokens_completados - 1) / decode_s, 2) if decode_s > 0 and tokens_completados > 1 else None,
+            "motivo_fin": motivo_fin,
+            "modo_especulativo": self.modo_especulativo
+        })
+
+        self._guardar_estado_sesion(session_id)
+
+    def generar(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> dict:
+        """
+        Respuesta completa con el mismo formato de llama.cpp (`choices`, `usage`) más `metricas`.
+        Internamente usa streaming para poder medir el tiempo al primer token.
+        """
+        medicion = {}
+        texto = "".join(chunk["choices"][0].get("text", "") for chunk in self._iterar(prompt, parametros, session_id, cancelacion, medicion))
+        return {
+            "choices": [{"text": texto, "finish_reason": medicion.get("motivo_fin")}],
+            "usage": {
+                "prompt_tokens": medicion.get("tokens_prompt"),
+                "completion_tokens": medicion.get("tokens_completados")
+            },
+            "metricas": medicion
+        }
+
+    def generar_stream(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> Iterator[dict]:
+        """
+        Fragmentos de llama.cpp; el último elemento es `{"metricas": {...}}` sin `choices`.
+        """
+        medicion = {}
+        yield from self._iterar(prompt, parametros, session_id, cancelacion, medicion)
+        yield {"metricas": medicion}
+
+    def contar_tokens(self, texto: str) -> int:
+        # La tokenización solo lee el vocabulario: es segura aunque haya una generación en curso
+        return len(self.model.tokenize(texto.encode("utf-8"), add_bos=False))
+
+    def cerrar(self):
+        self.model.close()
+
+    def estado(self) -> dict:
+        return {
+            "tipo": "local",
+            "n_ctx": self.n_ctx,
+            "n_threads": self.n_threads,
+            "modo_especulativo": self.modo_especulativo,
+            "prefijo_en_cache": len(self._tokens_prefijo),
+            "cache_sesiones": self.cache_sesiones.estado()
+        }
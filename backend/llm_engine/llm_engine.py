@@ -1,80 +1,126 @@
 ﻿from backend.api.utils.confirmation_utils import es_confirmacion_usuario
-from backend.api.utils.llm_prompt import build_prompt
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.api.utils.llm_prompt import build_prompt, build_prompt_prefix, formatear_mensaje, limpiar_roles_llm
+from backend.llm_engine.scheduler import PlanificadorInferencia, InferenciaCancelada
+from backend.llm_engine.telemetry import TelemetriaInferencia
+from backend.llm_engine.response_cache import CacheRespuestas
+from backend.llm_engine.backend_base import BackendLLM
 from backend.logger_setup import get_logger
 from dotenv import load_dotenv
-from llama_cpp import Llama
-import multiprocessing
+from typing import AsyncIterator
+import functools
+import threading
 import traceback
 import asyncio
 import time
 import sys
 import os
-import re
 
 logger = get_logger(__name__)
 
 load_dotenv()
 
-class LLMEngine:
-    def __init__(self, model_path: str, prompt_template_path: str):
-        try:
-            model_name = os.path.basename(model_path).lower()
-            total_cores = multiprocessing.cpu_count()
-
-            # === Configuración dinámica basada en el modelo detectado ===
-            if "tinyllama" in model_name:
-                n_threads = min(total_cores, 16)
-                n_ctx = 2048
-            elif "mistral" in model_name:
-                n_threads = min(total_cores, 16)
-                n_ctx = 4096
-            elif "llama3-8b" in model_name:
-                n_threads = min(total_cores, 24)
-                n_ctx = 8192
-            elif "llama3-70b" in model_name:
-                n_threads = min(total_cores, 32)
-                n_ctx = 32768
-            else:
-                n_threads = min(total_cores, 16)
-                n_ctx = 4096
-
-            n_gpu_layers = int(os.getenv("LLAMA_GPU_LAYERS", 0))
-
-            logger.info("🔧 Configuración del modelo:")
-            logger.info(f"  - Modelo detectado: {model_name}")
-            logger.info(f"  - n_ctx: {n_ctx}")
-            logger.info(f"  - n_threads: {n_threads}")
-            logger.info(f"  - n_gpu_layers: {n_gpu_layers}")
-            logger.info(f"🖥️  Núcleos disponibles: {total_cores}")
-            logger.info("⚠️ Ejecutando en CPU" if n_gpu_layers == 0 else "⚙️ Ejecutando con capas en GPU")
-
-            # === Inicialización segura del modelo ===
-            self.model = Llama(
-                model_path=model_path,
-                n_ctx=n_ctx,
-                n_threads=n_threads,
-                n_gpu_layers=n_gpu_layers,
-                use_mlock=True,
-                use_mmap=True,
-                low_vram=False,
-                verbose=False
-            )
+RESPUESTA_FALLBACK = (
+    "Hubo un problema generando la respuesta. Estoy organizando la información "
+    "y en breve te mostraré las opciones disponibles."
+)
 
-            logger.debug("✅ Modelo instanciado correctamente")
+# Tokens de holgura entre el prompt + max_tokens y n_ctx (BOS y uniones entre líneas)
+MARGEN_CONTEXTO = 16
 
-        except Exception as e:
-            logger.error(f"❌ Fallo al cargar el modelo: {e}", exc_info=True)
-            raise
+def crear_backend(model_path: str) -> BackendLLM:
+    """
+    Elige el backend de inferencia según `LLM_BACKEND`:
+    - `llama` (por defecto): llama.cpp en proceso, o un pool de procesos si `LLM_WORKERS` > 1.
+    - `simulado`: respuestas deterministas sin modelo, para pruebas de carga y benchmarks.
+    Los backends de llama.cpp se importan aquí para que el simulado no requiera llama_cpp.
+    """
+    tipo = os.getenv("LLM_BACKEND", "llama").strip().lower()
+
+    if tipo == "simulado":
+        from backend.llm_engine.stub_backend import BackendSimulado
+        return BackendSimulado()
+
+    if tipo != "llama":
+        raise ValueError(f"LLM_BACKEND desconocido: {tipo}")
 
+    n_workers = int(os.getenv("LLM_WORKERS", 1))
+    if n_workers > 1:
+        from backend.llm_engine.worker_pool import PoolLlama
+        return PoolLlama(model_path, n_workers)
+
+    from backend.llm_engine.llama_local import LlamaLocal
+    return LlamaLocal(model_path)
+
+
+class LLMEngine:
+    def __init__(self, model_path: str, prompt_template_path: str, backend: BackendLLM | None = None):
         if not os.path.exists(prompt_template_path):
             raise FileNotFoundError(f"Prompt no encontrado en: {prompt_template_path}")
 
+        self.model_path = model_path
+        self.prompt_path = prompt_template_path
+
+        # === Backend de inferencia: llama.cpp en proceso, pool de workers o simulado ===
+        self.backend = backend or crear_backend(model_path)
+
         with open(prompt_template_path, "r", encoding="utf-8") as f:
             self.prompt_template = f.read()
 
-    async def chat(self, user_input: str, history: list[dict]) -> str:
-        prompt = build_prompt(user_input, history, self.prompt_template)
+        # El bloque <<SYS>> y los textos repetidos se tokenizan una sola vez
+        self.contar_tokens = functools.lru_cache(maxsize=256)(self.backend.contar_tokens)
+
+        # === Cola de inferencia: una generación a la vez por instancia del modelo ===
+        self.planificador = PlanificadorInferencia(
+            concurrencia=int(os.getenv("LLM_CONCURRENCIA", self.backend.slots)),
+            max_cola=int(os.getenv("LLM_MAX_COLA", 8))
+        )
+        logger.info(f"🚦 Cola de inferencia: {self.planificador.estado()}")
+
+        # === Métricas por solicitud (TTFT, prefill, decode, cola) agregadas en histogramas ===
+        self.telemetria = TelemetriaInferencia()
+
+        # === Caché de respuestas conversacionales (saludos y preguntas genéricas) ===
+        umbral_semantico = float(os.getenv("LLM_CACHE_SEMANTICA_UMBRAL", 0.95))
+        self.cache_respuestas = CacheRespuestas(
+            max_entradas=int(os.getenv("LLM_CACHE_RESPUESTAS", 512)),
+            ttl_s=float(os.getenv("LLM_CACHE_RESPUESTAS_TTL", 3600)),
+            codificar=servicio_embeddings.encode if umbral_semantico > 0 else None,
+            umbral_semantico=umbral_semantico
+        )
+
+    async def preparar_cache_prefijo(self):
+        """
+        Evalúa una sola vez el bloque <<SYS>> del template y guarda el estado de llama.cpp,
+        para que cada solicitud solo tenga que procesar el historial y el mensaje nuevo.
+        """
+        if os.getenv("LLM_CACHE_PREFIJO", "1") != "1":
+            logger.info("ℹ️ Caché de prefijo desactivada (LLM_CACHE_PREFIJO != 1)")
+            return
+
+        prefijo = build_prompt_prefix(self.prompt_template)
+        async with self.planificador.turno():
+            await asyncio.to_thread(self.backend.evaluar_prefijo, prefijo)
 
+    def olvidar_sesion(self, session_id: str):
+        """
+        Libera el estado guardado de una sesión (se llama al resetear o limpiar la sesión).
+        """
+        self.backend.olvidar_sesion(session_id)
+
+    def contar_tokens_mensaje(self, mensaje: dict) -> int:
+        """
+        Tokens que ocupa un mensaje del historial dentro del prompt (lo cachea MemoryManager).
+        """
+        return self.contar_tokens(formatear_mensaje(mensaje))
+
+    def cerrar(self):
+        self.backend.cerrar()
+
+    def _preparar_inferencia(self, user_input: str, history: list[dict]) -> tuple[str, dict]:
+        """
+        Construye el prompt y los parámetros de generación compartidos por `chat` y `chat_stream`.
+        """
         # === Detección robusta de intención: regex + embeddings ===
         hay_confirmacion = es_confirmacion_usuario(user_input)
         hay_filtros = any("estos son los datos reales" in m["content"].lower() for m in history if m["role"] == "system")
@@ -87,43 +133,100 @@ class LLMEngine:
             max_tokens = 512 if user_chars < 200 else 768 if user_chars < 500 else 1024
 
         # === Hiperparámetros calibrados para velocidad y coherencia ===
-        temperature = 0.4
-        top_p = 0.85
-        top_k = 30
-        repeat_penalty = 1.2
-        frequency_penalty = 0.3
-        stop = ["Usuario:", "Asesor:", "<</SYS>>", "\nUsuario", "\nAsesor", "Sistema:", "\nSistema", "System:", "\nSystem"]
+        parametros = {
+            "max_tokens": max_tokens,
+            "temperature": 0.4,
+            "top_p": 0.85,
+            "top_k": 30,
+            "repeat_penalty": 1.2,
+            "frequency_penalty": 0.3,
+            "stop": ["Usuario:", "Asesor:", "<</SYS>>", "\nUsuario", "\nAsesor", "Sistema:", "\nSistema", "System:", "\nSystem"],
+        }
+
+        # === Prompt acotado por tokens: el historial llena lo que queda tras reservar max_tokens ===
+        presupuesto = self.backend.n_ctx - max_tokens - MARGEN_CONTEXTO
+        prompt = build_prompt(
+            user_input, history, self.prompt_template,
+            contar_tokens=self.contar_tokens,
+            presupuesto_tokens=presupuesto
+        )
 
         logger.debug("🚦 Parámetros de inferencia:")
         logger.debug(f"         - Confirmación detectada: {hay_confirmacion}")
-        logger.debug(f"         - max_tokens: {max_tokens}")
-        logger.debug(f"         - temperature: {temperature}, top_p: {top_p}, top_k: {top_k}")
-        logger.debug(f"         - repeat_penalty: {repeat_penalty}, frequency_penalty: {frequency_penalty}")
+        logger.debug(f"         - max_tokens: {parametros['max_tokens']}")
+        logger.debug(f"         - temperature: {parametros['temperature']}, top_p: {parametros['top_p']}, top_k: {parametros['top_k']}")
+        logger.debug(f"         - repeat_penalty: {parametros['repeat_penalty']}, frequency_penalty: {parametros['frequency_penalty']}")
+
+        return prompt, parametros
 
+    async def chat(self, user_input: str, history: list[dict], session_id: str | None = None,
+                   cancelacion: threading.Event | None = None) -> str:
+        """
+        Genera la respuesta completa. Si `cancelacion` se activa (p. ej. el cliente se
+        desconectó), la generación se corta en el siguiente token y se devuelve lo generado.
+        """
+        cacheada = await asyncio.to_thread(self.cache_respuestas.obtener, user_input, history)
+        if cacheada is not None:
+            logger.info("💾 Respuesta servida desde la caché", extra={"session_id": session_id})
+            return cacheada
+
+        # Fuera del event loop: detecta confirmación con embeddings y cuenta tokens del historial
+        prompt, parametros = await asyncio.to_thread(self._preparar_inferencia, user_input, history)
+
+        # Si la cola está llena se propaga ColaInferenciaLlena para responder 503.
+        # Una desconexión mientras espera libera su lugar en la cola sin tomar turno.
+        inicio_espera = time.perf_counter()
         try:
-            start_time = time.perf_counter()
-
-            output = await asyncio.to_thread(
-                self.model,
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                repeat_penalty=repeat_penalty,
-                frequency_penalty=frequency_penalty,
-                stop=stop
-            )
+            async with self.planificador.turno(cancelacion) as espera_cola:
+                if cancelacion is not None and cancelacion.is_set():
+                    raise InferenciaCancelada()
+                response = await self._completar(prompt, parametros, espera_cola, session_id, cancelacion)
+        except InferenciaCancelada:
+            logger.info("🔌 Solicitud cancelada mientras esperaba en la cola", extra={"session_id": session_id})
+            self._registrar_metricas("completo", {}, time.perf_counter() - inicio_espera, 0.0, session_id, "cancelado")
+            return ""
+
+        if response != RESPUESTA_FALLBACK and not (cancelacion is not None and cancelacion.is_set()):
+            await asyncio.to_thread(self.cache_respuestas.guardar, user_input, history, response)
+        return response
+
+    def _registrar_metricas(self, modo: str, metricas: dict, espera_cola: float, total_s: float,
+                            session_id: str | None, motivo_fin: str | None = None):
+        """
+        Completa la medición del backend con lo que solo ve el motor (cola, tiempo total)
+        y la envía a la telemetría.
+        """
+        medicion = {
+            **metricas,
+            "modo": modo,
+            "session_id": session_id,
+            "espera_cola_s": round(espera_cola, 3),
+            "total_s": round(total_s, 3)
+        }
+        if motivo_fin:
+            medicion["motivo_fin"] = motivo_fin
+        self.telemetria.registrar(medicion)
+
+    async def _completar(self, prompt: str, parametros: dict, espera_cola: float, session_id: str | None = None,
+                         cancelacion: threading.Event | None = None) -> str:
+        start_time = time.perf_counter()
+        try:
+            output = await asyncio.to_thread(self.backend.generar, prompt, parametros, session_id, cancelacion)
 
             elapsed = time.perf_counter() - start_time
-            logger.info(f"🕒 Tiempo de inferencia: {elapsed:.2f} segundos")
+            cancelada = cancelacion is not None and cancelacion.is_set()
+            self._registrar_metricas("completo", output.get("metricas", {}), espera_cola, elapsed, session_id,
+                                     "cancelado" if cancelada else None)
+            if cancelada:
+                logger.info(f"🔌 Generación cancelada tras {elapsed:.2f} segundos", extra={"session_id": session_id})
+                return output["choices"][0].get("text", "").strip() if output.get("choices") else ""
 
             choices = output.get("choices", [])
             if not choices or not isinstance(choices, list) or "text" not in choices[0]:
                 raise ValueError("La respuesta del modelo no contiene texto válido")
 
             response = choices[0]["text"].strip()
-            response = re.sub(r"(?:^|[\r\n]+)(Sistema:|Asesor:|Usuario:|System:)\s*", "", response, flags=re.IGNORECASE)
+            response = limpiar_roles_llm(response)
             if not response:
                 raise ValueError("Texto de respuesta vacío")
 
@@ -131,4 +234,107 @@ class LLMEngine:
 
         except Exception as e:
             logger.error(f"Durante inferencia: {e}", exc_info=True)
-            return "Hubo un problema generando la respuesta. Estoy organizando la información y en breve te mostraré las opciones disponibles."
+            self._registrar_metricas("completo", {}, espera_cola, time.perf_counter() - start_time, session_id, "error")
+            return RESPUESTA_FALLBACK
+
+    async def chat_stream(self, user_input: str, history: list[dict], session_id: str | None = None) -> AsyncIterator[str]:
+        """
+        Variante en streaming de `chat`: entrega los fragmentos de texto a medida que el modelo
+        los genera. Las cadenas de parada las resuelve llama.cpp, que retiene los fragmentos
+        que podrían formar parte de una de ellas.
+
+        Si el consumidor abandona el iterador (cliente desconectado), la generación se corta
+        en el siguiente token y el turno se libera.
+        """
+        cacheada = await asyncio.to_thread(self.cache_respuestas.obtener, user_input, history)
+        if cacheada is not None:
+            logger.info("💾 Respuesta servida desde la caché (streaming)", extra={"session_id": session_id})
+            yield cacheada
+            return
+
+        # Fuera del event loop: detecta confirmación con embeddings y cuenta tokens del historial
+        prompt, parametros = await asyncio.to_thread(self._preparar_inferencia, user_input, history)
+        fragmentos = []
+        resultado = {}
+
+        async with self.planificador.turno() as espera_cola:
+            async for fragmento in self._completar_stream(prompt, parametros, espera_cola, session_id, resultado):
+                fragmentos.append(fragmento)
+                yield fragmento
+
+        # Solo se llega aquí si el stream terminó completo (sin desconexión)
+        response = "".join(fragmentos).strip()
+        if response and response != RESPUESTA_FALLBACK and not resultado.get("error"):
+            await asyncio.to_thread(self.cache_respuestas.guardar, user_input, history, response)
+
+    async def _completar_stream(self, prompt: str, parametros: dict, espera_cola: float, session_id: str | None = None,
+                                resultado: dict | None = None) -> AsyncIterator[str]:
+        """
+        Si se pasa `resultado`, al terminar queda con `error=True` cuando la generación falló.
+        """
+        loop = asyncio.get_running_loop()
+        cola: asyncio.Queue = asyncio.Queue()
+        cancelacion = threading.Event()
+        metricas = {}
+
+        def producir():
+            try:
+                for chunk in self.backend.generar_stream(prompt, parametros, session_id, cancelacion):
+                    if "metricas" in chunk:
+                        metricas.update(chunk["metricas"])
+                        continue
+                    texto = chunk["choices"][0].get("text", "")
+                    if texto:
+                        loop.call_soon_threadsafe(cola.put_nowait, ("token", texto))
+            except Exception as e:
+                loop.call_soon_threadsafe(cola.put_nowait, ("error", e))
+            finally:
+                loop.call_soon_threadsafe(cola.put_nowait, ("fin", None))
+
+        start_time = time.perf_counter()
+        primer_token = None
+        emitidos = 0
+        productor = loop.run_in_executor(None, producir)
+
+        completo = False
+        hubo_error = False
+        try:
+            while True:
+                tipo, valor = await cola.get()
+                if tipo == "fin":
+                    break
+                if tipo == "error":
+                    logger.error(f"Durante inferencia en streaming: {valor}", exc_info=valor)
+                    hubo_error = True
+                    if resultado is not None:
+                        resultado["error"] = True
+                    if not emitidos:
+                        yield RESPUESTA_FALLBACK
+                    continue
+
+                # Se descarta el espacio inicial, igual que el .strip() de `chat`
+                if not emitidos:
+                    valor = valor.lstrip()
+                    if not valor:
+                        continue
+                    primer_token = time.perf_counter() - start_time
+                emitidos += 1
+                yield valor
+
+            if not emitidos:
+                yield RESPUESTA_FALLBACK
+            completo = True
+        finally:
+            if not completo:
+                cancelacion.set()
+            await productor
+            elapsed = time.perf_counter() - start_time
+            if not completo:
+                logger.info(f"🔌 Streaming cancelado tras {elapsed:.2f} segundos", extra={"session_id": session_id})
+            # El primer token visible (ya sin espacios iniciales) es el que percibe el usuario
+            if primer_token is not None:
+                metricas["primer_token_s"] = round(primer_token, 3)
+            self._registrar_metricas(
+                "stream", metricas, espera_cola, elapsed, session_id,
+                "error" if hubo_error else "cancelado" if not completo else None
+            )
@@ -0,0 +1,179 @@
+from backend.logger_setup import get_logger
+from collections import OrderedDict
+from typing import Callable
+import numpy as np
+import threading
+import hashlib
+import time
+import re
+
+logger = get_logger(__name__)
+
+# Señales de que una respuesta trae datos concretos (precios, áreas, cifras) y no debe reutilizarse
+_PATRON_DATOS_PROPIEDAD = re.compile(r"\$|\d{2,}|m²|\bm2\b", flags=re.IGNORECASE)
+
+
+def normalizar_mensaje(texto: str) -> str:
+    """
+    Minúsculas, sin signos de puntuación y con espacios colapsados.
+    """
+    texto = re.sub(r"[^\w\s]", " ", texto.lower())
+    return " ".join(texto.split())
+
+
+def huella_historial(history: list[dict]) -> str:
+    """
+    Identifica el contexto de la conversación (roles y contenidos, incluidos los bloques de sistema).
+    """
+    digest = hashlib.sha1()
+    for mensaje in history:
+        digest.update(mensaje["role"].encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(mensaje["content"].encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+def es_cacheable(history: list[dict], respuesta: str) -> bool:
+    """
+    Solo se reutilizan respuestas conversacionales: sin resumen real de propiedad en el
+    historial y sin cifras en la respuesta.
+    """
+    if any("estos son los datos reales" in m["content"].lower() for m in history if m["role"] == "system"):
+        return False
+    return not _PATRON_DATOS_PROPIEDAD.search(respuesta)
+
+
+class CacheRespuestas:
+    """
+    Caché de respuestas del LLM indexada por (huella del historial, mensaje normalizado).
+    Con `codificar` activa un segundo nivel semántico: dentro del mismo historial, un mensaje
+    cuyo embedding supere `umbral_semantico` contra uno cacheado reutiliza su respuesta.
+    Expulsa por TTL y por LRU al superar `max_entradas`.
+    """
+    def __init__(self, max_entradas: int = 512, ttl_s: float = 3600.0,
+                 codificar: Callable[[str], np.ndarray] | None = None, umbral_semantico: float = 0.95):
+        self.max_entradas = max(0, max_entradas)
+        self.ttl_s = ttl_s
+        self.codificar = codificar
+        self.umbral_semantico = umbral_semantico
+        self._entradas = OrderedDict()
+        self._por_huella = {}
+        self._aciertos_exactos = 0
+        self._aciertos_semanticos = 0
+        self._fallos = 0
+        self._no_cacheables = 0
+        self._expulsiones = 0
+        self.lock = threading.Lock()
+
+    @property
+    def habilitada(self) -> bool:
+        return self.max_entradas > 0
+
+    def _eliminar(self, clave: tuple):
+        self._entradas.pop(clave, None)
+        huella, normalizado = clave
+        claves = self._por_huella.get(huella)
+        if claves is not None:
+            claves.discard(normalizado)
+            if not claves:
+                del self._por_huella[huella]
+
+    def _vigente(self, clave: tuple, ahora: float) -> dict | None:
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if ahora - entrada["creada"] > self.ttl_s:
+            self._eliminar(clave)
+            self._expulsiones += 1
+            return None
+        return entrada
+
+    def _buscar_semantica(self, huella: str, mensaje: str, normalizado: str, ahora: float) -> tuple | None:
+        candidatas = [
+            (huella, otro) for otro in list(self._por_huella.get(huella, ()))
+            if self._vigente((huella, otro), ahora) is not None
+        ]
+        if not candidatas:
+            return None
+
+        # El mensaje tal cual: es el mismo texto que ya codificó el turno y lo sirve la memoria LRU
+        vector = self.codificar(mensaje)
+        matriz = np.stack([self._entradas[clave]["vector"] for clave in candidatas])
+        similitudes = matriz @ vector
+        mejor = int(np.argmax(similitudes))
+        if similitudes[mejor] < self.umbral_semantico:
+            return None
+
+        clave = candidatas[mejor]
+        # Si la respuesta cacheada repite palabras que solo estaban en el otro mensaje
+        # (p. ej. otra ciudad), no sirve para este
+        distintas = set(clave[1].split()) ^ set(normalizado.split())
+        palabras_respuesta = set(normalizar_mensaje(self._entradas[clave]["respuesta"]).split())
+        if any(len(palabra) > 3 and palabra in palabras_respuesta for palabra in distintas):
+            return None
+        return clave
+
+    def obtener(self, mensaje: str, history: list[dict]) -> str | None:
+        if not self.habilitada:
+            return None
+
+        clave = (huella_historial(history), normalizar_mensaje(mensaje))
+        ahora = time.monotonic()
+        semantica = False
+
+        with self.lock:
+            entrada = self._vigente(clave, ahora)
+            if entrada is None and self.codificar is not None and self.umbral_semantico > 0:
+                clave_semantica = self._buscar_semantica(clave[0], mensaje, clave[1], ahora)
+                if clave_semantica is not None:
+                    clave, entrada, semantica = clave_semantica, self._entradas[clave_semantica], True
+
+            if entrada is None:
+                self._fallos += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            if semantica:
+                self._aciertos_semanticos += 1
+            else:
+                self._aciertos_exactos += 1
+            return entrada["respuesta"]
+
+    def guardar(self, mensaje: str, history: list[dict], respuesta: str):
+        if not self.habilitada:
+            return
+        if not es_cacheable(history, respuesta):
+            with self.lock:
+                self._no_cacheables += 1
+            return
+
+        huella, normalizado = clave = (huella_historial(history), normalizar_mensaje(mensaje))
+        vector = self.codificar(mensaje) if self.codificar is not None and self.umbral_semantico > 0 else None
+
+        with self.lock:
+            self._eliminar(clave)
+            self._entradas[clave] = {"respuesta": respuesta, "vector": vector, "creada": time.monotonic()}
+            self._por_huella.setdefault(huella, set()).add(normalizado)
+
+            while len(self._entradas) > self.max_entradas:
+                antigua = next(iter(self._entradas))
+                self._eliminar(antigua)
+                self._expulsiones += 1
+
+    def estado(self) -> dict:
+        with self.lock:
+            aciertos = self._aciertos_exactos + self._aciertos_semanticos
+            consultas = aciertos + self._fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_s": self.ttl_s,
+                "semantica": self.codificar is not None and self.umbral_semantico > 0,
+                "aciertos_exactos": self._aciertos_exactos,
+                "aciertos_semanticos": self._aciertos_semanticos,
+                "fallos": self._fallos,
+                "tasa_aciertos": round(aciertos / consultas, 3) if consultas else None,
+                "no_cacheables": self._no_cacheables,
+                "expulsiones": self._expulsiones
+            }
@@ -0,0 +1,142 @@
+from backend.logger_setup import get_logger
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+
+logger = get_logger(__name__)
+
+
+class ColaInferenciaLlena(Exception):
+    """
+    Se lanza cuando la cola de inferencia supera su profundidad máxima.
+    `retry_after` es la estimación (en segundos) de cuándo volver a intentar.
+    """
+    def __init__(self, en_espera: int, retry_after: int):
+        super().__init__(f"Cola de inferencia llena ({en_espera} solicitudes en espera)")
+        self.en_espera = en_espera
+        self.retry_after = retry_after
+
+
+class InferenciaCancelada(Exception):
+    """
+    La solicitud se canceló (cliente desconectado) mientras esperaba turno: no llegó a ocuparlo.
+    """
+
+
+# Cada cuánto revisa la cancelación una solicitud que espera turno
+INTERVALO_CANCELACION_S = 0.05
+
+
+class PlanificadorInferencia:
+    """
+    Cola acotada con control de admisión delante del modelo.
+    Limita cuántas inferencias corren a la vez y rechaza solicitudes nuevas cuando
+    la espera acumulada ya supera `max_cola`.
+    """
+    def __init__(self, concurrencia: int = 1, max_cola: int = 8, duracion_inicial: float = 15.0):
+        self.concurrencia = max(1, concurrencia)
+        self.max_cola = max(0, max_cola)
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self._en_espera = 0
+        self._en_curso = 0
+        self._rechazadas = 0
+        self._atendidas = 0
+        self._canceladas_en_cola = 0
+        # Media móvil exponencial de la duración de cada inferencia, para estimar Retry-After
+        self._duracion_promedio = duracion_inicial
+
+    def _estimar_retry_after(self) -> int:
+        pendientes = self._en_espera + self._en_curso
+        return max(1, math.ceil(pendientes * self._duracion_promedio / self.concurrencia))
+
+    def verificar_admision(self):
+        """
+        Lanza `ColaInferenciaLlena` si una solicitud nueva no debería encolarse.
+        """
+        if self._en_espera >= self.max_cola:
+            self._rechazadas += 1
+            retry_after = self._estimar_retry_after()
+            logger.warning("🚧 Cola de inferencia llena, solicitud rechazada", extra={
+                "en_espera": self._en_espera,
+                "en_curso": self._en_curso,
+                "retry_after": retry_after
+            })
+            raise ColaInferenciaLlena(self._en_espera, retry_after)
+
+    async def _adquirir(self, cancelacion):
+        """
+        Espera el semáforo; si `cancelacion` (cualquier objeto con `is_set()`) se activa antes,
+        sale de la cola sin ocupar turno y lanza `InferenciaCancelada`.
+        """
+        if cancelacion is None:
+            await self._semaforo.acquire()
+            return
+
+        adquisicion = asyncio.ensure_future(self._semaforo.acquire())
+        try:
+            while not cancelacion.is_set():
+                hecho, _ = await asyncio.wait({adquisicion}, timeout=INTERVALO_CANCELACION_S)
+                if hecho:
+                    adquisicion.result()
+                    return
+        except BaseException:
+            self._abandonar(adquisicion)
+            raise
+
+        self._abandonar(adquisicion)
+        self._canceladas_en_cola += 1
+        raise InferenciaCancelada()
+
+    def _abandonar(self, adquisicion: asyncio.Future):
+        # Si el turno llegó justo antes de abandonar, se devuelve
+        if adquisicion.done() and not adquisicion.cancelled():
+            self._semaforo.release()
+        else:
+            adquisicion.cancel()
+
+    @asynccontextmanager
+    async def turno(self, cancelacion=None):
+        """
+        Espera un hueco de inferencia y lo mantiene mientras dure el bloque.
+        Entrega el tiempo (en segundos) que la solicitud pasó en cola. Con `cancelacion`, una
+        solicitud cancelada mientras espera deja su lugar en la cola (ver `_adquirir`).
+        """
+        self.verificar_admision()
+
+        self._en_espera += 1
+        inicio_espera = time.perf_counter()
+        try:
+            await self._adquirir(cancelacion)
+        finally:
+            self._en_espera -= 1
+
+        espera = time.perf_counter() - inicio_espera
+        self._en_curso += 1
+        logger.debug("🎟️ Turno de inferencia asignado", extra={
+            "espera_cola_s": round(espera, 3),
+            "en_espera": self._en_espera,
+            "en_curso": self._en_curso
+        })
+
+        inicio = time.perf_counter()
+        try:
+            yield espera
+        finally:
+            duracion = time.perf_counter() - inicio
+            self._duracion_promedio = 0.8 * self._duracion_promedio + 0.2 * duracion
+            self._atendidas += 1
+            self._en_curso -= 1
+            self._semaforo.release()
+
+    def estado(self) -> dict:
+        return {
+            "concurrencia": self.concurrencia,
+            "max_cola": self.max_cola,
+            "en_espera": self._en_espera,
+            "en_curso": self._en_curso,
+            "atendidas": self._atendidas,
+            "rechazadas": self._rechazadas,
+            "canceladas_en_cola": self._canceladas_en_cola,
+            "duracion_promedio_s": round(self._duracion_promedio, 3)
+        }
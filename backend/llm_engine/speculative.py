@@ -0,0 +1,99 @@
+from backend.logger_setup import get_logger
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+import numpy as np
+import os
+
+logger = get_logger(__name__)
+
+# Texto con el que se comprueba que el modelo borrador tokeniza igual que el principal
+MUESTRA_VOCABULARIO = "Apartamento en Medellín, barrio El Poblado: 3 habitaciones, 2 baños y $450.000.000."
+
+
+class BorradorGGUF(LlamaDraftModel):
+    """
+    Modelo borrador para decodificación especulativa: un GGUF pequeño (p. ej. TinyLlama)
+    propone `num_pred_tokens` tokens de forma greedy y el modelo principal los verifica
+    en un solo lote. Conserva su propio contexto y solo evalúa los tokens nuevos.
+    """
+    def __init__(self, model_path: str, n_ctx: int, n_threads: int, num_pred_tokens: int = 4):
+        self.model_path = model_path
+        self.num_pred_tokens = num_pred_tokens
+        self.model = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            use_mmap=True,
+            verbose=False
+        )
+
+    def vocabulario_compatible(self, model_path_principal: str) -> bool:
+        """
+        El borrador solo sirve si sus ids de token significan lo mismo que en el modelo principal.
+        """
+        # Se arma antes que el modelo principal, así que abre solo su vocabulario y lo cierra
+        principal = Llama(model_path=model_path_principal, vocab_only=True, verbose=False)
+        try:
+            muestra = MUESTRA_VOCABULARIO.encode("utf-8")
+            return (
+                self.model.n_vocab() == principal.n_vocab()
+                and self.model.token_eos() == principal.token_eos()
+                and self.model.tokenize(muestra) == principal.tokenize(muestra)
+            )
+        finally:
+            principal.close()
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        if len(input_ids) == 0 or len(input_ids) > self.model.n_ctx() - self.num_pred_tokens:
+            return np.array([], dtype=np.intc)
+
+        # Se reutiliza el prefijo común; el último token siempre se reevalúa para tener sus logits
+        limite = min(self.model.n_tokens, len(input_ids) - 1)
+        distintos = np.nonzero(self.model.input_ids[:limite] != input_ids[:limite])[0]
+        self.model.n_tokens = int(distintos[0]) if len(distintos) else limite
+
+        self.model.eval(input_ids[self.model.n_tokens:].tolist())
+
+        borrador = []
+        for _ in range(self.num_pred_tokens):
+            token = self.model.sample(temp=0.0)
+            if token == self.model.token_eos():
+                break
+            borrador.append(token)
+            self.model.eval([token])
+
+        return np.array(borrador, dtype=np.intc)
+
+
+def crear_modelo_borrador(model_path: str, n_ctx: int, n_threads: int) -> LlamaDraftModel | None:
+    """
+    Construye el modelo borrador según `LLM_ESPECULATIVO`:
+    - `prompt_lookup`: busca n-gramas del propio prompt (ideal cuando la respuesta copia
+      el resumen real de la propiedad: título, barrio, precio).
+    - `borrador`: usa el GGUF de `LLM_MODELO_BORRADOR`.
+    Cualquier otro valor (o vacío) desactiva la decodificación especulativa.
+    """
+    modo = os.getenv("LLM_ESPECULATIVO", "").strip().lower()
+
+    if modo == "prompt_lookup":
+        num_pred_tokens = int(os.getenv("LLM_ESPECULATIVO_TOKENS", 10))
+        logger.info(f"🔮 Decodificación especulativa: prompt lookup ({num_pred_tokens} tokens por borrador)")
+        return LlamaPromptLookupDecoding(max_ngram_size=int(os.getenv("LLM_ESPECULATIVO_NGRAMA", 2)), num_pred_tokens=num_pred_tokens)
+
+    if modo == "borrador":
+        ruta = os.getenv("LLM_MODELO_BORRADOR")
+        if not ruta or not os.path.exists(ruta):
+            logger.warning(f"⚠️ LLM_ESPECULATIVO=borrador pero no existe LLM_MODELO_BORRADOR ({ruta}); se desactiva")
+            return None
+        num_pred_tokens = int(os.getenv("LLM_ESPECULATIVO_TOKENS", 4))
+        logger.info(f"🔮 Decodificación especulativa: modelo borrador {os.path.basename(ruta)} ({num_pred_tokens} tokens por borrador)")
+        borrador = BorradorGGUF(ruta, n_ctx=n_ctx, n_threads=n_threads, num_pred_tokens=num_pred_tokens)
+        if not borrador.vocabulario_compatible(model_path):
+            logger.warning(f"⚠️ {os.path.basename(ruta)} no comparte vocabulario con el modelo principal; se desactiva la decodificación especulativa")
+            borrador.model.close()
+            return None
+        return borrador
+
+    if modo:
+        logger.warning(f"⚠️ Modo especulativo desconocido: {modo}; se desactiva")
+    return None
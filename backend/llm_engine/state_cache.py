@@ -0,0 +1,75 @@
+from backend.logger_setup import get_logger
+from collections import OrderedDict
+import threading
+
+logger = get_logger(__name__)
+
+
+class CacheEstadosSesion:
+    """
+    Guarda el último estado de llama.cpp de cada sesión para que el siguiente turno
+    solo evalúe los tokens nuevos. Expulsa por LRU cuando se supera el presupuesto de memoria.
+    """
+    def __init__(self, presupuesto_bytes: int):
+        self.presupuesto_bytes = max(0, presupuesto_bytes)
+        self._estados = OrderedDict()
+        self._bytes_usados = 0
+        self._aciertos = 0
+        self._fallos = 0
+        self._expulsiones = 0
+        self.lock = threading.Lock()
+
+    @property
+    def habilitada(self) -> bool:
+        return self.presupuesto_bytes > 0
+
+    def obtener(self, session_id: str):
+        with self.lock:
+            entrada = self._estados.get(session_id)
+            if entrada is None:
+                self._fallos += 1
+                return None
+            self._estados.move_to_end(session_id)
+            self._aciertos += 1
+            return entrada[0]
+
+    def guardar(self, session_id: str, estado, tamano: int):
+        if not self.habilitada:
+            return
+
+        if tamano > self.presupuesto_bytes:
+            logger.debug(f"📦 Estado de sesión {session_id} excede el presupuesto ({tamano} bytes), no se guarda")
+            self.eliminar(session_id)
+            return
+
+        with self.lock:
+            anterior = self._estados.pop(session_id, None)
+            if anterior is not None:
+                self._bytes_usados -= anterior[1]
+
+            self._estados[session_id] = (estado, tamano)
+            self._bytes_usados += tamano
+
+            while self._bytes_usados > self.presupuesto_bytes:
+                expulsada, (_, tamano_expulsado) = self._estados.popitem(last=False)
+                self._bytes_usados -= tamano_expulsado
+                self._expulsiones += 1
+                logger.debug(f"🧹 Estado de sesión {expulsada} expulsado por LRU")
+
+    def eliminar(self, session_id: str):
+        with self.lock:
+            entrada = self._estados.pop(session_id, None)
+            if entrada is not None:
+                self._bytes_usados -= entrada[1]
+                logger.debug(f"🗑️ Estado de sesión {session_id} eliminado de la caché")
+
+    def estado(self) -> dict:
+        with self.lock:
+            return {
+                "sesiones": len(self._estados),
+                "bytes_usados": self._bytes_usados,
+                "presupuesto_bytes": self.presupuesto_bytes,
+                "aciertos": self._aciertos,
+                "fallos": self._fallos,
+                "expulsiones": self._expulsiones
+            }
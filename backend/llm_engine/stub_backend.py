@@ -0,0 +1,109 @@
+from backend.llm_engine.backend_base import BackendLLM
+from backend.logger_setup import get_logger
+from typing import Iterator
+import zlib
+import time
+import os
+
+logger = get_logger(__name__)
+
+RESPUESTAS_SIMULADAS = (
+    "Con gusto te ayudo a encontrar tu próximo hogar. ¿En qué ciudad y barrio te gustaría vivir?",
+    "Perfecto, lo tengo en cuenta. ¿Cuántas habitaciones y baños necesitas?",
+    "Entiendo. ¿Tienes un presupuesto aproximado en mente para la propiedad?",
+    "Excelente elección. Esta propiedad tiene buena ubicación, espacios iluminados y un precio acorde a lo que buscas.",
+    "Claro, ¿prefieres apartamento o casa? Así puedo afinar la búsqueda.",
+)
+
+
+class BackendSimulado(BackendLLM):
+    """
+    Backend determinista para pruebas de carga y latencia sin el GGUF: la misma entrada
+    produce siempre la misma respuesta, con un costo de prefill proporcional a los tokens
+    no cacheados del prompt y una latencia fija por token generado.
+    """
+    def __init__(self, ms_por_token: float | None = None, ms_prefill_por_token: float | None = None, n_ctx: int | None = None):
+        self.ms_por_token = ms_por_token if ms_por_token is not None else float(os.getenv("LLM_SIMULADO_MS_TOKEN", 20))
+        self.ms_prefill_por_token = (
+            ms_prefill_por_token if ms_prefill_por_token is not None
+            else float(os.getenv("LLM_SIMULADO_MS_PREFILL", 0.5))
+        )
+        self.n_ctx = n_ctx or int(os.getenv("LLM_SIMULADO_N_CTX", 4096))
+        self.model_path = "simulado"
+        self._prefijo = ""
+        self.atendidas = 0
+
+        logger.info(
+            f"🧪 Backend LLM simulado: {self.ms_por_token} ms/token, "
+            f"{self.ms_prefill_por_token} ms/token de prefill, n_ctx {self.n_ctx}"
+        )
+
+    def contar_tokens(self, texto: str) -> int:
+        # Aproximación estable: ~4 caracteres por token
+        return max(1, len(texto) // 4) if texto else 0
+
+    def evaluar_prefijo(self, prefijo: str):
+        self._prefijo = prefijo
+
+    def _respuesta(self, prompt: str) -> list[str]:
+        texto = RESPUESTAS_SIMULADAS[zlib.crc32(prompt.encode("utf-8")) % len(RESPUESTAS_SIMULADAS)]
+        palabras = texto.split(" ")
+        return [palabras[0]] + [" " + palabra for palabra in palabras[1:]]
+
+    def _iterar(self, prompt: str, parametros: dict, cancelacion, medicion: dict) -> Iterator[str]:
+        tokens_prompt = self.contar_tokens(prompt)
+        reutilizados = self.contar_tokens(self._prefijo) if self._prefijo and prompt.startswith(self._prefijo) else 0
+
+        inicio = time.perf_counter()
+        time.sleep((tokens_prompt - reutilizados) * self.ms_prefill_por_token / 1000)
+        prefill_s = time.perf_counter() - inicio
+
+        completa = self._respuesta(prompt)
+        fragmentos = completa[:parametros.get("max_tokens", 512)]
+        motivo_fin = "length" if len(fragmentos) < len(completa) else "stop"
+        generados = 0
+        for fragmento in fragmentos:
+            if cancelacion is not None and cancelacion.is_set():
+                break
+            time.sleep(self.ms_por_token / 1000)
+            generados += 1
+            yield fragmento
+
+        decode_s = time.perf_counter() - inicio - prefill_s
+        self.atendidas += 1
+        medicion.update({
+            "tokens_prompt": tokens_prompt,
+            "tokens_reutilizados": reutilizados,
+            "tokens_prefill": tokens_prompt - reutilizados,
+            "prefill_s": round(prefill_s, 3),
+            "primer_token_s": round(prefill_s + (self.ms_por_token / 1000 if generados else 0), 3),
+            "tokens_completados": generados,
+            "decode_s": round(decode_s, 3),
+            "tokens_por_s": round(generados / decode_s, 2) if decode_s > 0 and generados else None,
+            "motivo_fin": motivo_fin,
+            "modo_especulativo": "desactivado"
+        })
+
+    def generar(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> dict:
+        medicion = {}
+        texto = "".join(self._iterar(prompt, parametros, cancelacion, medicion))
+        return {
+            "choices": [{"text": texto, "finish_reason": medicion["motivo_fin"]}],
+            "usage": {"prompt_tokens": medicion["tokens_prompt"], "completion_tokens": medicion["tokens_completados"]},
+            "metricas": medicion
+        }
+
+    def generar_stream(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> Iterator[dict]:
+        medicion = {}
+        for fragmento in self._iterar(prompt, parametros, cancelacion, medicion):
+            yield {"choices": [{"text": fragmento, "finish_reason": None}]}
+        yield {"metricas": medicion}
+
+    def estado(self) -> dict:
+        return {
+            "tipo": "simulado",
+            "n_ctx": self.n_ctx,
+            "ms_por_token": self.ms_por_token,
+            "ms_prefill_por_token": self.ms_prefill_por_token,
+            "atendidas": self.atendidas
+        }
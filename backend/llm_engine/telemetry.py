@@ -0,0 +1,115 @@
+from backend.logger_setup import get_logger
+from collections import Counter
+import threading
+
+logger = get_logger(__name__)
+
+# Límites superiores de cada bucket (el último bucket es +inf)
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 80)
+BUCKETS_TOKENS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+BUCKETS_TOKENS_POR_S = (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64)
+
+METRICAS_HISTOGRAMA = {
+    "espera_cola_s": BUCKETS_SEGUNDOS,
+    "primer_token_s": BUCKETS_SEGUNDOS,
+    "prefill_s": BUCKETS_SEGUNDOS,
+    "decode_s": BUCKETS_SEGUNDOS,
+    "total_s": BUCKETS_SEGUNDOS,
+    "tokens_prompt": BUCKETS_TOKENS,
+    "tokens_prefill": BUCKETS_TOKENS,
+    "tokens_completados": BUCKETS_TOKENS,
+    "tokens_por_s": BUCKETS_TOKENS_POR_S,
+}
+
+
+class Histograma:
+    """
+    Histograma acumulado de buckets fijos, al estilo Prometheus.
+    """
+    def __init__(self, limites: tuple):
+        self.limites = tuple(limites)
+        self.conteos = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.suma = 0.0
+
+    def observar(self, valor: float):
+        indice = next((i for i, limite in enumerate(self.limites) if valor <= limite), len(self.limites))
+        self.conteos[indice] += 1
+        self.total += 1
+        self.suma += valor
+
+    def percentil(self, q: float) -> float | None:
+        """
+        Estimación del percentil `q` (0-1): límite superior del bucket que lo contiene. Si cae
+        por encima del último límite devuelve ese límite (ver `desborda`): `inf` no es JSON válido.
+        """
+        if not self.total:
+            return None
+        return self.limites[min(self._bucket_de_percentil(q), len(self.limites) - 1)]
+
+    def desborda(self, q: float) -> bool:
+        """
+        True si el percentil `q` cae por encima del último límite.
+        """
+        return bool(self.total) and self._bucket_de_percentil(q) == len(self.limites)
+
+    def _bucket_de_percentil(self, q: float) -> int:
+        objetivo = q * self.total
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return i
+        return len(self.limites)
+
+    def estado(self) -> dict:
+        acumulado = 0
+        buckets = {}
+        for limite, conteo in zip(self.limites + ("+Inf",), self.conteos):
+            acumulado += conteo
+            buckets[str(limite)] = acumulado
+        return {
+            "conteo": self.total,
+            "suma": round(self.suma, 3),
+            "promedio": round(self.suma / self.total, 3) if self.total else None,
+            "p50": self.percentil(0.5),
+            "p95": self.percentil(0.95),
+            "p95_desborda": self.desborda(0.95),
+            "desbordados": self.conteos[-1],
+            "buckets": buckets
+        }
+
+
+class TelemetriaInferencia:
+    """
+    Agrega las mediciones por solicitud del motor LLM en histogramas y contadores.
+    """
+    def __init__(self):
+        self._histogramas = {nombre: Histograma(limites) for nombre, limites in METRICAS_HISTOGRAMA.items()}
+        self._motivos_fin = Counter()
+        self._modos = Counter()
+        self.lock = threading.Lock()
+
+    def registrar(self, medicion: dict):
+        with self.lock:
+            for nombre, histograma in self._histogramas.items():
+                valor = medicion.get(nombre)
+                if isinstance(valor, (int, float)):
+                    histograma.observar(valor)
+            self._motivos_fin[medicion.get("motivo_fin") or "desconocido"] += 1
+            self._modos[medicion.get("modo") or "desconocido"] += 1
+
+        logger.info(
+            f"📈 Inferencia ({medicion.get('modo')}): {medicion.get('total_s')} s, "
+            f"primer token {medicion.get('primer_token_s')} s, {medicion.get('tokens_por_s')} tokens/s",
+            extra=medicion
+        )
+
+    def estado(self) -> dict:
+        with self.lock:
+            return {
+                "solicitudes": sum(self._modos.values()),
+                "por_modo": dict(self._modos),
+                "motivo_fin": dict(self._motivos_fin),
+                "histogramas": {nombre: histograma.estado() for nombre, histograma in self._histogramas.items()}
+            }
@@ -0,0 +1,375 @@
+from backend.llm_engine.llama_local import configuracion_modelo
+from backend.cpu_partition import particion_cpu
+from backend.llm_engine.backend_base import BackendLLM
+from backend.logger_setup import get_logger
+from llama_cpp import Llama
+from typing import Iterator
+import multiprocessing
+import threading
+import zlib
+import time
+import os
+
+logger = get_logger(__name__)
+
+# Tope para que un worker cargue el GGUF y evalúe el prefijo; si no, se da por caído
+TIMEOUT_CARGA_WORKER_S = float(os.getenv("LLM_WORKER_TIMEOUT_CARGA_S", "600"))
+
+
+class WorkerCaidoError(RuntimeError):
+    """
+    El proceso worker murió o cerró su conexión en medio de una solicitud.
+    """
+
+
+def _bucle_worker(model_path: str, conexion, cancelar, n_threads: int, indice: int = 0, n_workers: int = 1):
+    """
+    Punto de entrada de cada proceso worker: carga su propio `LlamaLocal` (el GGUF se
+    comparte entre procesos vía mmap) y atiende solicitudes de una en una.
+    """
+    from backend.llm_engine.llama_local import LlamaLocal
+
+    # Con CPU_AFINIDAD cada worker queda en su porción de los núcleos del LLM
+    particion_cpu.fijar_afinidad("llm", indice, n_workers)
+
+    motor = LlamaLocal(model_path, n_threads=n_threads, fijar_afinidad=False)
+    conexion.send(("listo", os.getpid()))
+
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        tipo = mensaje[0]
+        try:
+            if tipo == "salir":
+                break
+            elif tipo == "olvidar":
+                motor.olvidar_sesion(mensaje[1])
+            elif tipo == "prefijo":
+                motor.evaluar_prefijo(mensaje[1])
+                conexion.send(("ok", None))
+            elif tipo == "estado":
+                conexion.send(("ok", motor.estado()))
+            elif tipo == "generar":
+                _, prompt, parametros, session_id, stream = mensaje
+                if stream:
+                    for chunk in motor.generar_stream(prompt, parametros, session_id, cancelar):
+                        conexion.send(("chunk", chunk))
+                    conexion.send(("fin", None))
+                else:
+                    conexion.send(("resultado", motor.generar(prompt, parametros, session_id, cancelar)))
+        except Exception as e:
+            logger.error(f"❌ Error en worker {os.getpid()}: {e}", exc_info=True)
+            conexion.send(("error", repr(e)))
+
+
+class _Worker:
+    def __init__(self, indice: int):
+        self.indice = indice
+        self.proceso = None
+        self.conexion = None
+        # Evento compartido con el proceso: el padre lo activa para cortar la generación en curso
+        self.cancelar = None
+        self.pid = None
+        self.reinicios = 0
+        self.atendidas = 0
+        # Murió y espera a que el monitor lo reemplace; mientras tanto sus solicitudes fallan
+        self.caido = False
+        # Un worker atiende una solicitud a la vez; el lock también protege la conexión
+        self.lock = threading.Lock()
+        # Sesiones a olvidar, se envían junto con la próxima solicitud
+        self.pendientes_olvidar = []
+
+
+class PoolLlama(BackendLLM):
+    """
+    Pool de procesos worker, cada uno con su propio `LlamaLocal`.
+    Las solicitudes se enrutan por `session_id` para que cada sesión caiga siempre en el
+    mismo worker y reutilice su caché KV.
+
+    Un worker caído no se reinicia en el hilo de la solicitud: se marca, la solicitud (y las
+    que le lleguen mientras tanto) falla de inmediato con `WorkerCaidoError` y el monitor lo
+    reemplaza en segundo plano, sin tener su lock durante la carga del modelo.
+    """
+    def __init__(self, model_path: str, n_workers: int, n_threads: int | None = None, intervalo_salud: float = 10.0,
+                 timeout_carga_s: float = TIMEOUT_CARGA_WORKER_S):
+        self.model_path = model_path
+        self.n_ctx = configuracion_modelo(model_path)[1]
+        self.slots = n_workers
+        self.n_threads = n_threads or max(1, particion_cpu.hilos_llm // n_workers)
+        self._contexto = multiprocessing.get_context("spawn")
+        self._prefijo = None
+        self._siguiente = 0
+        self._cerrado = False
+        self.timeout_carga_s = timeout_carga_s
+        # Lo activa quien encuentra un worker caído, para que el monitor no espere al intervalo
+        self._revisar = threading.Event()
+        self._workers = [_Worker(i) for i in range(n_workers)]
+        # Solo el vocabulario, para contar tokens sin pasar por los workers
+        self._tokenizador = Llama(model_path=model_path, vocab_only=True, verbose=False)
+
+        logger.info(f"🧵 Iniciando pool de {n_workers} workers LLM con {self.n_threads} hilos cada uno")
+
+        # Se lanzan todos antes de esperar para que carguen el modelo en paralelo
+        for worker in self._workers:
+            worker.proceso, worker.conexion, worker.cancelar = self._lanzar(worker.indice)
+        for worker in self._workers:
+            worker.pid = self._esperar_listo(worker.indice, worker.conexion, None)
+
+        self._monitor = threading.Thread(target=self._vigilar, args=(intervalo_salud,), daemon=True)
+        self._monitor.start()
+
+    # === Ciclo de vida de los workers ===
+    def _lanzar(self, indice: int) -> tuple:
+        conexion_padre, conexion_hijo = self._contexto.Pipe()
+        cancelar = self._contexto.Event()
+        proceso = self._contexto.Process(
+            target=_bucle_worker,
+            args=(self.model_path, conexion_hijo, cancelar, self.n_threads, indice, self.slots),
+            name=f"llm-worker-{indice}",
+            daemon=True
+        )
+        proceso.start()
+        conexion_hijo.close()
+        return proceso, conexion_padre, cancelar
+
+    def _esperar_listo(self, indice: int, conexion, prefijo: str | None) -> int:
+        """
+        Espera a que el worker cargue el modelo (y evalúe `prefijo`, si hay) dentro de
+        `timeout_carga_s`. Devuelve su pid.
+        """
+        limite = time.monotonic() + self.timeout_carga_s
+
+        def recibir() -> tuple:
+            restante = limite - time.monotonic()
+            try:
+                if restante <= 0 or not conexion.poll(restante):
+                    raise WorkerCaidoError(f"El worker {indice} no terminó de cargar en {self.timeout_carga_s:.0f} s")
+                return conexion.recv()
+            except (EOFError, OSError):
+                raise WorkerCaidoError(f"El worker {indice} murió mientras cargaba el modelo")
+
+        _, pid = recibir()
+        if prefijo is not None:
+            conexion.send(("prefijo", prefijo))
+            tipo, valor = recibir()
+            if tipo == "error":
+                raise RuntimeError(valor)
+        logger.info(f"✅ Worker LLM {indice} listo (pid {pid})")
+        return pid
+
+    def _marcar_caido(self, worker: _Worker):
+        """
+        Da de baja un worker que murió o dejó de responder. Debe llamarse con `worker.lock` tomado;
+        no espera nada: el reemplazo lo hace el monitor.
+        """
+        if worker.caido:
+            return
+        logger.warning(f"💀 Worker LLM {worker.indice} caído (pid {worker.pid}), se reiniciará en segundo plano")
+        worker.caido = True
+        if worker.proceso is not None and worker.proceso.is_alive():
+            worker.proceso.terminate()
+        if worker.conexion is not None:
+            worker.conexion.close()
+        # Los estados de sesión vivían en el proceso anterior
+        worker.pendientes_olvidar = []
+        self._revisar.set()
+
+    def _necesita_reinicio(self, worker: _Worker) -> bool:
+        return worker.caido or worker.proceso is None or not worker.proceso.is_alive()
+
+    def _reiniciar(self, worker: _Worker):
+        """
+        Reemplaza un worker caído. La carga del modelo ocurre sin el lock del worker; solo se
+        toma para darlo de baja y para poner el proceso nuevo en su lugar.
+        """
+        # Un worker ocupado se revisa al terminar su solicitud (si murió, ella lo marca)
+        if not worker.lock.acquire(blocking=False):
+            return
+        try:
+            if not self._necesita_reinicio(worker):
+                return
+            self._marcar_caido(worker)
+            anterior = worker.proceso
+        finally:
+            worker.lock.release()
+
+        logger.warning(f"♻️ Reiniciando worker LLM {worker.indice}")
+        if anterior is not None:
+            anterior.join(timeout=5)
+
+        prefijo = self._prefijo
+        proceso, conexion, cancelar = self._lanzar(worker.indice)
+        try:
+            pid = self._esperar_listo(worker.indice, conexion, prefijo)
+        except BaseException:
+            proceso.terminate()
+            conexion.close()
+            raise
+
+        with worker.lock:
+            if self._cerrado:
+                proceso.terminate()
+                conexion.close()
+                return
+            worker.proceso, worker.conexion, worker.cancelar, worker.pid = proceso, conexion, cancelar, pid
+            worker.reinicios += 1
+            worker.caido = False
+            # El prefijo cambió mientras cargaba
+            if self._prefijo is not None and self._prefijo != prefijo:
+                self._pedir(worker, ("prefijo", self._prefijo))
+
+    def _vigilar(self, intervalo: float):
+        while not self._cerrado:
+            self._revisar.wait(intervalo)
+            self._revisar.clear()
+            for worker in self._workers:
+                if self._cerrado:
+                    return
+                if not self._necesita_reinicio(worker):
+                    continue
+                try:
+                    self._reiniciar(worker)
+                except Exception:
+                    logger.error(f"❌ No se pudo reiniciar el worker LLM {worker.indice}", exc_info=True)
+
+    def cerrar(self):
+        self._cerrado = True
+        self._revisar.set()
+        for worker in self._workers:
+            with worker.lock:
+                if worker.caido:
+                    continue
+                try:
+                    worker.conexion.send(("salir",))
+                except (OSError, BrokenPipeError):
+                    pass
+                worker.proceso.join(timeout=5)
+
+    # === Comunicación ===
+    def _elegir(self, session_id: str | None) -> _Worker:
+        if session_id:
+            return self._workers[zlib.crc32(session_id.encode("utf-8")) % len(self._workers)]
+
+        # Sin sesión: primero uno libre, si no, en rueda
+        for worker in self._workers:
+            if not worker.lock.locked():
+                return worker
+        self._siguiente = (self._siguiente + 1) % len(self._workers)
+        return self._workers[self._siguiente]
+
+    def _enviar(self, worker: _Worker, mensaje: tuple):
+        if self._necesita_reinicio(worker):
+            self._marcar_caido(worker)
+            raise WorkerCaidoError(f"Worker {worker.indice} caído, reiniciándose")
+        try:
+            # Se toma la lista entera de una vez: `olvidar_sesion` agrega sin el lock del worker
+            # (que está tomado durante toda una generación) y un append intermedio no se pierde
+            pendientes, worker.pendientes_olvidar = worker.pendientes_olvidar, []
+            for session_id in pendientes:
+                worker.conexion.send(("olvidar", session_id))
+            worker.cancelar.clear()
+            worker.conexion.send(mensaje)
+        except (OSError, BrokenPipeError) as e:
+            self._marcar_caido(worker)
+            raise WorkerCaidoError(f"Worker {worker.indice} no disponible: {e}")
+
+    def _recibir(self, worker: _Worker, cancelacion=None) -> tuple:
+        try:
+            # Mientras se espera, una cancelación del solicitante se reenvía al worker
+            if cancelacion is not None:
+                while not worker.conexion.poll(0.1):
+                    if cancelacion.is_set() and not worker.cancelar.is_set():
+                        worker.cancelar.set()
+            return worker.conexion.recv()
+        except (EOFError, OSError) as e:
+            self._marcar_caido(worker)
+            raise WorkerCaidoError(f"Worker {worker.indice} murió durante la solicitud: {e}")
+
+    def _pedir(self, worker: _Worker, mensaje: tuple):
+        worker.conexion.send(mensaje)
+        tipo, valor = self._recibir(worker)
+        if tipo == "error":
+            raise RuntimeError(valor)
+        return valor
+
+    # === Interfaz compartida con LlamaLocal ===
+    def evaluar_prefijo(self, prefijo: str):
+        self._prefijo = prefijo
+        for worker in self._workers:
+            with worker.lock:
+                # Uno caído lo recibe al terminar de reiniciarse
+                if self._necesita_reinicio(worker):
+                    self._marcar_caido(worker)
+                    continue
+                self._pedir(worker, ("prefijo", prefijo))
+
+    def contar_tokens(self, texto: str) -> int:
+        return len(self._tokenizador.tokenize(texto.encode("utf-8"), add_bos=False))
+
+    def olvidar_sesion(self, session_id: str):
+        worker = self._elegir(session_id)
+        worker.pendientes_olvidar.append(session_id)
+
+    def generar(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> dict:
+        worker = self._elegir(session_id)
+        with worker.lock:
+            self._enviar(worker, ("generar", prompt, parametros, session_id, False))
+            tipo, valor = self._recibir(worker, cancelacion)
+            worker.atendidas += 1
+        if tipo == "error":
+            raise RuntimeError(valor)
+        return valor
+
+    def generar_stream(self, prompt: str, parametros: dict, session_id: str | None = None, cancelacion=None) -> Iterator[dict]:
+        worker = self._elegir(session_id)
+        with worker.lock:
+            self._enviar(worker, ("generar", prompt, parametros, session_id, True))
+            terminado = False
+            try:
+                while True:
+                    tipo, valor = self._recibir(worker, cancelacion)
+                    if tipo == "chunk":
+                        yield valor
+                    elif tipo == "fin":
+                        terminado = True
+                        break
+                    elif tipo == "error":
+                        terminado = True
+                        raise RuntimeError(valor)
+                worker.atendidas += 1
+            finally:
+                # Si el consumidor abandonó el stream, se descartan los fragmentos restantes
+                # para que no los lea la siguiente solicitud
+                if not terminado and not worker.caido:
+                    self._drenar(worker)
+
+    def _drenar(self, worker: _Worker):
+        worker.cancelar.set()
+        try:
+            while True:
+                tipo, _ = worker.conexion.recv()
+                if tipo in ("fin", "error", "resultado"):
+                    return
+        except (EOFError, OSError):
+            self._marcar_caido(worker)
+
+    def estado(self) -> dict:
+        return {
+            "tipo": "pool",
+            "n_threads_por_worker": self.n_threads,
+            "workers": [
+                {
+                    "indice": worker.indice,
+                    "pid": worker.pid,
+                    "vivo": worker.proceso is not None and worker.proceso.is_alive(),
+                    "caido": worker.caido,
+                    "ocupado": worker.lock.locked(),
+                    "atendidas": worker.atendidas,
+                    "reinicios": worker.reinicios
+                }
+                for worker in self._workers
+            ]
+        }
@@ -14,6 +14,7 @@ class MemoryManager:
     def __init__(self):
         self.sessions = {}
         self.lock = threading.RLock()
+        self._al_eliminar = []
         logger.info("🧠 MemoryManager inicializado (instancia global)")
 
     def _ensure_session(self, session_id: str):
@@ -43,11 +44,19 @@ class MemoryManager:
             else:
                 logger.debug(f"✅ Sesión existente: {session_id}")
 
-    def get_history(self, session_id: str) -> list[dict]:
+    def get_history(self, session_id: str, contar_tokens_mensaje=None) -> list[dict]:
+        """
+        Devuelve el historial de la sesión. Si se pasa `contar_tokens_mensaje(mensaje) -> int`,
+        cada mensaje queda con su conteo en `n_tokens`, que se calcula una sola vez.
+        """
         logger.debug(f"📥 get_history llamado para sesión: {session_id}")
         with self.lock:
             self._ensure_session(session_id)
             history = list(self.sessions[session_id]["history"])
+            if contar_tokens_mensaje is not None:
+                for mensaje in history:
+                    if "n_tokens" not in mensaje:
+                        mensaje["n_tokens"] = contar_tokens_mensaje(mensaje)
             logger.debug(f"📜 Historial obtenido para sesión {session_id}, {len(history)} mensajes")
             self.update_activity(session_id)
             return history
@@ -66,6 +75,21 @@ class MemoryManager:
             self.update_activity(session_id)
             logger.info(f"✉️ Mensaje agregado en sesión {session_id} por {role}")
 
+    def registrar_al_eliminar(self, callback):
+        """
+        Registra una función `callback(session_id)` que se invoca cuando una sesión se
+        limpia o se resetea (p. ej. para liberar el estado del LLM asociado).
+        """
+        with self.lock:
+            self._al_eliminar.append(callback)
+
+    def _notificar_eliminacion(self, session_id: str):
+        for callback in list(self._al_eliminar):
+            try:
+                callback(session_id)
+            except Exception:
+                logger.warning(f"⚠️ Error notificando eliminación de sesión {session_id}", exc_info=True)
+
     def clear_session(self, session_id: str):
         logger.debug(f"🗑️ clear_session llamado para: {session_id}")
         with self.lock:
@@ -75,6 +99,19 @@ class MemoryManager:
             else:
                 logger.warning(f"⚠️ Intento de eliminar sesión inexistente: {session_id}")
             self.update_activity(session_id)
+        self._notificar_eliminacion(session_id)
+
+    def reset_session(self, session_id: str):
+        """
+        Borra historial, filtros y flags de la sesión. La sesión se vuelve a crear
+        vacía en su próxima interacción.
+        """
+        logger.debug(f"🔄 reset_session llamado para: {session_id}")
+        with self.lock:
+            existed = self.sessions.pop(session_id, None)
+            if existed:
+                logger.info(f"🔄 Sesión reseteada: {session_id}")
+        self._notificar_eliminacion(session_id)
 
     def update_activity(self, session_id: str):
         with self.lock:
@@ -0,0 +1,93 @@
+"""
+Compara los escáneres precompilados (regex_matcher.py) contra la implementación anterior
+(un re.search / re.findall por patrón y por mensaje): mismos resultados y tiempo por mensaje.
+
+Uso:
+    python -m local_tests.benchmark_regex [repeticiones]
+"""
+from backend.api.utils.confirmation_utils import PATRONES_CONFIRMACION, es_confirmacion_por_regex
+from backend.api.filter_extractor import REGEX_BASE, ESCANER_NUMERICOS, PATRON_PRECIO, detectar_tipo_por_regex
+import time
+import sys
+import re
+
+MENSAJES = [
+    "hola, busco un apartamento de 3 habitaciones y 2 baños en el centro",
+    "quiero una casa con 2 parqueaderos y 120 m2, máximo 350 millones",
+    "muéstramela por favor",
+    "dale, de una",
+    "algo tipo finca o parcela, unos 500 metros cuadrados",
+    "necesito un local comercial para mi negocio, arriendo de 2 millones",
+    "apartaestudio o loft para estudiante, 1 baño, 900 mil mensuales",
+    "me da igual el barrio, lo que tengas",
+    "¿me la puedes mostrar?",
+    "busco lote o terreno para construir",
+    "tengo $250.000.000 para una vivienda de 4 alcobas y 3 baños",
+    "gracias, eso es todo",
+    "prefiero un depto con 1 garaje y 60 mts",
+    "no sé todavía, estoy mirando opciones",
+]
+
+
+def filtros_anterior(text: str) -> dict:
+    filtros = {}
+    for field, pattern_or_dict in REGEX_BASE.items():
+        if field == "precio":
+            filtros[field] = re.findall(pattern_or_dict, text)
+            continue
+        if isinstance(pattern_or_dict, dict):
+            for value, pattern in pattern_or_dict.items():
+                if re.search(pattern, text):
+                    filtros[field] = value
+        else:
+            matches = re.findall(pattern_or_dict, text)
+            if matches:
+                filtros[field] = matches
+    return filtros
+
+
+def filtros_nuevo(text: str) -> dict:
+    filtros = {}
+    tipo = detectar_tipo_por_regex(text)
+    if tipo:
+        filtros["tipo"] = tipo
+    filtros.update(ESCANER_NUMERICOS.grupos_por_etiqueta(text))
+    filtros["precio"] = PATRON_PRECIO.findall(text)
+    return filtros
+
+
+def confirmacion_anterior(text: str) -> bool:
+    text = text.lower()
+    return any(re.search(p, text) for p in PATRONES_CONFIRMACION)
+
+
+def medir(funcion, textos: list[str], repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto in textos:
+            funcion(texto)
+    return (time.perf_counter() - inicio) * 1_000_000 / (repeticiones * len(textos))
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    textos = [mensaje.lower() for mensaje in MENSAJES]
+
+    diferencias = [t for t in textos if filtros_anterior(t) != filtros_nuevo(t)]
+    diferencias += [t for t in textos if confirmacion_anterior(t) != es_confirmacion_por_regex(t)]
+    for texto in diferencias:
+        print(f"⚠️ Resultado distinto: {texto!r}")
+
+    for nombre, anterior, nuevo in (
+        ("filtros", filtros_anterior, filtros_nuevo),
+        ("confirmación", confirmacion_anterior, es_confirmacion_por_regex),
+    ):
+        us_anterior = medir(anterior, textos, repeticiones)
+        us_nuevo = medir(nuevo, textos, repeticiones)
+        print(f"{nombre:<14} anterior {us_anterior:8.1f} µs/mensaje | escáner {us_nuevo:8.1f} µs/mensaje | x{us_anterior / us_nuevo:.1f}")
+
+    print("✅ Mismos resultados" if not diferencias else f"⚠️ {len(diferencias)} diferencias")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compara el índice de ubicaciones (location_index.py) contra la implementación anterior
+(rearmar las ubicaciones en cada mensaje y `get_close_matches` por cada ventana de 1 a 5
+tokens): ubicación detectada y latencia por mensaje de 20, 200 y 2.000 caracteres.
+
+También mide las menciones exactas de lugares (aho_corasick.py) contra el recorrido anterior
+(`nombre.lower() in texto` por cada ciudad y barrio) a medida que crece la cantidad de lugares.
+
+Puede haber diferencias esperadas: la versión anterior se queda con la primera ventana que
+pasa el corte y el índice con la de mayor puntaje (p. ej. "en valle real" -> "Valle Real"
+y no "Entre Valles").
+
+Uso:
+    python -m local_tests.benchmark_ubicaciones [repeticiones]
+"""
+from backend.api.utils.location_index import indice_ubicaciones, ubicaciones_buga, normalizar
+from backend.api.utils.aho_corasick import AutomataAhoCorasick
+from difflib import get_close_matches
+import random
+import string
+import time
+import sys
+
+RELLENO = [
+    "hola, buenas tardes",
+    "estoy buscando algo para mi familia",
+    "ojalá con buena iluminación y cerca de colegios",
+    "el presupuesto es de unos 300 millones",
+    "que tenga dos baños y un patio grande",
+    "no me importa mucho el piso",
+    "mi esposa quiere que tenga parqueadero",
+    "ya vimos varias opciones pero ninguna nos convenció",
+]
+
+UBICACIONES_MENCIONADAS = ["la merced", "san miguel", "el carmen", "alto bonito", "valle real", "los samanes"]
+
+
+def ubicacion_anterior(message: str) -> str | None:
+    text = message.lower()
+    text_tokens = text.translate(str.maketrans("", "", string.punctuation)).split()
+    ubicaciones_lower = ubicaciones_buga()
+    n = len(text_tokens)
+    frases_generadas = []
+    for size in range(1, 6):
+        for i in range(n - size + 1):
+            frases_generadas.append(" ".join(text_tokens[i:i + size]))
+    for fragmento in frases_generadas:
+        posibles = get_close_matches(fragmento, list(ubicaciones_lower.keys()), n=1, cutoff=0.8)
+        if posibles:
+            return ubicaciones_lower[posibles[0]]
+    return None
+
+
+def ubicacion_nueva(message: str) -> str | None:
+    resultado = indice_ubicaciones.buscar(message)
+    return resultado[1] if resultado else None
+
+
+def mensaje_de(longitud: int, ubicacion: str) -> str:
+    """
+    Relleno hasta `longitud` caracteres con la ubicación cerca del principio.
+    """
+    partes = [f"busco casa en {ubicacion}"]
+    i = 0
+    while len(", ".join(partes)) < longitud:
+        partes.append(RELLENO[i % len(RELLENO)])
+        i += 1
+    return ", ".join(partes)[:longitud]
+
+
+def lugares_sinteticos(cantidad: int) -> list[str]:
+    """
+    Las ubicaciones reales más nombres inventados de 1 a 3 palabras hasta llegar a `cantidad`.
+    """
+    generador = random.Random(7)
+    lugares = list(ubicaciones_buga().values())
+    while len(lugares) < cantidad:
+        palabras = ["".join(generador.choices(string.ascii_lowercase, k=generador.randint(4, 9))) for _ in range(generador.randint(1, 3))]
+        lugares.append(" ".join(palabras).title())
+    return lugares
+
+
+def medir(funcion, textos: list[str], repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto in textos:
+            funcion(texto)
+    return (time.perf_counter() - inicio) * 1000 / (repeticiones * len(textos))
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"{len(indice_ubicaciones)} ubicaciones en el índice")
+
+    diferencias = 0
+    for longitud in (20, 200, 2000):
+        textos = [mensaje_de(longitud, ubicacion) for ubicacion in UBICACIONES_MENCIONADAS]
+        for texto in textos:
+            anterior, nueva = ubicacion_anterior(texto), ubicacion_nueva(texto)
+            if anterior != nueva:
+                diferencias += 1
+                print(f"⚠️ {longitud} caracteres: anterior={anterior!r} índice={nueva!r} en {texto[:60]!r}...")
+
+        ms_anterior = medir(ubicacion_anterior, textos, repeticiones)
+        ms_nuevo = medir(ubicacion_nueva, textos, repeticiones)
+        print(f"{longitud:>5} caracteres: anterior {ms_anterior:9.2f} ms/mensaje | índice {ms_nuevo:7.3f} ms/mensaje | x{ms_anterior / ms_nuevo:.0f}")
+
+    print("✅ Mismas ubicaciones" if not diferencias else f"⚠️ {diferencias} diferencias")
+
+    textos = [mensaje_de(200, ubicacion) for ubicacion in UBICACIONES_MENCIONADAS]
+    for cantidad in (150, 1500, 5000):
+        lugares = lugares_sinteticos(cantidad)
+        automata = AutomataAhoCorasick({normalizar(lugar): [lugar] for lugar in lugares})
+
+        def menciones_anterior(texto: str) -> list[str]:
+            texto = texto.lower()
+            return [lugar for lugar in lugares if lugar.lower() in texto]
+
+        def menciones_automata(texto: str) -> list[str]:
+            return [automata.valores[frase][0] for _, _, frase in automata.buscar(normalizar(texto))]
+
+        ms_anterior = medir(menciones_anterior, textos, repeticiones * 20)
+        ms_nuevo = medir(menciones_automata, textos, repeticiones * 20)
+        print(f"{cantidad:>5} lugares: subcadenas {ms_anterior:7.3f} ms/mensaje | Aho-Corasick {ms_nuevo:7.3f} ms/mensaje")
+
+
+if __name__ == "__main__":
+    main()
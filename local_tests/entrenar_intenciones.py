@@ -0,0 +1,96 @@
+"""
+Entrena el clasificador de intenciones (confirmación / indiferencia / precio / otro) sobre el
+embedding compartido, usando las listas de frases de los detectores. Reporta la exactitud en
+un 20 % de frases apartadas y guarda los pesos entrenados con todo en INTENCIONES_MODELO_PATH.
+
+Uso:
+    python -m local_tests.entrenar_intenciones [ruta_salida.npz]
+"""
+from backend.embeddings.intent_classifier import (
+    ClasificadorIntenciones, entrenar_regresion_logistica, INTENCIONES, RUTA_INTENCIONES, _softmax
+)
+from backend.embeddings.embedding_service import servicio_embeddings
+from backend.api.utils import confirmation_utils
+from backend.api import filter_extractor
+import numpy as np
+import sys
+
+# Mensajes típicos que no son ninguna de las intenciones anteriores
+FRASES_OTRAS = [
+    "hola", "buenas tardes", "buenos días, ¿cómo estás?", "hola, necesito ayuda",
+    "busco un apartamento en Buga", "quiero una casa en el centro", "necesito arrendar un local",
+    "tengo dos hijos y un perro", "somos cuatro personas", "trabajo cerca de la galería",
+    "necesito tres habitaciones", "con dos baños", "que tenga parqueadero", "con patio grande",
+    "prefiero un segundo piso", "que sea cerca de un colegio", "en el barrio El Carmen",
+    "que tenga buena iluminación", "¿aceptan mascotas?", "¿tiene balcón?", "me mudo el próximo mes",
+    "¿en qué zonas tienen propiedades?", "no me gustan los conjuntos cerrados", "quiero algo tranquilo",
+    "es para vivir con mi pareja", "lo necesito para una oficina", "una finca para descansar",
+    "un lote para construir", "¿qué es un apartaestudio?", "¿cómo funciona esto?",
+    "¿quién eres?", "no entiendo", "espera un momento", "déjame pensarlo",
+    "mejor en otra ciudad", "cambia el barrio", "no, esa no me gusta", "muy pequeña",
+    "necesito más espacio", "¿hay transporte cerca?", "quiero cocina abierta", "con estudio",
+    "¿el edificio tiene ascensor?", "área de unos 80 metros", "prefiero casa antes que apartamento",
+    "vivo solo", "soy estudiante", "me interesa el sector norte", "¿qué tan segura es la zona?",
+    "que tenga zona de ropas", "no quiero primer piso", "busco algo amoblado",
+    "tengo una moto", "que sea esquinera", "con terraza", "adiós", "ok, luego te escribo",
+]
+
+
+def datos_entrenamiento() -> tuple[list[str], np.ndarray]:
+    grupos = {
+        "confirmacion": confirmation_utils._frases_confirmacion,
+        "indiferencia": confirmation_utils.frases_indiferencia,
+        "precio": filter_extractor.PALABRAS_CLAVE_PRECIO,
+        "otro": FRASES_OTRAS,
+    }
+    textos, etiquetas = [], []
+    for clase, frases in grupos.items():
+        for frase in dict.fromkeys(frases):
+            textos.append(frase)
+            etiquetas.append(INTENCIONES.index(clase))
+    return textos, np.array(etiquetas)
+
+
+def particion_estratificada(y: np.ndarray, fraccion: float = 0.2, semilla: int = 42) -> tuple[np.ndarray, np.ndarray]:
+    generador = np.random.default_rng(semilla)
+    prueba = []
+    for clase in np.unique(y):
+        indices = generador.permutation(np.flatnonzero(y == clase))
+        prueba.extend(indices[:max(1, int(len(indices) * fraccion))])
+    mascara = np.zeros(len(y), dtype=bool)
+    mascara[prueba] = True
+    return np.flatnonzero(~mascara), np.flatnonzero(mascara)
+
+
+def main():
+    ruta = sys.argv[1] if len(sys.argv) > 1 else RUTA_INTENCIONES
+    textos, y = datos_entrenamiento()
+    print(f"[INFO] 🧬 Codificando {len(textos)} frases con {servicio_embeddings.firma}...")
+    X = servicio_embeddings.encode(textos).astype(np.float64)
+
+    entrenamiento, prueba = particion_estratificada(y)
+    W, b = entrenar_regresion_logistica(X[entrenamiento], y[entrenamiento], len(INTENCIONES))
+    probs = _softmax(X[prueba] @ W + b)
+    predichas = probs.argmax(axis=1)
+    exactitud = float((predichas == y[prueba]).mean())
+
+    print(f"\n== Exactitud en frases apartadas: {exactitud:.3f} ({len(prueba)} frases) ==")
+    print(f"{'real / predicha':<16}" + "".join(f"{clase:>14}" for clase in INTENCIONES))
+    for i, clase in enumerate(INTENCIONES):
+        fila = [int(((y[prueba] == i) & (predichas == j)).sum()) for j in range(len(INTENCIONES))]
+        print(f"{clase:<16}" + "".join(f"{n:>14}" for n in fila))
+
+    confianza = probs.max(axis=1)
+    print(f"\nConfianza media: aciertos {confianza[predichas == y[prueba]].mean():.3f}"
+          + (f", errores {confianza[predichas != y[prueba]].mean():.3f}" if (predichas != y[prueba]).any() else ""))
+    for i in np.flatnonzero(predichas != y[prueba]):
+        print(f"    ↳ {textos[prueba[i]]!r}: {INTENCIONES[y[prueba][i]]} -> {INTENCIONES[predichas[i]]}")
+
+    # Pesos finales con todas las frases
+    W, b = entrenar_regresion_logistica(X, y, len(INTENCIONES))
+    ClasificadorIntenciones(ruta=ruta).guardar(W, b, exactitud)
+    print(f"\n[INFO] ✅ Clasificador guardado en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Exporta MiniLM (sentence-transformers) a ONNX y lo cuantiza a int8 para EMBEDDINGS_BACKEND=onnx.
+
+Uso:
+    python -m local_tests.exportar_embeddings_onnx [carpeta_destino]
+
+Necesita torch, sentence-transformers y onnxruntime solo en la máquina que exporta; en
+producción basta con onnxruntime y tokenizers.
+"""
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from sentence_transformers import SentenceTransformer
+import torch
+import sys
+import os
+
+from backend.embeddings.embedding_service import MODELO_EMBEDDINGS
+from backend.embeddings.onnx_backend import RUTA_ONNX, ARCHIVO_ONNX, ARCHIVO_TOKENIZER
+
+
+def main():
+    destino = sys.argv[1] if len(sys.argv) > 1 else RUTA_ONNX
+    os.makedirs(destino, exist_ok=True)
+
+    print(f"[INFO] 🚀 Cargando {MODELO_EMBEDDINGS}...")
+    modelo = SentenceTransformer(MODELO_EMBEDDINGS, device="cpu")
+    transformer = modelo[0].auto_model.eval()
+    tokenizer = modelo.tokenizer
+
+    ejemplo = tokenizer(["quiero ver la casa"], return_tensors="pt")
+    entradas = ("input_ids", "attention_mask", "token_type_ids")
+    ejes = {nombre: {0: "lote", 1: "secuencia"} for nombre in entradas}
+    ejes["last_hidden_state"] = {0: "lote", 1: "secuencia"}
+
+    fp32 = os.path.join(destino, "model_fp32.onnx")
+    print("[INFO] 📦 Exportando a ONNX (fp32)...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(ejemplo[nombre] for nombre in entradas),
+            fp32,
+            input_names=list(entradas),
+            output_names=["last_hidden_state"],
+            dynamic_axes=ejes,
+            opset_version=17
+        )
+
+    print("[INFO] 🗜️ Cuantizando pesos a int8...")
+    quantize_dynamic(fp32, os.path.join(destino, ARCHIVO_ONNX), weight_type=QuantType.QInt8)
+    os.remove(fp32)
+
+    tokenizer.backend_tokenizer.save(os.path.join(destino, ARCHIVO_TOKENIZER))
+    tamano_mb = os.path.getsize(os.path.join(destino, ARCHIVO_ONNX)) / (1024 * 1024)
+    print(f"[INFO] ✅ Listo en {destino} ({tamano_mb:.1f} MB). Verifica con local_tests/paridad_embeddings_onnx.py")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ import os
 from backend.api.utils.auth_utils import verificar_token_web, verificar_token
 from backend.memory.memory_manager import MemoryManager
 from backend.llm_engine.llm_engine import LLMEngine
+from backend.api.readiness import arranque
 from backend.api.routes import router
 
 # Configuración del logger
@@ -34,7 +35,9 @@ async def lifespan(app: FastAPI):
 
     logger.debug("🚀 Inicializando entorno...")
 
-    try:
+    async def cargar_modelo_y_memoria():
+        global _llm_instance, _memory_instance
+
         if not _llm_instance:
             logger.info("🧠 Cargando modelo...")
             _llm_instance = LLMEngine(MODEL_PATH, PROMPT_PATH)
@@ -47,6 +50,12 @@ async def lifespan(app: FastAPI):
         else:
             logger.info("✅ Memoria ya estaba cargada")
 
+    try:
+        # En local todo se carga antes de atender: el chat queda habilitado en cuanto termina
+        await arranque.ejecutar("local", cargar_modelo_y_memoria)
+        if not arranque.listo:
+            raise RuntimeError(arranque.estado()["componentes"]["local"]["error"])
+
         app.state.llm = _llm_instance
         app.state.memory = _memory_instance
 
@@ -0,0 +1,88 @@
+"""
+Compara el backend ONNX int8 contra SentenceTransformer (fp32) con los umbrales reales de los
+detectores: cuántas decisiones cambian, la mayor diferencia de similitud y el tiempo por mensaje.
+
+Uso:
+    python -m local_tests.paridad_embeddings_onnx
+"""
+from backend.embeddings.embedding_service import ServicioEmbeddings, _memoria_residente_mb
+from backend.embeddings.anchor_banks import BancoAnclas
+from backend.api.utils import confirmation_utils
+from backend.api import filter_extractor
+import tempfile
+import time
+
+# Banco -> (frases, umbral con el que decide el detector)
+DETECTORES = {
+    "confirmaciones": (confirmation_utils._frases_confirmacion, 0.75),
+    "indiferencia": (confirmation_utils.frases_indiferencia, 0.75),
+    "tipos_propiedad": (list(filter_extractor.REGEX_BASE["tipo"].keys()), 0.7),
+    "contexto_precio": (filter_extractor.PALABRAS_CLAVE_PRECIO, 0.65),
+    "unidades_precio": (filter_extractor.UNIDADES_VALIDAS, 0.6),
+}
+
+MENSAJES = [
+    "hola, busco un apartamento en Buga",
+    "muéstramela por favor",
+    "dale, de una",
+    "me da igual el barrio",
+    "lo que tengas está bien",
+    "quiero una casa con patio",
+    "algo tipo finca para el fin de semana",
+    "un local para mi negocio",
+    "¿cuánto cuesta el arriendo?",
+    "tengo unos 300 millones",
+    "máximo 2 millones mensuales",
+    "millnes",
+    "mil",
+    "ok",
+    "no sé, escoge tú",
+    "necesito tres habitaciones y dos baños",
+    "prefiero algo cerca al centro",
+    "gracias, eso es todo",
+    "¿me la puedes mostrar?",
+    "un apartaestudio pequeño",
+]
+
+
+def medir(servicio: ServicioEmbeddings, carpeta: str) -> tuple[dict, float, float | None]:
+    memoria_antes = _memoria_residente_mb()
+    bancos = {nombre: BancoAnclas(nombre, frases, servicio=servicio, ruta=carpeta) for nombre, (frases, _) in DETECTORES.items()}
+    for banco in bancos.values():
+        banco.vectores
+    memoria = _memoria_residente_mb()
+
+    inicio = time.perf_counter()
+    for mensaje in MENSAJES:
+        servicio._codificar_modelo([mensaje])
+    ms_por_mensaje = (time.perf_counter() - inicio) * 1000 / len(MENSAJES)
+
+    similitudes = {
+        nombre: [banco.maxima(mensaje) for mensaje in MENSAJES] for nombre, banco in bancos.items()
+    }
+    delta_mb = memoria - memoria_antes if memoria is not None and memoria_antes is not None else None
+    return similitudes, ms_por_mensaje, delta_mb
+
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        referencia, ms_torch, mb_torch = medir(ServicioEmbeddings(max_memo=0, max_lote=1, backend="torch"), carpeta)
+        onnx, ms_onnx, mb_onnx = medir(ServicioEmbeddings(max_memo=0, max_lote=1, backend="onnx"), carpeta)
+
+    print(f"{'detector':<18}{'umbral':>8}{'max |Δ|':>10}{'cambios':>10}")
+    total_cambios = 0
+    for nombre, (_, umbral) in DETECTORES.items():
+        pares = list(zip(referencia[nombre], onnx[nombre]))
+        delta = max(abs(a - b) for a, b in pares)
+        cambios = [MENSAJES[i] for i, (a, b) in enumerate(pares) if (a >= umbral) != (b >= umbral)]
+        total_cambios += len(cambios)
+        print(f"{nombre:<18}{umbral:>8.2f}{delta:>10.4f}{len(cambios):>10}")
+        for mensaje in cambios:
+            print(f"    ↳ decisión distinta: {mensaje!r}")
+
+    print(f"\ntorch: {ms_torch:.1f} ms/mensaje (+{mb_torch} MB) | onnx int8: {ms_onnx:.1f} ms/mensaje (+{mb_onnx} MB)")
+    print("✅ Paridad OK" if total_cambios == 0 else f"⚠️ {total_cambios} decisiones cambian con int8")
+
+
+if __name__ == "__main__":
+    main()
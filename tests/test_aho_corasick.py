@@ -0,0 +1,22 @@
+from backend.api.utils.aho_corasick import AutomataAhoCorasick
+
+def test_encuentra_todas_las_frases_en_limite_de_palabra():
+    automata = AutomataAhoCorasick({"la merced": ["a"], "merced": ["b"], "san miguel": ["c"], "el": ["d"]})
+    texto = "casa en la merced o en san miguel elegante"
+    assert automata.todas(texto) == [(8, 17, "la merced"), (11, 17, "merced"), (23, 33, "san miguel")]
+
+def test_prefiere_la_mas_larga_sin_solapar():
+    automata = AutomataAhoCorasick({"la merced": [1], "la merced alta": [2], "alta": [3]})
+    assert automata.buscar("la merced alta y alta") == [(0, 14, "la merced alta"), (17, 21, "alta")]
+
+def test_valores_de_varias_fuentes_sin_repetir():
+    automata = AutomataAhoCorasick()
+    automata.agregar("centro", [("barrio", "Centro")])
+    automata.agregar("centro", [("barrio", "Centro"), ("ciudad", "Buga")])
+    assert automata.valores["centro"] == [("barrio", "Centro"), ("ciudad", "Buga")]
+    assert automata.buscar("") == []
+
+def test_menciones_separadas_solo_por_puntuacion():
+    from backend.api.utils.location_index import normalizar
+    automata = AutomataAhoCorasick({"tulua": ["Tuluá"], "buga": ["Buga"]})
+    assert [frase for _, _, frase in automata.buscar(normalizar("Tuluá,Buga"))] == ["tulua", "buga"]
@@ -0,0 +1,34 @@
+from backend.embeddings.anchor_banks import BancoAnclas
+import numpy as np
+
+class _ServicioFalso:
+    firma = "falso"
+
+    def __init__(self):
+        self.codificados = []
+
+    def encode(self, textos):
+        lista = [textos] if isinstance(textos, str) else textos
+        self.codificados.extend(lista)
+        vectores = np.array([[1.0, 0.0] if "casa" in t else [0.0, 1.0] for t in lista])
+        return vectores[0] if isinstance(textos, str) else vectores
+
+def test_banco_se_guarda_y_se_reabre_con_mmap(tmp_path):
+    frases = ["casa grande", "apartamento"]
+    primero = BancoAnclas("tipos", frases, servicio=_ServicioFalso(), ruta=str(tmp_path))
+    assert primero.mejor("una casa") == ("casa grande", 1.0)
+    assert primero.estado()["origen"] == "codificado"
+
+    servicio = _ServicioFalso()
+    segundo = BancoAnclas("tipos", frases, servicio=servicio, ruta=str(tmp_path))
+    assert isinstance(segundo.vectores, np.memmap)
+    assert segundo.maxima("apto") == 1.0
+    assert servicio.codificados == ["apto"]
+    assert segundo.estado()["origen"] == "disco"
+
+def test_otras_frases_no_reutilizan_el_archivo(tmp_path):
+    BancoAnclas("tipos", ["casa"], servicio=_ServicioFalso(), ruta=str(tmp_path)).vectores
+    otro = BancoAnclas("tipos", ["casa", "lote"], servicio=_ServicioFalso(), ruta=str(tmp_path))
+    assert otro.vectores.shape == (2, 2)
+    assert otro.estado()["origen"] == "codificado"
+    assert len(list(tmp_path.glob("tipos-*.npy"))) == 2
@@ -0,0 +1,37 @@
+from backend.llm_engine import calibration
+import json
+
+CALIBRACION = {"n_threads": 6, "n_threads_batch": 8, "n_batch": 256, "decode_tps": 9.1, "prefill_tps": 80.0}
+
+def crear_modelo(tmp_path, contenido=b"GGUF" * 1000):
+    ruta = tmp_path / "modelo.gguf"
+    ruta.write_bytes(contenido)
+    return str(ruta)
+
+def test_huella_modelo_cambia_con_el_contenido(tmp_path):
+    a = calibration.huella_modelo(crear_modelo(tmp_path, b"a" * 100))
+    b = calibration.huella_modelo(crear_modelo(tmp_path, b"b" * 100))
+    assert a != b
+
+def test_calibracion_desactivada_por_defecto(tmp_path, monkeypatch):
+    monkeypatch.delenv("LLM_CALIBRAR", raising=False)
+    assert calibration.obtener_calibracion(crear_modelo(tmp_path), str(tmp_path / "cal.json")) is None
+
+def test_calibracion_se_guarda_y_se_reutiliza(tmp_path, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(calibration, "calibrar", lambda model_path: llamadas.append(model_path) or dict(CALIBRACION))
+    monkeypatch.setenv("LLM_CALIBRAR", "1")
+    modelo = crear_modelo(tmp_path)
+    ruta = str(tmp_path / "cal.json")
+
+    assert calibration.obtener_calibracion(modelo, ruta)["n_threads"] == 6
+    assert calibration.obtener_calibracion(modelo, ruta)["n_batch"] == 256
+    assert len(llamadas) == 1
+
+    with open(ruta, encoding="utf-8") as f:
+        guardadas = json.load(f)
+    assert list(guardadas) == [f"{calibration.huella_modelo(modelo)}|{calibration.firma_cpu()}"]
+
+    monkeypatch.setenv("LLM_CALIBRAR", "forzar")
+    calibration.obtener_calibracion(modelo, ruta)
+    assert len(llamadas) == 2
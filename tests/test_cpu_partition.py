@@ -0,0 +1,52 @@
+from backend.cpu_partition import ParticionCPU, nucleos_disponibles
+import pytest
+import os
+
+def test_nucleos_disponibles_es_positivo():
+    assert nucleos_disponibles() >= 1
+
+def test_reparto_por_defecto_deja_el_resto_al_llm():
+    particion = ParticionCPU(cpus=list(range(8)))
+    assert particion.hilos == {"llm": 5, "embeddings": 2, "fuzzy": 1}
+    assert not particion.sobresuscrita
+    assert particion.cpus_de("llm") is None  # sin afinidad
+
+def test_con_pocos_nucleos_embeddings_y_fuzzy_comparten_uno():
+    dos = ParticionCPU(cpus=[0, 1], afinidad=True)
+    assert dos.hilos == {"llm": 1, "embeddings": 1, "fuzzy": 1}
+    assert dos.nucleos_usados == 2 and not dos.sobresuscrita
+    assert dos.afinidad == {"llm": [0], "embeddings": [1], "fuzzy": [1]}
+
+    cuatro = ParticionCPU(cpus=list(range(4)))
+    assert cuatro.hilos == {"llm": 3, "embeddings": 1, "fuzzy": 1}
+    assert cuatro.nucleos_usados == 4
+
+def test_afinidad_asigna_conjuntos_disjuntos_y_reparte_workers():
+    particion = ParticionCPU(cpus=list(range(8)), hilos_llm=4, hilos_embeddings=2, afinidad=True)
+    assert particion.cpus_de("llm") == [0, 1, 2, 3]
+    assert particion.cpus_de("embeddings") == [4, 5]
+    assert particion.cpus_de("fuzzy") == [6]
+    assert particion.cpus_de("llm", parte=1, partes=2) == [2, 3]
+
+def test_afinidad_se_ignora_si_no_alcanzan_los_nucleos():
+    particion = ParticionCPU(cpus=[0, 1], hilos_llm=4, afinidad=True)
+    assert particion.afinidad == {}
+    assert particion.sobresuscrita
+
+def test_un_solo_nucleo_no_se_reporta_sobresuscrito():
+    particion = ParticionCPU(cpus=[0], afinidad=True)
+    assert particion.un_nucleo and particion.nucleos_usados == 1
+    assert not particion.sobresuscrita
+    assert particion.afinidad == {"llm": [0], "embeddings": [0], "fuzzy": [0]}
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="requiere sched_setaffinity")
+def test_afinidad_temporal_restaura_la_del_hilo():
+    anteriores = os.sched_getaffinity(0)
+    cpu = min(anteriores)
+    particion = ParticionCPU(cpus=[cpu], afinidad=True)
+    with particion.afinidad_temporal("fuzzy"):
+        assert os.sched_getaffinity(0) == {cpu}
+    assert os.sched_getaffinity(0) == anteriores
+
+    with ParticionCPU(cpus=[cpu]).afinidad_temporal("llm"):  # sin afinidad no toca nada
+        assert os.sched_getaffinity(0) == anteriores
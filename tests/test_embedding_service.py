@@ -0,0 +1,42 @@
+from backend.embeddings.embedding_service import ServicioEmbeddings
+import numpy as np
+
+def test_modelo_no_se_carga_al_crear_el_servicio():
+    servicio = ServicioEmbeddings("modelo-inexistente")
+    assert servicio.estado()["cargado"] is False
+
+def test_similitud_entre_vectores_normalizados():
+    a = np.array([[1.0, 0.0], [0.0, 1.0]])
+    b = np.array([[1.0, 0.0], [np.sqrt(0.5), np.sqrt(0.5)]])
+    similitudes = ServicioEmbeddings.similitud(a, b)
+    assert similitudes.shape == (2, 2)
+    assert np.allclose(similitudes, [[1.0, np.sqrt(0.5)], [0.0, np.sqrt(0.5)]])
+    assert np.isclose(ServicioEmbeddings.similitud(a[0], b[1]), np.sqrt(0.5))
+
+class _ModeloContador:
+    def __init__(self):
+        self.codificados = []
+
+    def encode(self, textos, normalize_embeddings=True, convert_to_numpy=True):
+        self.codificados.extend(textos)
+        return np.array([[float(len(t)), 1.0] for t in textos])
+
+def test_cada_texto_se_codifica_una_sola_vez():
+    servicio = ServicioEmbeddings("falso", max_memo=2)
+    servicio._modelo = modelo = _ModeloContador()
+
+    unico = servicio.encode("busco casa")
+    lote = servicio.encode(["busco casa", "dale", "dale"])
+    assert modelo.codificados == ["busco casa", "dale"]
+    assert unico.shape == (2,) and lote.shape == (3, 2)
+    assert np.array_equal(lote[0], unico)
+    assert not unico.flags.writeable
+
+    servicio.encode("otra cosa")  # expulsa "busco casa" (LRU de 2)
+    servicio.encode(["busco casa"])
+    assert modelo.codificados[-1] == "busco casa"
+    assert servicio.estado()["memo"]["entradas"] == 2
+
+def test_firma_distingue_backend_onnx():
+    assert ServicioEmbeddings("minilm", backend="torch").firma == "minilm"
+    assert ServicioEmbeddings("minilm", backend="onnx").firma == "minilm|onnx"
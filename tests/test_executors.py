@@ -0,0 +1,31 @@
+from backend.api.executors import EjecutorEtapas
+import threading
+import json
+import asyncio
+
+def _nombre_hilo():
+    return threading.current_thread().name
+
+def test_en_hilo_corre_fuera_del_event_loop_y_mide_la_etapa():
+    ejecutor = EjecutorEtapas(hilos=2)
+
+    async def turno():
+        return await ejecutor.en_hilo("filtros", _nombre_hilo)
+
+    try:
+        assert asyncio.run(turno()).startswith("etapas")
+        estado = ejecutor.estado()
+        assert estado["etapas_s"]["filtros"]["conteo"] == 1
+        assert estado["espera_pool_s"]["filtros"]["conteo"] == 1
+    finally:
+        ejecutor.cerrar()
+
+def test_estado_con_etapa_lenta_es_json_valido_para_metrics():
+    ejecutor = EjecutorEtapas(hilos=1)
+    try:
+        ejecutor._observar(ejecutor._duracion, "filtros", 120.0)
+        estado = ejecutor.estado()
+        json.dumps({"etapas": estado}, allow_nan=False)
+        assert estado["etapas_s"]["filtros"]["p95_desborda"] is True
+    finally:
+        ejecutor.cerrar()
@@ -0,0 +1,39 @@
+from backend.embeddings.intent_classifier import ClasificadorIntenciones, entrenar_regresion_logistica, INTENCIONES
+import numpy as np
+
+VECTORES = {
+    "dale": [1.0, 0.0, 0.0, 0.0],
+    "me da igual": [0.0, 1.0, 0.0, 0.0],
+    "cuánto vale": [0.0, 0.0, 1.0, 0.0],
+    "hola": [0.0, 0.0, 0.0, 1.0],
+}
+
+class _ServicioFalso:
+    def __init__(self, firma="falso"):
+        self.firma = firma
+
+    def encode(self, texto):
+        return np.array(VECTORES[texto])
+
+def test_entrena_guarda_y_clasifica(tmp_path):
+    X = np.array(list(VECTORES.values()) * 5) + np.random.default_rng(0).normal(0, 0.05, (20, 4))
+    y = np.array([0, 1, 2, 3] * 5)
+    W, b = entrenar_regresion_logistica(X, y, len(INTENCIONES))
+
+    ruta = str(tmp_path / "intenciones.npz")
+    ClasificadorIntenciones(ruta=ruta, servicio=_ServicioFalso()).guardar(W, b, exactitud=1.0)
+
+    clasificador = ClasificadorIntenciones(ruta=ruta, servicio=_ServicioFalso())
+    assert clasificador.disponible and clasificador.exactitud == 1.0
+    probs = clasificador.probabilidades("me da igual")
+    assert max(probs, key=probs.get) == "indiferencia"
+    assert abs(sum(probs.values()) - 1.0) < 1e-5
+    assert clasificador.es("dale", "confirmacion")
+    assert not clasificador.es("hola", "precio")
+
+def test_sin_pesos_o_con_otro_modelo_no_esta_disponible(tmp_path):
+    ruta = str(tmp_path / "intenciones.npz")
+    assert not ClasificadorIntenciones(ruta=ruta, servicio=_ServicioFalso()).disponible
+
+    ClasificadorIntenciones(ruta=ruta, servicio=_ServicioFalso()).guardar(np.zeros((4, 4)), np.zeros(4))
+    assert not ClasificadorIntenciones(ruta=ruta, servicio=_ServicioFalso("otro-modelo")).disponible
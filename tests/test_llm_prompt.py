@@ -0,0 +1,75 @@
+from backend.api.utils.llm_prompt import LimpiadorIncremental, limpiar_respuesta_llm, limpiar_roles_llm, seleccionar_historial, build_prompt
+import pytest
+
+RESPUESTAS = [
+    "Usuario: Hola, soy HomeCat (instrucción interna) y estoy aquí para ayudarte.",
+    "Claro, la casa tiene 3 habitaciones (según el sistema) y 2 baños (aprox).",
+    "Texto con paréntesis sin cerrar (esto se conserva",
+    "Hola",
+    "   user:   respuesta breve",
+    "Claro, te cuento.\nUsuario: ¿y el precio?\nAsesor: Cuesta poco (aprox).",
+    "Sistema: hola (nota)\n\nSistema:    seguimos aquí con más texto",
+    "Una línea\nSin duda la segunda (no es un rol)\nUsu",
+]
+
+# ==== Simula el streaming partiendo la respuesta en fragmentos de tamaño fijo ====
+def limpiar_por_fragmentos(texto: str, tamano: int) -> str:
+    limpiador = LimpiadorIncremental()
+    salida = ""
+    for i in range(0, len(texto), tamano):
+        salida += limpiador.procesar(texto[i:i + tamano])
+    salida += limpiador.finalizar()
+    return salida
+
+@pytest.mark.parametrize("texto", RESPUESTAS)
+@pytest.mark.parametrize("tamano", [1, 3, 7, 100])
+def test_limpiador_incremental_equivale_a_limpieza_completa(texto, tamano):
+    assert limpiar_por_fragmentos(texto, tamano) == limpiar_respuesta_llm(texto)
+
+@pytest.mark.parametrize("texto", RESPUESTAS)
+@pytest.mark.parametrize("tamano", [1, 4, 100])
+def test_stream_y_chat_entregan_el_mismo_texto(texto, tamano):
+    # /chat: el motor hace strip y quita roles; chat.py aplica `limpiar_respuesta_llm`
+    respuesta_chat = limpiar_respuesta_llm(limpiar_roles_llm(texto.strip()))
+    # /chat/stream: el motor solo quita el espacio inicial y el limpiador trabaja por fragmentos
+    assert limpiar_por_fragmentos(texto.lstrip(), tamano) == respuesta_chat
+    assert "Usuario:" not in respuesta_chat and "Asesor:" not in respuesta_chat
+
+# ==== Presupuesto de tokens: una "palabra" = un token ====
+def contar_palabras(texto: str) -> int:
+    return len(texto.split())
+
+HISTORIAL = [
+    {"role": "user", "content": "quiero un apartamento en Medellín con vista"},
+    {"role": "assistant", "content": "Claro, ¿en qué barrio?"},
+    {"role": "user", "content": "El Poblado"},
+    {"role": "assistant", "content": "Perfecto"},
+]
+
+def test_seleccionar_historial_llena_desde_el_mas_reciente():
+    # Las dos últimas líneas cuestan 3 y 2 tokens ("Usuario: El Poblado", "Asesor: Perfecto")
+    assert seleccionar_historial(HISTORIAL, 5, contar_palabras) == HISTORIAL[-2:]
+    assert seleccionar_historial(HISTORIAL, 4, contar_palabras) == HISTORIAL[-1:]
+    assert seleccionar_historial(HISTORIAL, 1000, contar_palabras) == HISTORIAL
+
+def test_seleccionar_historial_no_deja_huecos():
+    # Aunque un mensaje más antiguo y corto cabría, no se salta el que no entra
+    historial = [{"role": "user", "content": "hola"}, {"role": "user", "content": "uno dos tres cuatro"}, HISTORIAL[-1]]
+    assert seleccionar_historial(historial, 3, contar_palabras) == [HISTORIAL[-1]]
+
+def test_seleccionar_historial_usa_conteo_cacheado():
+    historial = [{"role": "user", "content": "texto largo pero ya contado", "n_tokens": 1}]
+    assert seleccionar_historial(historial, 1, contar_palabras) == historial
+
+def test_build_prompt_respeta_presupuesto():
+    # Presupuesto exacto para el prompt con solo el último mensaje del historial
+    presupuesto = contar_palabras(build_prompt("¿Y el precio?", HISTORIAL[-1:], "Eres HomeCat."))
+    prompt = build_prompt("¿Y el precio?", HISTORIAL, "Eres HomeCat.", contar_tokens=contar_palabras, presupuesto_tokens=presupuesto)
+    assert "Asesor: Perfecto" in prompt
+    assert "El Poblado" not in prompt
+
+def test_build_prompt_sin_presupuesto_mantiene_ultimos_seis():
+    historial = [{"role": "user", "content": f"mensaje {i}"} for i in range(10)]
+    prompt = build_prompt("hola", historial, "Eres HomeCat.")
+    assert "mensaje 3" not in prompt
+    assert "mensaje 4" in prompt and "mensaje 9" in prompt
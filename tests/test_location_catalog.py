@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import os
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from backend.db.location_catalog import CatalogoUbicaciones
+from backend.api.utils.place_mentions import MencionesUbicaciones
+from backend.db.models.property import Inmueble
+from backend.db.models.image import ImagenInmueble
+from backend.db.database import Base
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+def _inmueble(titulo, ciudad, barrio):
+    return Inmueble(titulo=titulo, ciudad=ciudad, barrio=barrio, precio=1, area_m2=50,
+                    habitaciones=2, banos=1, carros=0, estado="disponible")
+
+@pytest.fixture
+def db():
+    motor = create_engine("sqlite://")
+    Base.metadata.create_all(motor)
+    consultas = []
+    event.listen(motor, "before_cursor_execute", lambda *args: consultas.append(args[2]))
+    sesion = sessionmaker(bind=motor)()
+    sesion.add_all([_inmueble("A", "Buga ", "La Merced"), _inmueble("B", "Buga", "El Carmen")])
+    sesion.commit()
+    sesion.consultas = consultas
+    yield sesion
+    sesion.close()
+
+def test_carga_una_vez_y_no_vuelve_a_consultar(db):
+    catalogo = CatalogoUbicaciones(verificacion_s=60)
+    assert catalogo.valores(db, "ciudad") == {"Buga ", "Buga"}
+    assert catalogo.valores(db, "barrio") == {"La Merced", "El Carmen"}
+
+    db.consultas.clear()
+    catalogo.valores(db, "barrio")
+    assert db.consultas == []
+    assert catalogo.version == 1
+
+def test_recarga_con_la_senal_o_al_invalidar(db):
+    catalogo = CatalogoUbicaciones(verificacion_s=0)
+    assert "San Miguel" not in catalogo.valores(db, "barrio")
+
+    db.add(_inmueble("C", "Buga", "San Miguel"))
+    db.commit()
+    assert "San Miguel" in catalogo.valores(db, "barrio")
+    version = catalogo.version
+
+    catalogo.valores(db, "barrio")
+    assert catalogo.version == version
+
+    catalogo.invalidar()
+    catalogo.valores(db, "barrio")
+    assert catalogo.version == version + 1
+
+def test_menciones_con_catalogo_y_ubicaciones_fijas(db):
+    menciones = MencionesUbicaciones(CatalogoUbicaciones(verificacion_s=0), {"la insula": [("barrio", "La Ínsula")]})
+    assert menciones.buscar(db, "Casa en La Ínsula o en el carmen, Buga") == [
+        ("barrio", "La Ínsula"), ("barrio", "El Carmen"), ("ciudad", "Buga")
+    ]
+    # Solo en límite de palabra
+    assert menciones.buscar(db, "bugambilias") == []
+
+    db.add(_inmueble("C", "Buga", "El Carmen Alto"))
+    db.commit()
+    # El autómata se rearma con el catálogo y prefiere la mención más larga
+    assert menciones.buscar(db, "en el carmen alto") == [("barrio", "El Carmen Alto")]
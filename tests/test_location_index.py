@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from backend.api.utils.location_index import IndiceUbicaciones, normalizar
+
+UBICACIONES = ["La Merced", "San Miguel", "Entre Valles", "Valle Real", "La Ínsula"]
+
+def test_normalizar_quita_tildes_puntuacion_y_espacios():
+    assert normalizar("  La  Ínsula, ") == "la insula"
+
+def test_normalizar_separa_palabras_unidas_por_puntuacion():
+    assert normalizar("Tuluá,Buga") == "tulua buga"
+    assert normalizar("casa en Buga.Precio?") == "casa en buga precio"
+
+def test_encuentra_la_ubicacion_con_errores_y_sin_tildes():
+    indice = IndiceUbicaciones(UBICACIONES)
+    fragmento, ubicacion, puntaje = indice.buscar("busco casa en la insula")
+    assert ubicacion == "La Ínsula"
+    assert puntaje == 100
+    assert indice.buscar("algo cerca de san migel por favor")[1] == "San Miguel"
+
+def test_gana_la_ventana_de_mayor_puntaje_no_la_primera():
+    indice = IndiceUbicaciones(UBICACIONES)
+    assert indice.buscar("busco casa en valle real")[1] == "Valle Real"
+
+def test_sin_coincidencias_y_mensajes_recortados():
+    indice = IndiceUbicaciones(UBICACIONES, max_tokens=3)
+    assert indice.buscar("hola buenas tardes") is None
+    assert indice.buscar("") is None
+    assert indice.buscar("uno dos tres la merced") is None
@@ -0,0 +1,67 @@
+from backend.embeddings.micro_batcher import MicroLotes
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import threading
+import time
+
+def test_pedidos_simultaneos_comparten_lote():
+    lotes = []
+    def codificar(textos):
+        lotes.append(list(textos))
+        return np.array([[float(len(t))] for t in textos])
+
+    micro = MicroLotes(codificar, max_lote=8, espera_ms=200)
+    barrera = threading.Barrier(4)
+    def pedir(texto):
+        barrera.wait()
+        return micro.codificar([texto, "comun"])
+
+    with ThreadPoolExecutor(4) as ejecutor:
+        resultados = list(ejecutor.map(pedir, ["a", "bb", "ccc", "dddd"]))
+    micro.cerrar()
+
+    assert [r[:, 0].tolist() for r in resultados] == [[1, 5], [2, 5], [3, 5], [4, 5]]
+    assert sum(len(lote) for lote in lotes) == 5  # "comun" se codifica una sola vez por lote
+    assert len(lotes) == 1 and micro.estado()["mayor_lote"] == 5
+
+def test_lote_lleno_no_espera_y_errores_llegan_al_llamador():
+    def codificar(textos):
+        if "falla" in textos:
+            raise RuntimeError("modelo caído")
+        return np.zeros((len(textos), 2))
+
+    micro = MicroLotes(codificar, max_lote=2, espera_ms=10_000)
+    inicio = time.monotonic()
+    assert micro.codificar(["x", "y"]).shape == (2, 2)
+    assert time.monotonic() - inicio < 5
+    micro.cerrar()
+
+    micro = MicroLotes(codificar, max_lote=2, espera_ms=1)
+    try:
+        micro.codificar(["falla"])
+        assert False, "debía propagar el error"
+    except RuntimeError as e:
+        assert "modelo caído" in str(e)
+    micro.cerrar()
+
+def test_hilo_caido_no_deja_pedidos_colgados():
+    micro = MicroLotes(lambda textos: np.zeros((len(textos), 1)), max_lote=4, espera_ms=1,
+                       al_iniciar=lambda: (_ for _ in ()).throw(OSError("sin afinidad")))
+    # Un fallo al preparar el hilo no impide codificar
+    assert micro.codificar(["a"]).shape == (1, 1)
+    micro.cerrar()
+
+    micro = MicroLotes(lambda textos: np.zeros((len(textos), 1)), max_lote=4, espera_ms=1, timeout_s=5)
+    micro._juntar = lambda: (_ for _ in ()).throw(RuntimeError("hilo detenido"))
+    futuro = micro.enviar(["a"])
+    try:
+        futuro.result(timeout=5)
+        assert False, "debía propagar el error"
+    except RuntimeError as e:
+        assert "hilo de lotes" in str(e)
+
+def test_sin_respuesta_del_hilo_codifica_directo():
+    micro = MicroLotes(lambda textos: np.ones((len(textos), 1)), max_lote=4, espera_ms=1, timeout_s=0.2)
+    micro._asegurar_hilo = lambda: None  # el hilo nunca atiende la cola
+    assert micro.codificar(["a", "b"]).shape == (2, 1)
+    assert micro.estado()["codificados_directo"] == 1
@@ -0,0 +1,26 @@
+from backend.api.readiness import EstadoArranque
+import asyncio
+
+def test_listo_solo_cuando_todos_los_componentes_cargan():
+    arranque = EstadoArranque()
+    arranque.registrar("llm")
+    arranque.registrar("embeddings")
+    assert not arranque.listo
+
+    async def carga_ok():
+        await asyncio.sleep(0)
+
+    async def carga_falla():
+        raise FileNotFoundError("Modelo no encontrado")
+
+    async def cargar():
+        await asyncio.gather(arranque.ejecutar("llm", carga_falla), arranque.ejecutar("embeddings", carga_ok))
+
+    asyncio.run(cargar())
+    estado = arranque.estado()
+    assert not estado["listo"]
+    assert estado["componentes"]["embeddings"]["estado"] == "listo"
+    assert estado["componentes"]["llm"] == {"estado": "error", "segundos": 0.0, "error": "Modelo no encontrado"}
+
+    asyncio.run(arranque.ejecutar("llm", carga_ok))
+    assert arranque.listo
@@ -0,0 +1,25 @@
+from backend.api.utils.regex_matcher import EscanerPatrones, unir_patrones
+import re
+
+PATRONES = {
+    "habitaciones": r"(\d{1,2})\s*(habitaci[oó]n|habitaciones|cuartos?)",
+    "banos": r"(\d{1,2})\s*(bañ[oa]s?)",
+    "area_m2": r"(\d{2,4})\s*(m2|mts)",
+}
+
+def test_grupos_iguales_a_findall_por_patron():
+    escaner = EscanerPatrones(PATRONES, anticipo=r"(?=\d)")
+    for texto in ["3 habitaciones, 2 baños y 120 m2", "1 cuarto o 2 cuartos", "sin números", "2 baños 3 baños"]:
+        esperado = {campo: re.findall(patron, texto) for campo, patron in PATRONES.items() if re.findall(patron, texto)}
+        assert escaner.grupos_por_etiqueta(texto) == esperado
+
+def test_prefijo_b_comun_y_etiquetas():
+    escaner = EscanerPatrones({"Casa": r"\b(casa(s)?)\b", "Lote": r"\b(lote(s)?|terreno)\b"})
+    assert escaner.etiquetas_presentes("casas y terreno") == {"Casa", "Lote"}
+    assert escaner.etiquetas_presentes("casamiento") == set()
+
+def test_unir_patrones_equivale_a_any():
+    patrones = [r"\b(dale|listo)\b", r"quiero ver.*casa"]
+    unido = unir_patrones(patrones)
+    for texto in ["dale pues", "quiero ver esa casa", "nada que ver", "listos"]:
+        assert (unido.search(texto) is not None) == any(re.search(p, texto) for p in patrones)
@@ -0,0 +1,71 @@
+from backend.llm_engine.response_cache import CacheRespuestas, normalizar_mensaje, es_cacheable
+import numpy as np
+
+HISTORIAL = [{"role": "system", "content": "Eres un asesor inmobiliario profesional."}]
+
+# ==== Embeddings de juguete: bolsa de palabras normalizada ====
+VOCABULARIO = ["hola", "busco", "casa", "una", "en", "buga", "cali", "apartamento", "quiero"]
+
+def codificar(texto: str) -> np.ndarray:
+    palabras = texto.split()
+    vector = np.array([palabras.count(p) for p in VOCABULARIO], dtype=float)
+    return vector / (np.linalg.norm(vector) or 1)
+
+def test_normalizar_mensaje():
+    assert normalizar_mensaje("  Hola, busco una casa en Buga!! ") == "hola busco una casa en buga"
+
+def test_acierto_exacto_con_mensaje_normalizado():
+    cache = CacheRespuestas()
+    cache.guardar("hola, busco una casa", HISTORIAL, "¡Hola! ¿En qué ciudad la buscas?")
+    assert cache.obtener("Hola busco una casa!", HISTORIAL) == "¡Hola! ¿En qué ciudad la buscas?"
+    assert cache.estado()["aciertos_exactos"] == 1
+
+def test_historial_distinto_no_comparte_respuesta():
+    cache = CacheRespuestas()
+    cache.guardar("hola", HISTORIAL, "¡Hola! ¿Qué buscas?")
+    otro = HISTORIAL + [{"role": "user", "content": "busco casa"}]
+    assert cache.obtener("hola", otro) is None
+
+def test_respuestas_con_datos_no_se_guardan():
+    assert not es_cacheable(HISTORIAL, "Cuesta $450.000.000 y tiene 85 m²")
+    resumen = HISTORIAL + [{"role": "system", "content": "Estos son los datos REALES de la propiedad"}]
+    assert not es_cacheable(resumen, "Te va a encantar")
+
+    cache = CacheRespuestas()
+    cache.guardar("precio", HISTORIAL, "Cuesta $450.000.000")
+    assert cache.obtener("precio", HISTORIAL) is None
+    assert cache.estado()["no_cacheables"] == 1
+
+def test_ttl_y_tamano_maximo():
+    cache = CacheRespuestas(max_entradas=2, ttl_s=0)
+    cache.guardar("hola", HISTORIAL, "Hola")
+    assert cache.obtener("hola", HISTORIAL) is None
+
+    cache = CacheRespuestas(max_entradas=2)
+    for mensaje in ("uno", "dos", "tres"):
+        cache.guardar(mensaje, HISTORIAL, "Respuesta")
+    assert cache.obtener("uno", HISTORIAL) is None
+    assert cache.obtener("tres", HISTORIAL) == "Respuesta"
+
+def test_acierto_semantico():
+    cache = CacheRespuestas(codificar=codificar, umbral_semantico=0.85)
+    cache.guardar("hola busco una casa en", HISTORIAL, "Con gusto, ¿en qué ciudad?")
+    assert cache.obtener("hola busco casa en", HISTORIAL) == "Con gusto, ¿en qué ciudad?"
+    assert cache.estado()["aciertos_semanticos"] == 1
+
+def test_semantico_no_reutiliza_respuesta_con_palabras_del_otro_mensaje():
+    cache = CacheRespuestas(codificar=codificar, umbral_semantico=0.5)
+    cache.guardar("hola busco una casa en buga", HISTORIAL, "¡Claro! ¿En qué barrio de Buga?")
+    assert cache.obtener("hola busco una casa en cali", HISTORIAL) is None
+
+def test_semantico_codifica_el_mensaje_sin_normalizar():
+    # Mismo texto que codifica el turno: así lo sirve la memoria de embeddings
+    codificados = []
+    def registrar(texto: str) -> np.ndarray:
+        codificados.append(texto)
+        return codificar(normalizar_mensaje(texto))
+
+    cache = CacheRespuestas(codificar=registrar, umbral_semantico=0.85)
+    cache.guardar("Hola, busco una casa en", HISTORIAL, "Con gusto, ¿en qué ciudad?")
+    assert cache.obtener("Hola, busco casa en!", HISTORIAL) == "Con gusto, ¿en qué ciudad?"
+    assert codificados == ["Hola, busco una casa en", "Hola, busco casa en!"]
@@ -0,0 +1,75 @@
+from backend.llm_engine.scheduler import PlanificadorInferencia, ColaInferenciaLlena, InferenciaCancelada
+import threading
+import asyncio
+import pytest
+
+# ==== Simula una inferencia que ocupa el turno durante un tiempo fijo ====
+async def inferencia_simulada(planificador, duracion, activos, maximo):
+    async with planificador.turno() as espera:
+        activos[0] += 1
+        maximo[0] = max(maximo[0], activos[0])
+        await asyncio.sleep(duracion)
+        activos[0] -= 1
+        return espera
+
+def test_planificador_serializa_inferencias():
+    async def escenario():
+        planificador = PlanificadorInferencia(concurrencia=1, max_cola=10)
+        activos, maximo = [0], [0]
+        esperas = await asyncio.gather(*[
+            inferencia_simulada(planificador, 0.01, activos, maximo) for _ in range(5)
+        ])
+        return planificador, maximo[0], esperas
+
+    planificador, maximo, esperas = asyncio.run(escenario())
+    assert maximo == 1
+    assert max(esperas) > 0
+    assert planificador.estado()["atendidas"] == 5
+    assert planificador.estado()["en_curso"] == 0
+
+def test_planificador_rechaza_con_retry_after_si_la_cola_esta_llena():
+    async def escenario():
+        planificador = PlanificadorInferencia(concurrencia=1, max_cola=2)
+        activos, maximo = [0], [0]
+        tareas = [asyncio.create_task(inferencia_simulada(planificador, 0.05, activos, maximo)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(ColaInferenciaLlena) as error:
+            async with planificador.turno():
+                pass
+
+        await asyncio.gather(*tareas)
+        return planificador, error.value
+
+    planificador, error = asyncio.run(escenario())
+    assert error.retry_after >= 1
+    assert planificador.estado()["rechazadas"] == 1
+
+def test_cancelada_en_cola_libera_su_lugar_sin_tomar_turno():
+    async def escenario():
+        planificador = PlanificadorInferencia(concurrencia=1, max_cola=1)
+        activos, maximo = [0], [0]
+        ocupada = asyncio.create_task(inferencia_simulada(planificador, 0.3, activos, maximo))
+        await asyncio.sleep(0.01)
+
+        cancelacion = threading.Event()
+        async def en_cola():
+            async with planificador.turno(cancelacion):
+                pytest.fail("no debería tomar turno")
+        esperando = asyncio.create_task(en_cola())
+        await asyncio.sleep(0.01)
+        assert planificador.estado()["en_espera"] == 1
+
+        cancelacion.set()
+        with pytest.raises(InferenciaCancelada):
+            await esperando
+        # Su lugar ya está libre aunque la inferencia en curso no haya terminado
+        estado = planificador.estado()
+        planificador.verificar_admision()
+        await ocupada
+        return estado, planificador.estado()
+
+    durante, despues = asyncio.run(escenario())
+    assert durante["en_espera"] == 0 and durante["en_curso"] == 1
+    assert despues["canceladas_en_cola"] == 1
+    assert despues["atendidas"] == 1 and despues["en_curso"] == 0
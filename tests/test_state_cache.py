@@ -0,0 +1,42 @@
+from backend.llm_engine.state_cache import CacheEstadosSesion
+from backend.memory.memory_manager import MemoryManager
+
+def test_cache_expulsa_la_sesion_menos_usada_al_superar_el_presupuesto():
+    cache = CacheEstadosSesion(presupuesto_bytes=300)
+    cache.guardar("a", "estado_a", 100)
+    cache.guardar("b", "estado_b", 100)
+    cache.guardar("c", "estado_c", 100)
+
+    # "a" pasa a ser la más reciente, así que la expulsada debe ser "b"
+    assert cache.obtener("a") == "estado_a"
+    cache.guardar("d", "estado_d", 100)
+
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == "estado_a"
+    assert cache.estado()["bytes_usados"] == 300
+    assert cache.estado()["expulsiones"] == 1
+
+def test_cache_reemplaza_el_estado_de_la_misma_sesion():
+    cache = CacheEstadosSesion(presupuesto_bytes=1000)
+    cache.guardar("a", "turno_1", 200)
+    cache.guardar("a", "turno_2", 300)
+
+    assert cache.obtener("a") == "turno_2"
+    assert cache.estado()["bytes_usados"] == 300
+
+def test_cache_desactivada_con_presupuesto_cero():
+    cache = CacheEstadosSesion(presupuesto_bytes=0)
+    cache.guardar("a", "estado", 10)
+    assert cache.obtener("a") is None
+
+def test_reset_de_sesion_libera_el_estado_del_llm():
+    cache = CacheEstadosSesion(presupuesto_bytes=1000)
+    memory = MemoryManager()
+    memory.registrar_al_eliminar(cache.eliminar)
+
+    memory.add_message("s1", "user", "hola")
+    cache.guardar("s1", "estado", 100)
+    memory.reset_session("s1")
+
+    assert cache.obtener("s1") is None
+    assert "s1" not in memory.get_all_sessions()
@@ -0,0 +1,41 @@
+from backend.llm_engine.stub_backend import BackendSimulado
+import threading
+
+PARAMETROS = {"max_tokens": 512}
+
+def crear_backend():
+    return BackendSimulado(ms_por_token=0, ms_prefill_por_token=0)
+
+def test_respuesta_determinista():
+    backend = crear_backend()
+    primera = backend.generar("Usuario: hola\nAsesor:", PARAMETROS)["choices"][0]["text"]
+    segunda = backend.generar("Usuario: hola\nAsesor:", PARAMETROS)["choices"][0]["text"]
+    assert primera == segunda
+    assert primera
+
+def test_stream_equivale_a_respuesta_completa():
+    backend = crear_backend()
+    prompt = "Usuario: busco casa en Envigado\nAsesor:"
+    chunks = list(backend.generar_stream(prompt, PARAMETROS))
+    texto = "".join(chunk["choices"][0]["text"] for chunk in chunks if "choices" in chunk)
+    assert texto == backend.generar(prompt, PARAMETROS)["choices"][0]["text"]
+    assert chunks[-1]["metricas"]["tokens_completados"] == len(chunks) - 1
+
+def test_max_tokens_corta_la_respuesta():
+    output = crear_backend().generar("Usuario: hola\nAsesor:", {"max_tokens": 2})
+    assert output["usage"]["completion_tokens"] == 2
+    assert output["choices"][0]["finish_reason"] == "length"
+
+def test_cancelacion_detiene_la_generacion():
+    cancelacion = threading.Event()
+    cancelacion.set()
+    output = crear_backend().generar("Usuario: hola\nAsesor:", PARAMETROS, cancelacion=cancelacion)
+    assert output["choices"][0]["text"] == ""
+
+def test_prefijo_en_cache_reduce_prefill():
+    backend = crear_backend()
+    prefijo = "<<SYS>>\nEres HomeCat.\n<</SYS>>\n\n"
+    backend.evaluar_prefijo(prefijo)
+    metricas = backend.generar(prefijo + "Usuario: hola\nAsesor:", PARAMETROS)["metricas"]
+    assert metricas["tokens_reutilizados"] == backend.contar_tokens(prefijo)
+    assert metricas["tokens_prefill"] == metricas["tokens_prompt"] - metricas["tokens_reutilizados"]
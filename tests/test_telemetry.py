@@ -0,0 +1,42 @@
+from backend.llm_engine.telemetry import Histograma, TelemetriaInferencia
+import json
+
+def test_histograma_acumula_por_bucket():
+    histograma = Histograma((1, 5, 10))
+    for valor in (0.5, 2, 3, 7, 50):
+        histograma.observar(valor)
+
+    estado = histograma.estado()
+    assert estado["conteo"] == 5
+    assert estado["buckets"] == {"1": 1, "5": 3, "10": 4, "+Inf": 5}
+    assert estado["p50"] == 5
+    # Por encima del último límite: se informa el límite y se marca el desborde
+    assert estado["p95"] == 10
+    assert estado["p95_desborda"] is True
+    assert estado["desbordados"] == 1
+
+def test_histograma_vacio():
+    estado = Histograma((1, 2)).estado()
+    assert estado["conteo"] == 0
+    assert estado["promedio"] is None
+    assert estado["p50"] is None
+
+def test_telemetria_registra_campos_numericos_y_motivos():
+    telemetria = TelemetriaInferencia()
+    telemetria.registrar({"modo": "stream", "primer_token_s": 0.3, "tokens_por_s": 9.5, "motivo_fin": "stop"})
+    telemetria.registrar({"modo": "completo", "espera_cola_s": 1.2, "tokens_por_s": None, "motivo_fin": "cancelado"})
+
+    estado = telemetria.estado()
+    assert estado["solicitudes"] == 2
+    assert estado["por_modo"] == {"stream": 1, "completo": 1}
+    assert estado["motivo_fin"] == {"stop": 1, "cancelado": 1}
+    assert estado["histogramas"]["primer_token_s"]["conteo"] == 1
+    assert estado["histogramas"]["tokens_por_s"]["conteo"] == 1
+    assert estado["histogramas"]["espera_cola_s"]["conteo"] == 1
+
+def test_estado_con_desbordes_es_json_valido_para_metrics():
+    telemetria = TelemetriaInferencia()
+    telemetria.registrar({"modo": "completo", "total_s": 500, "espera_cola_s": 300, "motivo_fin": "stop"})
+    # /metrics responde con JSONResponse, que serializa con allow_nan=False
+    json.dumps({"inferencia": telemetria.estado()}, allow_nan=False)
+    assert telemetria.estado()["histogramas"]["total_s"]["p95_desborda"] is True